@@ -3,19 +3,41 @@ import os
 
 class Settings(BaseModel):
     app_env: str = os.getenv("APP_ENV", "development")
+    log_level: str = os.getenv("LOG_LEVEL", "INFO")
+    # Requests slower than this are logged with their timing; 0 disables
+    slow_request_seconds: float = float(os.getenv("SLOW_REQUEST_SECONDS", "2"))
     app_name: str = os.getenv("APP_NAME", "medst")
     app_version: str = os.getenv("APP_VERSION", "0.1.0")
     secret_key: str = os.getenv("SECRET_KEY", "change-me")
     access_token_expire_minutes: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
+    # Per-process cache of authenticated users; entries never outlive their token
+    auth_cache_max_entries: int = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))  # 0 disables
+    auth_cache_ttl_seconds: int = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "300"))
+
+    # Password hashing: the first scheme hashes new passwords, the rest are only verified
+    # (and rehashed on login). Changing a cost below also triggers a rehash on login.
+    password_schemes: str = os.getenv("PASSWORD_SCHEMES", "argon2,bcrypt")
+    argon2_time_cost: int = int(os.getenv("ARGON2_TIME_COST", "2"))
+    argon2_memory_cost: int = int(os.getenv("ARGON2_MEMORY_COST", "19456"))  # KiB
+    argon2_parallelism: int = int(os.getenv("ARGON2_PARALLELISM", "1"))
+    bcrypt_rounds: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    password_hash_workers: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    password_hash_max_pending: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))  # beyond this, 503
 
     db_host: str = os.getenv("DB_HOST", "localhost")
     db_port: int = int(os.getenv("DB_PORT", "5432"))
     db_user: str = os.getenv("DB_USER", "medst")
     db_password: str = os.getenv("DB_PASSWORD", "medst_password")
     db_name: str = os.getenv("DB_NAME", "medst")
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    db_pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))     # seconds to wait for a connection
+    db_pool_recycle: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))       # seconds; -1 never recycles
+    db_statement_cache_size: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))  # asyncpg; 0 behind pgbouncer
 
-    storage_provider: str = os.getenv("STORAGE_PROVIDER", "local")
+    storage_provider: str = os.getenv("STORAGE_PROVIDER", "local")  # local | s3 | gcs | memory
     storage_local_path: str = os.getenv("STORAGE_LOCAL_PATH", "/data/storage")
+    storage_max_connections: int = int(os.getenv("STORAGE_MAX_CONNECTIONS", "32"))
 
     s3_bucket: str = os.getenv("S3_BUCKET", "")
     s3_region: str = os.getenv("S3_REGION", "")
@@ -25,10 +47,64 @@ class Settings(BaseModel):
     gcs_bucket: str = os.getenv("GCS_BUCKET", "")
     google_app_creds: str = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "/app/creds/service-account.json")
 
+    max_upload_bytes: int = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+    upload_chunk_bytes: int = int(os.getenv("UPLOAD_CHUNK_BYTES", str(8 * 1024 * 1024)))  # multiple of 256 KiB for GCS
+    max_bulk_upload_bytes: int = int(os.getenv("MAX_BULK_UPLOAD_BYTES", str(1024 * 1024 * 1024)))
+    bulk_max_files: int = int(os.getenv("BULK_MAX_FILES", "500"))
+    bulk_concurrency: int = int(os.getenv("BULK_CONCURRENCY", "0"))  # 0 = one per CPU
+    ingest_workers: int = int(os.getenv("INGEST_WORKERS", "0"))  # 0 = one per CPU
+    ingest_lease_seconds: float = float(os.getenv("INGEST_LEASE_SECONDS", "300"))  # a running job's claim, renewed while it runs
+    ingest_recovery_seconds: float = float(os.getenv("INGEST_RECOVERY_SECONDS", "60"))  # how often stranded jobs are picked up
+
+    extract_cache_path: str = os.getenv("EXTRACT_CACHE_PATH", "/data/extract-cache")  # empty disables
+    extract_cache_max_bytes: int = int(os.getenv("EXTRACT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+    pdf_parallel_min_pages: int = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "32"))  # 0 never splits
+    pdf_pages_per_task: int = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+    ocr_dpi: int = int(os.getenv("OCR_DPI", "300"))
+    ocr_timeout_seconds: float = float(os.getenv("OCR_TIMEOUT_SECONDS", "120"))  # per image
+    ocr_batch_timeout_seconds: float = float(os.getenv("OCR_BATCH_TIMEOUT_SECONDS", "600"))  # per document or page range
+    ocr_required: bool = os.getenv("OCR_REQUIRED", "true").lower() == "true"  # refuse to start without tesserocr
+
     tess_lang: str = os.getenv("TESS_LANG", "eng")
     notify_from_email: str = os.getenv("NOTIFY_FROM_EMAIL", "noreply@medst.local")
+    # Access-grant checks (services/grants.py)
+    grant_cache_max_entries: int = int(os.getenv("GRANT_CACHE_MAX_ENTRIES", "50000"))  # 0 disables
+    grant_cache_ttl_seconds: float = float(os.getenv("GRANT_CACHE_TTL_SECONDS", "30"))  # bounds staleness across processes
+    grant_sweep_seconds: float = float(os.getenv("GRANT_SWEEP_SECONDS", "300"))
+    grant_sweep_batch_size: int = int(os.getenv("GRANT_SWEEP_BATCH_SIZE", "1000"))
+
+    # Patient notifications (services/notifications.py): comma-separated channels from log, email, memory
+    notify_channels: str = os.getenv("NOTIFY_CHANNELS", "log")
+    notify_digest_seconds: float = float(os.getenv("NOTIFY_DIGEST_SECONDS", "60"))  # 0 sends as soon as possible
+    notify_digest_max_items: int = int(os.getenv("NOTIFY_DIGEST_MAX_ITEMS", "50"))  # send early once this many
+    notify_queue_size: int = int(os.getenv("NOTIFY_QUEUE_SIZE", "10000"))  # beyond this, notifications are dropped
+
+    # Outbound email (services/mailer.py); tools/smtp_sink.py stands in for a real server locally
+    smtp_host: str = os.getenv("SMTP_HOST", "smtp.gmail.com")
+    smtp_port: int = int(os.getenv("SMTP_PORT", "587"))
+    smtp_username: str = os.getenv("SMTP_USERNAME", "")  # empty skips AUTH
+    smtp_password: str = os.getenv("SMTP_PASSWORD", "")
+    smtp_starttls: bool = os.getenv("SMTP_STARTTLS", "true").lower() in ("1", "true", "yes")
+    smtp_timeout_seconds: float = float(os.getenv("SMTP_TIMEOUT_SECONDS", "20"))
+    smtp_pool_size: int = int(os.getenv("SMTP_POOL_SIZE", "2"))  # persistent connections per process
+    smtp_idle_seconds: float = float(os.getenv("SMTP_IDLE_SECONDS", "60"))  # close connections idle this long
+    email_max_attempts: int = int(os.getenv("EMAIL_MAX_ATTEMPTS", "6"))
+    email_retry_base_seconds: float = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "30"))  # doubles per attempt
+    email_poll_seconds: float = float(os.getenv("EMAIL_POLL_SECONDS", "10"))
+    email_batch_size: int = int(os.getenv("EMAIL_BATCH_SIZE", "50"))
 
     google_api_key: str = os.getenv("GOOGLE_API_KEY", "")
+    places_api_url: str = os.getenv("PLACES_API_URL", "https://maps.googleapis.com/maps/api")
+    places_timeout_seconds: float = float(os.getenv("PLACES_TIMEOUT_SECONDS", "5"))
+    places_max_connections: int = int(os.getenv("PLACES_MAX_CONNECTIONS", "10"))
+    clinic_search_cache_ttl_seconds: float = float(os.getenv("CLINIC_SEARCH_CACHE_TTL_SECONDS", "3600"))
+    geocode_cache_ttl_seconds: float = float(os.getenv("GEOCODE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    clinic_cache_max_entries: int = int(os.getenv("CLINIC_CACHE_MAX_ENTRIES", "5000"))
+    # Local clinic directory (see tools/import_clinics.py); the Places API is only asked when it has no match
+    clinic_search_radius_km: float = float(os.getenv("CLINIC_SEARCH_RADIUS_KM", "25"))
+    clinic_index_ttl_seconds: float = float(os.getenv("CLINIC_INDEX_TTL_SECONDS", "300"))
+    clinic_remote_fallback: bool = os.getenv("CLINIC_REMOTE_FALLBACK", "true").lower() in ("1", "true", "yes")
 
 
 settings = Settings()
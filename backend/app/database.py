@@ -1,12 +1,37 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from app.config import settings
+from app.utils.metrics import TimedAsyncQueuePool, TimedQueuePool, register_pools
 
 DATABASE_URL = f"postgresql+psycopg2://{settings.db_user}:{settings.db_password}@{settings.db_host}:{settings.db_port}/{settings.db_name}"
+ASYNC_DATABASE_URL = (
+    f"postgresql+asyncpg://{settings.db_user}:{settings.db_password}@{settings.db_host}:{settings.db_port}/{settings.db_name}"
+    f"?prepared_statement_cache_size={settings.db_statement_cache_size}"
+)
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+POOL_OPTIONS = dict(
+    pool_pre_ping=True,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+)
+
+# The API routers use the async engine; ingestion workers, startup tasks and
+# code that mixes DB work with blocking storage I/O use the sync one in threads.
+engine = create_engine(DATABASE_URL, poolclass=TimedQueuePool, **POOL_OPTIONS)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    connect_args={"statement_cache_size": settings.db_statement_cache_size},
+    poolclass=TimedAsyncQueuePool,
+    **POOL_OPTIONS,
+)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+register_pools({"sync": engine.pool, "async": async_engine.pool})
+
 class Base(DeclarativeBase):
     pass
 
@@ -16,3 +41,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
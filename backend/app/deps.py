@@ -1,18 +1,126 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+from app.config import settings
+from app.database import get_async_db
 from app.models import User
 from app.security import decode_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+@dataclass(frozen=True)
+class Principal:
+    """Snapshot of the authenticated user, safe to share between requests."""
+    id: int
+    email: str
+    full_name: Optional[str]
+    role: str
+    dob: Optional[str]
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(id=user.id, email=user.email, full_name=user.full_name, role=user.role, dob=user.dob)
+
+class PrincipalCache:
+    """
+    LRU of token -> Principal. An entry lives for at most `ttl` seconds and never
+    past the token's own `exp`, so a hit can skip both JWT verification and the
+    users query. Entries for a user are dropped when that user is updated or deleted.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[Principal, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token: str, principal: Principal, token_exp: Optional[float]) -> None:
+        if self.max_entries <= 0:
+            return
+        ttl = self.ttl
+        if token_exp is not None:
+            ttl = min(ttl, token_exp - time.time())
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (principal, time.monotonic() + ttl)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, emails: Iterable[str]) -> None:
+        emails = set(emails)
+        with self._lock:
+            for token in [t for t, (p, _) in self._entries.items() if p.email in emails]:
+                del self._entries[token]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+principal_cache = PrincipalCache(settings.auth_cache_max_entries, settings.auth_cache_ttl_seconds)
+
+# Changed users are collected per session at flush and evicted once the change
+# commits (as in services/grants.py): evicting at flush would let a concurrent
+# request re-cache the old row for the full TTL before the change is visible.
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _principal_changed(mapper, connection, target: User) -> None:
+    session = object_session(target)
+    if session is None:
+        return
+    # The old email too, in case it is the email that changed
+    history = inspect(target).attrs.email.history
+    emails = {email for email in (target.email, *(history.deleted or ())) if email}
+    session.info.setdefault("changed_principals", set()).update(emails)
+
+@event.listens_for(Session, "after_commit")
+def _principals_committed(session: Session) -> None:
+    emails = session.info.pop("changed_principals", None)
+    if emails:
+        principal_cache.invalidate(emails)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _principals_rolled_back(session: Session, previous_transaction) -> None:
+    # A savepoint rollback leaves the outer transaction's changes to commit
+    if not previous_transaction.nested:
+        session.info.pop("changed_principals", None)
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> Principal:
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
     payload = decode_token(token)
     if not payload or "sub" not in payload:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
     email = payload["sub"]
-    user = db.query(User).filter(User.email == email).first()
+    user = await db.scalar(select(User).where(User.email == email))
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-    return user
+    principal = Principal.from_user(user)
+    principal_cache.put(token, principal, payload.get("exp"))
+    return principal
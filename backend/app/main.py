@@ -1,11 +1,27 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
-from app.database import engine, Base
 from app.routers import auth, records, access, analytics, clinics_search, send_request_email, users
+from app.utils.uploads import UploadSizeLimitMiddleware
+from app.utils import metrics
+from app.utils.logging import logger
+from app.services.jobs import recovery as job_recovery, shutdown_executor
+from app.services import clinics, ocr, passwords
+from app.services.clinic_directory import directory as clinic_directory
+from app.services.grants import sweeper as grant_sweeper
+from app.services.mailer import mailer
+from app.services.notifications import dispatcher as notifications
 
 app = FastAPI(title=settings.app_name, version=settings.app_version)
 
+# Reject oversized uploads while they stream in (added first so CORS wraps its 413s)
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=settings.max_upload_bytes,
+    overrides={"/records/bulk": settings.max_bulk_upload_bytes},
+)
+
 # CORS (adjust for your frontend domains)
 app.add_middleware(
     CORSMiddleware,
@@ -13,10 +29,43 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Outermost, so request timings include the other middleware and its early responses
+app.add_middleware(metrics.MetricsMiddleware)
+
+# The schema is managed by Alembic (`alembic upgrade head`), not at import time
+
+@app.on_event("startup")
+def check_ocr_engine():
+    try:
+        logger.info(f"OCR engine: {ocr.check_engine()}")
+    except ocr.OcrError as e:
+        if settings.ocr_required:
+            raise
+        logger.error(f"OCR_REQUIRED=false: {e}; scanned documents fall back to one tesseract process per page")
+
+@app.on_event("startup")
+async def start_background_workers():
+    # In the background, so the worker is ready without waiting on the database
+    job_recovery.start()
+    mailer.start()
+    notifications.start()
+    grant_sweeper.start()
+
+@app.on_event("shutdown")
+def stop_background_workers():
+    job_recovery.stop()
+    shutdown_executor()
+    passwords.shutdown_pool()
+    mailer.stop()
+    grant_sweeper.stop()
+
+@app.on_event("shutdown")
+async def close_async_services():
+    await notifications.stop()
+    await clinics.client.aclose()
 
 # Routers
 app.include_router(auth.router)
@@ -29,4 +78,17 @@ app.include_router(users.router)
 
 @app.get("/health")
 def health():
-    return {"status": "ok", "env": settings.app_env}
+    return {
+        "status": "ok",
+        "env": settings.app_env,
+        "ingestion": job_recovery.stats(),
+        "password_hashing": passwords.stats(),
+        "clinic_search": {**clinics.client.stats(), "directory": clinic_directory.stats()},
+        "email": mailer.stats(),
+        "notifications": notifications.stats(),
+        "access_grants": grant_sweeper.stats(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Text, JSON, Boolean
+from sqlalchemy import Column, String, Integer, BigInteger, Float, Date, DateTime, ForeignKey, Text, JSON, Boolean, Index
 from sqlalchemy.orm import relationship, Mapped, mapped_column
-from datetime import datetime
+from datetime import date, datetime
 from app.database import Base
 
 class User(Base):
@@ -26,11 +26,123 @@ class Record(Base):
     document_type: Mapped[str] = mapped_column(String(100), nullable=True)  # pathology_report, referral, gp_note
     visit_date: Mapped[str] = mapped_column(String(50), nullable=True)      # ISO date string 
     storage_key: Mapped[str] = mapped_column(String(512), nullable=False)   # path or URI to file
+    content_hash: Mapped[str] = mapped_column(String(64), index=True, nullable=True)  # sha256 of the stored file
     content_text: Mapped[str] = mapped_column(Text, nullable=True)          # extracted raw text
     structured_data: Mapped[dict] = mapped_column(JSON, nullable=True)      # parsed fields
 
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     patient = relationship("User", back_populates="records")
+    lab_results = relationship("LabResult", back_populates="record", cascade="all, delete-orphan")
+
+    # Serves the newest-first keyset pagination of a patient's records
+    __table_args__ = (Index("ix_records_patient_created", "patient_id", "created_at", "id"),)
+
+class Blob(Base):
+    """A stored file, shared by every Record whose upload had the same bytes."""
+    __tablename__ = "blobs"
+    content_hash: Mapped[str] = mapped_column(String(64), primary_key=True)  # sha256 hex
+    storage_key: Mapped[str] = mapped_column(String(512), unique=True, nullable=False)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    ref_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)  # uuid4 hex
+    patient_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True, nullable=False)
+    upload_token_id: Mapped[int] = mapped_column(ForeignKey("upload_tokens.id"), nullable=True)  # set for /records/tupload
+    filename: Mapped[str] = mapped_column(String(255), nullable=False)
+    storage_key: Mapped[str] = mapped_column(String(512), nullable=False)
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=True)
+    status: Mapped[str] = mapped_column(String(20), default="queued", index=True)  # queued | running | done | failed
+    error: Mapped[str] = mapped_column(Text, nullable=True)
+    record_id: Mapped[int] = mapped_column(ForeignKey("records.id", ondelete="SET NULL"), nullable=True)
+    claimed_by: Mapped[str] = mapped_column(String(100), nullable=True)          # process running the job
+    lease_expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)  # renewed while it runs
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    started_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+
+class LabResult(Base):
+    """One numeric lab value from a record, normalized for charting over time."""
+    __tablename__ = "lab_results"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    patient_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    record_id: Mapped[int] = mapped_column(ForeignKey("records.id", ondelete="CASCADE"), index=True, nullable=False)
+    test: Mapped[str] = mapped_column(String(100), nullable=False)   # normalized name, e.g. hba1c
+    value: Mapped[float] = mapped_column(Float, nullable=False)
+    unit: Mapped[str] = mapped_column(String(20), nullable=False)    # canonical unit, e.g. mmol/L
+    taken_on: Mapped[date] = mapped_column(Date, nullable=False)     # visit date, else upload date
+
+    record = relationship("Record", back_populates="lab_results")
+
+    __table_args__ = (Index("ix_lab_results_series", "patient_id", "test", "taken_on"),)
+
+class RecordTerm(Base):
+    """Inverted index over record text, used for search when the database is not PostgreSQL."""
+    __tablename__ = "record_terms"
+    record_id: Mapped[int] = mapped_column(ForeignKey("records.id", ondelete="CASCADE"), primary_key=True)
+    term: Mapped[str] = mapped_column(String(64), primary_key=True)
+    patient_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    count: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    __table_args__ = (Index("ix_record_terms_lookup", "patient_id", "term"),)
+
+class PatientTermCount(Base):
+    """How many of a patient's records mention a diagnosis or medication, per month."""
+    __tablename__ = "patient_term_counts"
+    patient_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    kind: Mapped[str] = mapped_column(String(20), primary_key=True)   # diagnosis | medication
+    month: Mapped[str] = mapped_column(String(7), primary_key=True)   # YYYY-MM
+    term: Mapped[str] = mapped_column(String(255), primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    __table_args__ = (Index("ix_patient_term_counts_lookup", "patient_id", "kind", "month"),)
+
+class PatientMonthCount(Base):
+    """Number of records per patient per month."""
+    __tablename__ = "patient_month_counts"
+    patient_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    month: Mapped[str] = mapped_column(String(7), primary_key=True)   # YYYY-MM
+    count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+class Clinic(Base):
+    """A clinic in the local directory, imported from a file or saved from a Places lookup."""
+    __tablename__ = "clinics"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    place_id: Mapped[str] = mapped_column(String(255), unique=True, nullable=True)  # Google place_id, if known
+    name: Mapped[str] = mapped_column(String(255), nullable=False)
+    address: Mapped[str] = mapped_column(String(512), nullable=True)
+    suburb: Mapped[str] = mapped_column(String(100), nullable=True)
+    postcode: Mapped[str] = mapped_column(String(10), index=True, nullable=True)
+    lat: Mapped[float] = mapped_column(Float, nullable=False)
+    lng: Mapped[float] = mapped_column(Float, nullable=False)
+    geohash: Mapped[str] = mapped_column(String(12), index=True, nullable=False)
+    types: Mapped[str] = mapped_column(String(255), nullable=True)  # comma-separated, e.g. "dentist,health"
+    phone: Mapped[str] = mapped_column(String(50), nullable=True)
+    rating: Mapped[float] = mapped_column(Float, nullable=True)
+    user_ratings_total: Mapped[int] = mapped_column(Integer, nullable=True)
+    source: Mapped[str] = mapped_column(String(20), default="import")  # import | places
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class OutboundEmail(Base):
+    """A queued email, delivered in the background by services/mailer.py."""
+    __tablename__ = "outbound_emails"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    upload_token_id: Mapped[int] = mapped_column(ForeignKey("upload_tokens.id"), index=True, nullable=True)
+    to_address: Mapped[str] = mapped_column(String(255), nullable=False)
+    subject: Mapped[str] = mapped_column(String(500), nullable=False)
+    body: Mapped[str] = mapped_column(Text, nullable=False)
+    status: Mapped[str] = mapped_column(String(20), default="queued")  # queued | sending | sent | failed
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    last_error: Mapped[str] = mapped_column(Text, nullable=True)
+    # When the next delivery attempt is due; while sending, when the claim lapses
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    sent_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+
+    __table_args__ = (Index("ix_outbound_emails_due", "status", "next_attempt_at"),)
 
 class ConsentLog(Base):
     __tablename__ = "consents"
@@ -54,6 +166,13 @@ class AccessGrant(Base):
     expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
     active: Mapped[bool] = mapped_column(Boolean, default=True)
 
+    __table_args__ = (
+        # Serves the "does this grantee have access to this record" check in services/grants.py
+        Index("ix_access_grants_lookup", "patient_id", "grantee_name", "record_id", "active", "expires_at"),
+        # Serves the expiry sweeper
+        Index("ix_access_grants_expiry", "active", "expires_at"),
+    )
+
 class UploadTokens(Base):
     __tablename__ = "upload_tokens"
     id = Column(Integer, primary_key=True, index=True)
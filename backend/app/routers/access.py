@@ -1,37 +1,70 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.deps import get_current_user
-from app.database import get_db
+from app.database import get_async_db
 from app.schemas import ConsentRequest, ConsentDecision
 from app.services.consent import create_consent_request, decide_consent
+from app.services.grants import has_access, list_grants, revoke_grant
 from app.models import ConsentLog
 from app.services.notifications import notify_patient
 
 router = APIRouter(prefix="/access", tags=["access"])
 
 @router.post("/request")
-def request_access(payload: ConsentRequest, db: Session = Depends(get_db), user = Depends(get_current_user)):
+async def request_access(payload: ConsentRequest, db: AsyncSession = Depends(get_async_db), user = Depends(get_current_user)):
     # A clinician or third party requests access; MVP assumes current user is the requester.
-    log = create_consent_request(
-        db=db,
+    log = await db.run_sync(
+        create_consent_request,
         patient_id=user.id,  # For MVP, self-requests; later allow requesting other patient with lookup
         requester_name=payload.requester_name,
         requester_dob=payload.requester_dob,
         record_id=payload.record_id,
         reason=payload.reason,
     )
-    notify_patient(email=user.email, message=f"Access request from {payload.requester_name}")
+    # Queued only; delivery (and digesting) happens in the background
+    notify_patient(email=user.email, message=f"Access request from {payload.requester_name}", kind="access_request")
     return {"consent_id": log.id, "status": log.status}
 
 @router.get("/consents")
-def list_consents(db: Session = Depends(get_db), user = Depends(get_current_user)):
-    items = db.query(ConsentLog).filter(ConsentLog.patient_id == user.id).order_by(ConsentLog.notified_at.desc()).all()
+async def list_consents(db: AsyncSession = Depends(get_async_db), user = Depends(get_current_user)):
+    items = (await db.scalars(
+        select(ConsentLog).where(ConsentLog.patient_id == user.id).order_by(ConsentLog.notified_at.desc())
+    )).all()
     return [{"id": i.id, "requester_name": i.requester_name, "status": i.status, "record_id": i.record_id} for i in items]
 
 @router.post("/decide")
-def decide(payload: ConsentDecision, db: Session = Depends(get_db), user = Depends(get_current_user)):
+async def decide(payload: ConsentDecision, db: AsyncSession = Depends(get_async_db), user = Depends(get_current_user)):
     try:
-        log = decide_consent(db, consent_id=payload.consent_id, decision=payload.decision)
+        log = await db.run_sync(decide_consent, consent_id=payload.consent_id, decision=payload.decision)
         return {"id": log.id, "status": log.status}
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/grants")
+async def grants(db: AsyncSession = Depends(get_async_db), user = Depends(get_current_user)):
+    items = await db.run_sync(list_grants, user.id)
+    return [
+        {"id": g.id, "grantee_name": g.grantee_name, "record_id": g.record_id, "active": g.active, "expires_at": g.expires_at}
+        for g in items
+    ]
+
+@router.post("/grants/{grant_id}/revoke")
+async def revoke(grant_id: int, db: AsyncSession = Depends(get_async_db), user = Depends(get_current_user)):
+    try:
+        grant = await db.run_sync(revoke_grant, user.id, grant_id)
+        return {"id": grant.id, "active": grant.active}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/check")
+async def check(
+    grantee_name: str,
+    grantee_dob: Optional[str] = None,
+    record_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+    user = Depends(get_current_user),
+):
+    allowed = await db.run_sync(has_access, user.id, grantee_name, grantee_dob, record_id)
+    return {"allowed": allowed}
@@ -1,28 +1,48 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from datetime import date
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.deps import get_current_user
-from app.database import get_db
-from app.schemas import AnalyticsQuery
-from app.models import Record
+from app.database import get_async_db
+from app.schemas import AnalyticsQuery, LabTestOut, LabTrendOut
+from app.services.aggregates import ISO_MONTH, summarize
+from app.services.labs import BUCKETS, lab_series, lab_tests
+from app.utils.labs import normalize_test_name
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
+def _month_bound(value: Optional[str], name: str) -> Optional[str]:
+    if not value:
+        return None
+    m = ISO_MONTH.match(value.strip())
+    if not m:
+        raise HTTPException(status_code=400, detail=f"{name} must be an ISO date (YYYY-MM-DD or YYYY-MM)")
+    return m.group(1)
+
 @router.post("/summary")
-def patient_summary(payload: AnalyticsQuery, db: Session = Depends(get_db), user = Depends(get_current_user)):
-    # Count diagnoses/meds occurrences
-    q = db.query(Record).filter(Record.patient_id == user.id)
-    items = q.all()
-    diagnosis_counts = {}
-    med_counts = {}
-    for r in items:
-        data = r.structured_data or {}
-        for d in data.get("diagnosis", []):
-            diagnosis_counts[d] = diagnosis_counts.get(d, 0) + 1
-        for m in data.get("medications", []):
-            med_counts[m] = med_counts.get(m, 0) + 1
+async def patient_summary(payload: AnalyticsQuery, db: AsyncSession = Depends(get_async_db), user = Depends(get_current_user)):
+    # Read the per-patient aggregates; the range is applied at month granularity
+    start = _month_bound(payload.range_start, "range_start")
+    end = _month_bound(payload.range_end, "range_end")
+    return await db.run_sync(summarize, user.id, start, end)
+
+@router.get("/labs", response_model=List[LabTestOut])
+async def list_lab_tests(db: AsyncSession = Depends(get_async_db), user = Depends(get_current_user)):
+    return await db.run_sync(lab_tests, user.id)
 
-    return {
-        "total_records": len(items),
-        "top_diagnoses": sorted(diagnosis_counts.items(), key=lambda x: x[1], reverse=True)[:10],
-        "top_medications": sorted(med_counts.items(), key=lambda x: x[1], reverse=True)[:10],
-    }
+@router.get("/labs/{test}/trend", response_model=LabTrendOut)
+async def lab_test_trend(
+    test: str,
+    bucket: str = "month",
+    window: int = Query(3, ge=1, le=365),
+    unit: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db),
+    user = Depends(get_current_user),
+):
+    if bucket not in BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {', '.join(BUCKETS)}")
+    test = normalize_test_name(test)
+    unit, points = await db.run_sync(lab_series, user.id, test, unit, bucket, window, start, end)
+    return {"test": test, "unit": unit, "bucket": bucket, "window": window, "points": points}
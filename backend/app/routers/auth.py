@@ -1,37 +1,60 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
-from app.database import get_db, engine, Base
+from app.database import get_async_db
 from app.models import User
 from app.schemas import UserCreate, UserOut, Token
-from app.security import hash_password, verify_password, create_access_token
+from app.security import create_access_token
+from app.services.passwords import HasherBusy, hash_password_async, verify_and_update_async
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-# Ensure tables exist on import
-Base.metadata.create_all(bind=engine)
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-in attempts in progress, please retry",
+        headers={"Retry-After": "1"},
+    )
+
+async def _find_user(db: AsyncSession, email: str):
+    return await db.scalar(select(User).where(User.email == email))
 
 @router.post("/register", response_model=UserOut)
-def register(user_in: UserCreate, db: Session = Depends(get_db)):
-    existing = db.query(User).filter(User.email == user_in.email).first()
+async def register(user_in: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    existing = await _find_user(db, user_in.email)
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
+    try:
+        hashed_password = await hash_password_async(user_in.password)
+    except HasherBusy:
+        raise _busy()
     user = User(
         email=user_in.email,
-        hashed_password=hash_password(user_in.password),
+        hashed_password=hashed_password,
         full_name=user_in.full_name,
         role=user_in.role or "patient",
         dob=user_in.dob,
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 @router.post("/token", response_model=Token)
-def login(form: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form.username).first()
-    if not user or not verify_password(form.password, user.hashed_password):
+async def login(form: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await _find_user(db, form.username)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    try:
+        valid, new_hash = await verify_and_update_async(form.password, user.hashed_password)
+    except HasherBusy:
+        raise _busy()
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if new_hash:
+        # Stored hash used an outdated scheme or cost; upgrade it now that we know the password
+        user.hashed_password = new_hash
+        await db.commit()
     token = create_access_token(subject=user.email)
     return Token(access_token=token)
@@ -1,16 +1,25 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
-from app.services.clinics import search_clinics
+from app.database import get_async_db
+from app.services.clinic_directory import search
+from app.services.clinics import ClinicSearchUnavailable
 
 router = APIRouter(prefix="/clinics", tags=["clinics"])
 
 @router.get("/search")
-def search_clinics_endpoint(
+async def search_clinics_endpoint(
     name: str = Query(..., description="Clinic name or keyword"),
-    location: Optional[str] = Query(None, description="Suburb, postcode, or address")
+    location: Optional[str] = Query(None, description="Suburb, postcode, address or \"lat,lng\""),
+    limit: int = Query(20, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    Search for clinics by name/keyword, optionally near a suburb/postcode/address.
+    Search for clinics by name/keyword, nearest first when a suburb/postcode/address is given.
+    Answered from the local clinic directory; the Places API is only used when it has no match.
     """
-    results = search_clinics(name, location)
-    return {"count": len(results), "results": results}
+    try:
+        results, source = await search(db, name, location, limit)
+    except ClinicSearchUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"count": len(results), "source": source, "results": results}
@@ -1,49 +1,141 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Form
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Form, Query
 from fastapi import Request
-from fastapi.responses import FileResponse, StreamingResponse
-from sqlalchemy.orm import Session
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, StreamingResponse, Response, JSONResponse
+from sqlalchemy import or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+from starlette.concurrency import run_in_threadpool
 from app.deps import get_current_user
-from app.database import get_db
-from app.models import Record, UploadTokens
-from app.schemas import RecordCreate, RecordOut
-from app.services.ingestion import ingest_document
-from app.services.storage import get_file_content
+from app.database import get_async_db
+from app.models import Record, UploadTokens, IngestionJob
+from app.schemas import RecordCreate, RecordOut, IngestionJobOut, RecordSearchHit
+from app.services.jobs import enqueue_job, submit_upload
+from app.services.blobs import purge_blob, release_blob
+from app.services.aggregates import uncount_records
+from app.services.search import search_records, unindex_records
+from app.services.bulk import ingest_bulk
+from app.services.storage import get_file_size, iter_file_range, local_path
+from app.utils.logging import logger
+from app.utils.http import parse_range_header, etag_matches, RangeNotSatisfiable, encode_cursor, decode_cursor, InvalidCursor
+from datetime import date
+from typing import List, Optional
 import os
 import mimetypes
 
 router = APIRouter(prefix="/records", tags=["records"])
 
-@router.post("/upload", response_model=RecordOut)
+@router.post("/upload", response_model=IngestionJobOut, status_code=202)
 async def upload_record(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
     user = Depends(get_current_user),
 ):
-    content = await file.read()
-    storage_key, text, fields, doc_type = ingest_document(user.id, file.filename, content)
-
-    record = Record(
-        patient_id=user.id,
-        provider_name=fields.get("provider_name"),
-        provider_clinic=fields.get("provider_clinic"),
-        provider_specialty=fields.get("provider_specialty"),
-        document_type=doc_type,
-        visit_date=fields.get("visit_date"),
-        storage_key=storage_key,
-        content_text=text,
-        structured_data=fields,
-    )
-    db.add(record)
-    db.commit()
-    db.refresh(record)
-    return record
+    # UploadFile is already spooled to disk past 1 MiB; stream it to storage from there
+    try:
+        job = await run_in_threadpool(submit_upload, user.id, file.filename, file.file)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    enqueue_job(job.id)
+    return job
+
+
+@router.post("/bulk")
+async def bulk_upload_records(
+    files: List[UploadFile] = File(...),
+    user = Depends(get_current_user),
+):
+    """
+    Import many documents in one request, as separate files and/or ZIP archives.
+    Returns a per-file manifest; records are only created for files that ingest cleanly.
+    """
+    manifest = await ingest_bulk(user.id, files)
+    created = sum(1 for item in manifest if item["status"] == "created")
+    return {"total": len(manifest), "created": created, "results": manifest}
+
 
+# Columns RecordOut exposes; content_text is never loaded for listings
+LIST_FIELDS = tuple(RecordOut.model_fields)
 
 @router.get("/", response_model=list[RecordOut])
-def list_records(db: Session = Depends(get_db), user = Depends(get_current_user)):
-    items = db.query(Record).filter(Record.patient_id == user.id).order_by(Record.created_at.desc()).all()
+async def list_records(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    document_type: Optional[str] = None,
+    provider: Optional[str] = None,
+    visit_from: Optional[date] = None,
+    visit_to: Optional[date] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    user = Depends(get_current_user),
+):
+    """
+    Newest first, one page at a time. When there are more records the
+    X-Next-Cursor header holds the cursor for the next page. `fields` is a
+    comma-separated subset of the record fields to return.
+    """
+    selected = LIST_FIELDS
+    if fields:
+        selected = tuple(f.strip() for f in fields.split(",") if f.strip())
+        unknown = set(selected) - set(LIST_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    columns = {*selected, "id", "created_at"}
+    q = (
+        select(Record)
+        .options(load_only(*(getattr(Record, name) for name in columns)))
+        .where(Record.patient_id == user.id)
+    )
+    if cursor:
+        try:
+            after_created, after_id = decode_cursor(cursor)
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        q = q.where(tuple_(Record.created_at, Record.id) < tuple_(after_created, after_id))
+    if document_type:
+        q = q.where(Record.document_type == document_type)
+    if provider:
+        pattern = f"%{provider}%"
+        q = q.where(or_(Record.provider_name.ilike(pattern), Record.provider_clinic.ilike(pattern)))
+    # visit_date holds ISO dates, so string comparison orders them correctly
+    if visit_from:
+        q = q.where(Record.visit_date >= visit_from.isoformat())
+    if visit_to:
+        q = q.where(Record.visit_date <= visit_to.isoformat())
+
+    items = (await db.scalars(q.order_by(Record.created_at.desc(), Record.id.desc()).limit(limit + 1))).all()
+    headers = {}
+    if len(items) > limit:
+        items = items[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(items[-1].created_at, items[-1].id)
+
+    if fields:
+        body = [{name: getattr(item, name) for name in selected} for item in items]
+        return JSONResponse(jsonable_encoder(body), headers=headers)
+    response.headers.update(headers)
     return items
 
+@router.get("/search", response_model=List[RecordSearchHit])
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=50),
+    offset: int = Query(0, ge=0),
+    document_type: Optional[str] = None,
+    visit_from: Optional[date] = None,
+    visit_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db),
+    user = Depends(get_current_user),
+):
+    return await db.run_sync(search_records, user.id, q, limit, offset, document_type, visit_from, visit_to)
+
+@router.get("/jobs/{job_id}", response_model=IngestionJobOut)
+async def get_ingestion_job(job_id: str, db: AsyncSession = Depends(get_async_db), user = Depends(get_current_user)):
+    job = await db.scalar(select(IngestionJob).where(IngestionJob.id == job_id, IngestionJob.patient_id == user.id))
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 @router.get("/test")
 def test_endpoint():
     return {"message": "Records router is working"}
@@ -53,98 +145,126 @@ def test_delete():
     return {"message": "DELETE endpoint is working"}
 
 @router.get("/{record_id}", response_model=RecordOut)
-def get_record(record_id: int, db: Session = Depends(get_db), user = Depends(get_current_user)):
-    record = db.query(Record).filter(Record.id == record_id, Record.patient_id == user.id).first()
+async def get_record(record_id: int, db: AsyncSession = Depends(get_async_db), user = Depends(get_current_user)):
+    record = await db.scalar(
+        select(Record)
+        .options(load_only(*(getattr(Record, name) for name in LIST_FIELDS)))
+        .where(Record.id == record_id, Record.patient_id == user.id)
+    )
     if not record:
         raise HTTPException(status_code=404, detail="Record not found")
     return record
 
 @router.get("/{record_id}/download")
-async def download_record(record_id: int, db: Session = Depends(get_db), user = Depends(get_current_user)):
-    record = db.query(Record).filter(Record.id == record_id, Record.patient_id == user.id).first()
+async def download_record(record_id: int, request: Request, db: AsyncSession = Depends(get_async_db), user = Depends(get_current_user)):
+    record = await db.scalar(
+        select(Record)
+        .options(load_only(Record.id, Record.storage_key, Record.content_hash))
+        .where(Record.id == record_id, Record.patient_id == user.id)
+    )
     if not record:
         raise HTTPException(status_code=404, detail="Record not found")
-    
+    # Give the connection back before any (possibly slow) storage I/O
+    await db.close()
+
+    # Determine file extension and MIME type
+    file_extension = os.path.splitext(record.storage_key)[1]
+    mime_type, _ = mimetypes.guess_type(f"file{file_extension}")
+    mime_type = mime_type or "application/octet-stream"
+    filename = f"health_record_{record.id}{file_extension}"
+
+    headers = {
+        "Content-Disposition": f"attachment; filename={filename}",
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, no-cache",
+    }
+    etag = f'"{record.content_hash}"' if record.content_hash else None
+    if etag:
+        headers["ETag"] = etag
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
     try:
-        # Get file content from storage
-        file_content = get_file_content(record.storage_key)
-        
-        # Determine file extension and MIME type
-        file_extension = os.path.splitext(record.storage_key)[1]
-        mime_type, _ = mimetypes.guess_type(f"file{file_extension}")
-        
-        # Generate filename
-        filename = f"health_record_{record.id}{file_extension}"
-        
-        # Return file as streaming response
-        return StreamingResponse(
-            iter([file_content]),
-            media_type=mime_type or "application/octet-stream",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
+        size = await run_in_threadpool(get_file_size, record.storage_key)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found in storage")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to download file: {str(e)}")
 
+    # If-Range: only honour the range if the client's copy is still current
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range != etag:
+        range_header = None
+    try:
+        byte_range = parse_range_header(range_header, size)
+    except RangeNotSatisfiable:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        path = local_path(record.storage_key)
+        if path:
+            # Served straight from disk; servers with a file-send extension avoid copying it through Python
+            return FileResponse(path, media_type=mime_type, headers=headers)
+        start, end, status_code = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        iter_file_range(record.storage_key, start, end) if size else iter(()),
+        status_code=status_code,
+        media_type=mime_type,
+        headers=headers,
+    )
+
+def _delete_record_rows(db, record: Record) -> Optional[str]:
+    # Drop this record's reference to the stored blob and its derived rows
+    orphaned_key = release_blob(db, record.storage_key)
+    uncount_records(db, [record])
+    unindex_records(db, [record])
+    db.delete(record)
+    return orphaned_key
+
 @router.delete("/{record_id}")
-async def delete_record(record_id: int, db: Session = Depends(get_db), user = Depends(get_current_user)):
-    print(f"Delete request for record_id: {record_id}, user_id: {user.id}")
-    
-    record = db.query(Record).filter(Record.id == record_id, Record.patient_id == user.id).first()
+async def delete_record(record_id: int, db: AsyncSession = Depends(get_async_db), user = Depends(get_current_user)):
+    record = await db.scalar(select(Record).where(Record.id == record_id, Record.patient_id == user.id))
     if not record:
-        print(f"Record not found: {record_id}")
         raise HTTPException(status_code=404, detail="Record not found")
-    
-    print(f"Found record: {record.id}, storage_key: {record.storage_key}")
-    
+
     try:
-        # Delete file from storage
-        from app.services.storage import delete_file
-        print(f"Deleting file from storage: {record.storage_key}")
-        delete_file(record.storage_key)
-        print("File deleted from storage successfully")
-        
-        # Delete record from database
-        print(f"Deleting record from database: {record.id}")
-        db.delete(record)
-        db.commit()
-        print("Record deleted from database successfully")
-        
+        orphaned_key = await db.run_sync(_delete_record_rows, record)
+        await db.commit()
+
+        # Only the last reference removes the file, and only once the DB agrees
+        if orphaned_key:
+            await run_in_threadpool(purge_blob, orphaned_key)
+        logger.info(f"Deleted record {record_id} for user {user.id}" + (f" and blob {orphaned_key}" if orphaned_key else ""))
         return {"message": "Record deleted successfully"}
     except Exception as e:
-        print(f"Error during delete: {str(e)}")
-        db.rollback()
+        logger.exception(f"Failed to delete record {record_id} for user {user.id}")
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to delete record: {str(e)}")
 
-@router.post("/tupload")
+@router.post("/tupload", status_code=202)
 async def upload_record_with_token(
     token: str,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    upload_token = db.query(UploadTokens).filter_by(token=token, used=False).first()
+    upload_token = await db.scalar(select(UploadTokens).where(UploadTokens.token == token, UploadTokens.used == False))
     if not upload_token:
         raise HTTPException(status_code=400, detail="Invalid or expired upload link")
 
-    # process uploaded file
-    content = await file.read()
-    storage_key, text, fields, doc_type = ingest_document(
-        upload_token.patient_id, file.filename, content
-    )
-
-    record = Record(
-        patient_id=upload_token.patient_id,
-        provider_name=upload_token.clinic_name,
-        provider_clinic=upload_token.clinic_name,
-        provider_specialty=upload_token.service_type,
-        document_type=doc_type,
-        storage_key=storage_key,
-        content_text=text,
-        structured_data=fields,
-    )
-
-    db.add(record)
-    upload_token.used = True
-    db.commit()
-    db.refresh(record)
+    # stage uploaded file; extraction happens in the ingestion workers
+    try:
+        job = await run_in_threadpool(
+            submit_upload, upload_token.patient_id, file.filename, file.file, upload_token.id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    enqueue_job(job.id)
 
-    return {"message": "Upload successful", "record_id": record.id}
\ No newline at end of file
+    return {"message": "Upload received", "job_id": job.id}
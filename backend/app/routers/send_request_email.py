@@ -1,11 +1,14 @@
-from email.mime.text import MIMEText
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, EmailStr
-import smtplib, ssl, uuid
-from app.database import get_db
-from app.models import UploadTokens, User
-from app.deps import get_current_user
+from typing import Optional
+import uuid
+from app.database import get_async_db
+from app.models import UploadTokens, OutboundEmail
+from app.deps import get_current_user, Principal
+from app.services.mailer import enqueue_email, mailer
 
 router = APIRouter(prefix="/requests", tags=["requests"])
 
@@ -17,29 +20,36 @@ class RequestEmail(BaseModel):
 class RequestEmailResponse(BaseModel):
     message: str
     link: str
-    patient_name: str  
+    patient_name: str
+    email_status: str
 
-@router.post("/send-email", response_model=RequestEmailResponse)
-def send_request_email(
+class EmailDelivery(BaseModel):
+    to_address: str
+    status: str  # queued | sending | sent | failed
+    attempts: int
+    last_error: Optional[str]
+    created_at: datetime
+    sent_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
+class RequestStatus(BaseModel):
+    clinic_name: Optional[str]
+    service_type: Optional[str]
+    used: bool
+    email: Optional[EmailDelivery]
+
+@router.post("/send-email", response_model=RequestEmailResponse, status_code=202)
+async def send_request_email(
     request: RequestEmail,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)  
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     patient_name = current_user.full_name or current_user.email or "Unknown Patient"
     token = str(uuid.uuid4())
     upload_link = f"http://localhost:3000/upload?token={token}"
 
-    # store token in DB
-    upload_token = UploadTokens(
-        token=token,
-        patient_id=current_user.id,
-        clinic_name=request.clinic_name,
-        service_type=request.service_type,
-    )
-    db.add(upload_token)
-    db.commit()
-    db.refresh(upload_token)
-
     subject = f"Request to upload {request.service_type} records for {patient_name}"
     body = f"""
 Hello,
@@ -52,25 +62,46 @@ Click the link below to securely log in and upload the records:
 Thank you.
 """
 
-    msg = MIMEText(body)
-    msg["Subject"] = subject
-    msg["From"] = "main.medstinc@gmail.com"
-    msg["To"] = request.email
-
-    try:
-        context = ssl.create_default_context()
-        with smtplib.SMTP("smtp.gmail.com", 587, timeout=20) as smtp:
-            smtp.ehlo()
-            smtp.starttls(context=context)
-            smtp.ehlo()
-            smtp.login("main.medstinc@gmail.com", "yaja lsbb xvbb ujwc")  # replace with a valid app password
-            smtp.send_message(msg)
+    # The token and its email are stored together; delivery happens in the background
+    upload_token = UploadTokens(
+        token=token,
+        patient_id=current_user.id,
+        clinic_name=request.clinic_name,
+        service_type=request.service_type,
+    )
+    db.add(upload_token)
+    await db.flush()
+    enqueue_email(db, request.email, subject, body, upload_token.id)
+    await db.commit()
+    mailer.notify()
 
-        return RequestEmailResponse(
-            message="Email sent successfully",
-            link=upload_link,
-            patient_name=patient_name
-        )
+    return RequestEmailResponse(
+        message="Email queued",
+        link=upload_link,
+        patient_name=patient_name,
+        email_status="queued",
+    )
 
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+@router.get("/{token}", response_model=RequestStatus)
+async def get_request_status(
+    token: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    upload_token = await db.scalar(
+        select(UploadTokens).where(UploadTokens.token == token, UploadTokens.patient_id == current_user.id)
+    )
+    if not upload_token:
+        raise HTTPException(status_code=404, detail="Request not found")
+    email = await db.scalar(
+        select(OutboundEmail)
+        .where(OutboundEmail.upload_token_id == upload_token.id)
+        .order_by(OutboundEmail.id.desc())
+        .limit(1)
+    )
+    return RequestStatus(
+        clinic_name=upload_token.clinic_name,
+        service_type=upload_token.service_type,
+        used=bool(upload_token.used),
+        email=EmailDelivery.model_validate(email) if email else None,
+    )
@@ -1,7 +1,6 @@
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
-from app.models import User
-from app.deps import get_current_user
+from app.deps import get_current_user, Principal
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -12,7 +11,7 @@ class CurrentUserOut(BaseModel):
     avatar_url: str | None = None
 
 @router.get("/me", response_model=CurrentUserOut)
-def get_current_user_endpoint(current_user: User = Depends(get_current_user)):
+def get_current_user_endpoint(current_user: Principal = Depends(get_current_user)):
     return {
         "email": current_user.email,
         "full_name": current_user.full_name or "Unknown User",
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from typing import Optional, List, Dict
-from datetime import datetime
+from datetime import date, datetime
 
 class Token(BaseModel):
     access_token: str
@@ -46,6 +46,28 @@ class RecordOut(BaseModel):
     class Config:
         from_attributes = True
 
+class IngestionJobOut(BaseModel):
+    id: str
+    status: str
+    filename: str
+    record_id: Optional[int]
+    error: Optional[str]
+    created_at: datetime
+    finished_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
+class RecordSearchHit(BaseModel):
+    id: int
+    document_type: Optional[str]
+    visit_date: Optional[str]
+    provider_name: Optional[str]
+    provider_clinic: Optional[str]
+    created_at: datetime
+    rank: float
+    snippet: Optional[str]  # matches wrapped in <mark>
+
 class ConsentRequest(BaseModel):
     requester_name: str
     requester_dob: Optional[str] = None
@@ -60,3 +82,27 @@ class AnalyticsQuery(BaseModel):
     patient_id: int
     range_start: Optional[str] = None
     range_end: Optional[str] = None
+
+class LabTestOut(BaseModel):
+    test: str
+    unit: str
+    count: int
+    first_taken: date
+    last_taken: date
+
+class LabTrendPoint(BaseModel):
+    bucket: str  # ISO date the bucket starts on
+    mean: float
+    min: float
+    max: float
+    count: int
+    rolling_mean: float
+    rolling_min: float
+    rolling_max: float
+
+class LabTrendOut(BaseModel):
+    test: str
+    unit: Optional[str]
+    bucket: str
+    window: int
+    points: List[LabTrendPoint]
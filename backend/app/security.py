@@ -1,10 +1,17 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from passlib.context import CryptContext
 import jwt
 from app.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=[scheme.strip() for scheme in settings.password_schemes.split(",") if scheme.strip()],
+    deprecated="auto",
+    argon2__time_cost=settings.argon2_time_cost,
+    argon2__memory_cost=settings.argon2_memory_cost,
+    argon2__parallelism=settings.argon2_parallelism,
+    bcrypt__rounds=settings.bcrypt_rounds,
+)
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -12,6 +19,10 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, hashed: str) -> bool:
     return pwd_context.verify(password, hashed)
 
+def verify_and_update_password(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """Verify, and return a new hash when the stored one uses an old scheme or cost."""
+    return pwd_context.verify_and_update(password, hashed)
+
 def create_access_token(subject: str, expires_minutes: Optional[int] = None) -> str:
     expire = datetime.utcnow() + timedelta(minutes=expires_minutes or settings.access_token_expire_minutes)
     payload = {"sub": subject, "exp": expire}
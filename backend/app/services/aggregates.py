@@ -0,0 +1,126 @@
+import re
+from collections import Counter
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import load_only
+from app.models import Record, PatientTermCount, PatientMonthCount
+
+# Per-patient analytics are kept as running counts, updated in the same
+# transaction that creates or deletes a Record, so the summary never scans records.
+
+ISO_MONTH = re.compile(r"^(\d{4}-\d{2})(?:-\d{2})?$")
+TERM_KINDS = (("diagnosis", "diagnosis"), ("medications", "medication"))
+MAX_TERM_LENGTH = 255
+
+def record_month(record: Record) -> str:
+    """The month a record is filed under: its visit date if parsed, otherwise its upload date."""
+    m = ISO_MONTH.match(record.visit_date or "")
+    if m:
+        return m.group(1)
+    return (record.created_at or datetime.utcnow()).strftime("%Y-%m")
+
+def _record_deltas(record: Record, term_counts: Counter, month_counts: Counter, sign: int) -> None:
+    month = record_month(record)
+    month_counts[(record.patient_id, month)] += sign
+    data = record.structured_data or {}
+    for field, kind in TERM_KINDS:
+        for term in data.get(field) or []:
+            term = str(term).strip()[:MAX_TERM_LENGTH]
+            if term:
+                term_counts[(record.patient_id, kind, month, term)] += sign
+
+def _upsert(db, model, keys: Tuple[str, ...], counts: Counter) -> None:
+    rows = [dict(zip(keys, key), count=n) for key, n in counts.items() if n]
+    if not rows:
+        return
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(model).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={"count": model.count + stmt.excluded.count},
+    )
+    db.execute(stmt)
+
+def _apply(db, records: Iterable[Record], sign: int) -> None:
+    term_counts: Counter = Counter()
+    month_counts: Counter = Counter()
+    patients = set()
+    for record in records:
+        _record_deltas(record, term_counts, month_counts, sign)
+        patients.add(record.patient_id)
+    if not patients:
+        return
+    _upsert(db, PatientTermCount, ("patient_id", "kind", "month", "term"), term_counts)
+    _upsert(db, PatientMonthCount, ("patient_id", "month"), month_counts)
+    if sign < 0:
+        db.query(PatientTermCount).filter(
+            PatientTermCount.patient_id.in_(patients), PatientTermCount.count <= 0
+        ).delete(synchronize_session=False)
+        db.query(PatientMonthCount).filter(
+            PatientMonthCount.patient_id.in_(patients), PatientMonthCount.count <= 0
+        ).delete(synchronize_session=False)
+
+def count_records(db, records: Iterable[Record]) -> None:
+    """Add new records to their patients' aggregates. The caller commits."""
+    _apply(db, records, 1)
+
+def uncount_records(db, records: Iterable[Record]) -> None:
+    """Remove records that are being deleted from their patients' aggregates. The caller commits."""
+    _apply(db, records, -1)
+
+def rebuild_aggregates(db, patient_id: Optional[int] = None) -> int:
+    """Recompute aggregates from the records table (all patients, or one). Returns records counted."""
+    for model in (PatientTermCount, PatientMonthCount):
+        q = db.query(model)
+        if patient_id is not None:
+            q = q.filter(model.patient_id == patient_id)
+        q.delete(synchronize_session=False)
+
+    q = db.query(Record).options(
+        load_only(Record.patient_id, Record.visit_date, Record.created_at, Record.structured_data)
+    )
+    if patient_id is not None:
+        q = q.filter(Record.patient_id == patient_id)
+    records = q.all()
+    count_records(db, records)
+    return len(records)
+
+def backfill_aggregates(db) -> int:
+    """Build the aggregates for databases that had records before they existed. The caller commits."""
+    if db.query(PatientMonthCount.patient_id).first() or not db.query(Record.id).first():
+        return 0
+    return rebuild_aggregates(db)
+
+def _in_range(query, column, start: Optional[str], end: Optional[str]):
+    if start:
+        query = query.filter(column >= start)
+    if end:
+        query = query.filter(column <= end)
+    return query
+
+def month_counts(db, patient_id: int, start: Optional[str] = None, end: Optional[str] = None) -> List[Tuple[str, int]]:
+    q = db.query(PatientMonthCount.month, PatientMonthCount.count).filter(PatientMonthCount.patient_id == patient_id)
+    q = _in_range(q, PatientMonthCount.month, start, end)
+    return [(month, count) for month, count in q.order_by(PatientMonthCount.month).all()]
+
+def top_terms(
+    db, patient_id: int, kind: str, start: Optional[str] = None, end: Optional[str] = None, limit: int = 10
+) -> List[Tuple[str, int]]:
+    total = func.sum(PatientTermCount.count)
+    q = db.query(PatientTermCount.term, total).filter(
+        PatientTermCount.patient_id == patient_id, PatientTermCount.kind == kind
+    )
+    q = _in_range(q, PatientTermCount.month, start, end)
+    rows = q.group_by(PatientTermCount.term).order_by(total.desc(), PatientTermCount.term).limit(limit).all()
+    return [(term, int(count)) for term, count in rows]
+
+def summarize(db, patient_id: int, start: Optional[str] = None, end: Optional[str] = None) -> dict:
+    by_month = month_counts(db, patient_id, start, end)
+    return {
+        "total_records": sum(count for _, count in by_month),
+        "top_diagnoses": top_terms(db, patient_id, "diagnosis", start, end),
+        "top_medications": top_terms(db, patient_id, "medication", start, end),
+        "records_by_month": by_month,
+    }
@@ -0,0 +1,65 @@
+from typing import BinaryIO, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import Blob
+from app.services.storage import delete_file, generate_storage_key, save_stream
+
+def acquire_blob(db: Session, content_hash: str, size: int, filename: str, fileobj: BinaryIO) -> Blob:
+    """
+    Take a reference on the blob for `content_hash`, uploading the file only if no
+    copy is stored yet. The caller commits.
+    """
+    blob = db.query(Blob).filter(Blob.content_hash == content_hash).with_for_update().first()
+    if blob:
+        # A released blob awaiting purge_blob still has its file; taking a reference keeps it
+        blob.ref_count += 1
+        return blob
+
+    storage_key = generate_storage_key(content_hash, filename)
+    save_stream(fileobj, storage_key)
+    try:
+        with db.begin_nested():
+            blob = Blob(content_hash=content_hash, storage_key=storage_key, size=size, ref_count=1)
+            db.add(blob)
+    except IntegrityError:
+        # A concurrent upload of the same bytes created the row first; the object is identical
+        blob = db.query(Blob).filter(Blob.content_hash == content_hash).with_for_update().one()
+        blob.ref_count += 1
+    return blob
+
+def release_blob(db: Session, storage_key: str) -> Optional[str]:
+    """
+    Drop one reference to the blob at `storage_key`. Returns the key to pass to
+    purge_blob (after the caller commits) once the last reference is gone, else None.
+    The row stays, with no references, until purge_blob removes it with the file.
+    Keys without a Blob row predate deduplication and are owned by a single record.
+    """
+    blob = db.query(Blob).filter(Blob.storage_key == storage_key).with_for_update().first()
+    if not blob:
+        return storage_key
+    blob.ref_count = max(blob.ref_count - 1, 0)
+    return storage_key if blob.ref_count == 0 else None
+
+def purge_blob(storage_key: str) -> bool:
+    """
+    Delete a released blob's file and row, unless it was acquired again in the
+    meantime. The row stays locked while the file is deleted, so a concurrent
+    acquire_blob either waits and then uploads a fresh copy, or takes its reference
+    first and the file is kept. Returns whether the file was deleted.
+    """
+    with SessionLocal() as db:
+        blob = db.query(Blob).filter(Blob.storage_key == storage_key).with_for_update().first()
+        if blob is not None and blob.ref_count > 0:
+            return False
+        delete_file(storage_key)
+        if blob is not None:
+            db.delete(blob)
+        db.commit()
+    return True
+
+def purge_orphaned_blobs() -> int:
+    """Purge blobs released by a process that died before it could purge them."""
+    with SessionLocal() as db:
+        keys = db.query(Blob.storage_key).filter(Blob.ref_count <= 0).all()
+    return sum(purge_blob(key) for key, in keys)
@@ -0,0 +1,174 @@
+import asyncio
+import copy
+import os
+import tempfile
+import zipfile
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Record
+from app.services.blobs import purge_blob, release_blob
+from app.services.aggregates import count_records
+from app.services.search import index_records
+from app.services.ingestion import detect_type, stage_document, extraction_cache
+from app.services.jobs import build_record, ingest_in_pool
+from app.utils.logging import logger
+from app.utils.metrics import ingest_stage_seconds, record_ingestion
+
+def _iter_zip_entries(fileobj: BinaryIO) -> Iterator[Tuple[str, Optional[BinaryIO], Optional[str]]]:
+    """
+    Stream entries out of a ZIP one at a time into a spooled temp file, enforcing
+    MAX_UPLOAD_BYTES on the decompressed size (the header size is not trusted).
+    """
+    with zipfile.ZipFile(fileobj) as archive:
+        for info in archive.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or not name or name.startswith(".") or "__MACOSX" in info.filename:
+                continue
+            spooled = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+            written = 0
+            with archive.open(info) as src:
+                for chunk in iter(lambda: src.read(settings.upload_chunk_bytes), b""):
+                    written += len(chunk)
+                    if written > settings.max_upload_bytes:
+                        break
+                    spooled.write(chunk)
+            if written > settings.max_upload_bytes:
+                spooled.close()
+                yield name, None, f"File exceeds the {settings.max_upload_bytes} byte limit"
+                continue
+            spooled.seek(0)
+            try:
+                yield name, spooled, None
+            finally:
+                spooled.close()
+
+def iter_upload_entries(files: List[UploadFile]) -> Iterator[Tuple[str, Optional[BinaryIO], Optional[str]]]:
+    """Yield (filename, file object, error) for every uploaded file, expanding ZIP archives."""
+    for upload in files:
+        if upload.filename.lower().endswith(".zip"):
+            try:
+                yield from _iter_zip_entries(upload.file)
+            except zipfile.BadZipFile:
+                yield upload.filename, None, "Not a valid ZIP archive"
+        else:
+            yield upload.filename, upload.file, None
+
+def _stage_all(db, files: List[UploadFile], manifest: List[dict], staged: List[Tuple[dict, str, str, str]]) -> None:
+    """Stage each file into `staged` as it goes, so the caller can release whatever was staged if a later step fails."""
+    for filename, fileobj, error in iter_upload_entries(files):
+        if len(manifest) >= settings.bulk_max_files:
+            manifest.append({"filename": filename, "status": "rejected", "record_id": None,
+                             "error": f"More than {settings.bulk_max_files} files in one request"})
+            break
+        item = {"filename": filename, "status": "rejected", "record_id": None, "error": error}
+        manifest.append(item)
+        if error:
+            continue
+        try:
+            storage_key, content_hash = stage_document(db, filename, fileobj)
+        except ValueError as e:
+            item["error"] = str(e)
+            continue
+        # One commit per file, so a blob's row lock is only held while its own file is stored
+        db.commit()
+        staged.append((item, filename, storage_key, content_hash))
+
+def _release_staged(db, staged) -> List[str]:
+    """Give back the blob references taken by _stage_all; returns storage keys to purge."""
+    db.rollback()
+    orphaned = [key for _, _, storage_key, _ in staged if (key := release_blob(db, storage_key))]
+    db.commit()
+    return orphaned
+
+def _existing_extractions(db, patient_id: int, hashes: List[str]) -> Dict[str, Tuple[str, dict, str]]:
+    # The patient's own records only; see jobs.complete_from_duplicate
+    rows = (
+        db.query(Record.content_hash, Record.content_text, Record.structured_data, Record.document_type)
+        .filter(Record.patient_id == patient_id, Record.content_hash.in_(hashes), Record.content_text.isnot(None))
+        .all()
+    )
+    return {h: (text, data or {}, doc_type) for h, text, data, doc_type in rows}
+
+def _save_records(db, patient_id: int, staged, results) -> List[str]:
+    """Insert every successful record in one transaction; returns storage keys to delete."""
+    records = []
+    orphaned = []
+    for item, filename, storage_key, content_hash in staged:
+        result = results.get(content_hash)
+        if isinstance(result, Exception):
+            item["status"] = "failed"
+            item["error"] = str(result) or result.__class__.__name__
+            key = release_blob(db, storage_key)
+            if key:
+                orphaned.append(key)
+            continue
+        text, fields, doc_type = result
+        record = build_record(patient_id, storage_key, content_hash, text, copy.deepcopy(fields), doc_type)
+        records.append((item, record))
+
+    db.add_all([record for _, record in records])
+    db.flush()  # one batched INSERT ... RETURNING for the ids
+    count_records(db, [record for _, record in records])
+    index_records(db, [record for _, record in records])
+    for item, record in records:
+        item["status"] = "created"
+        item["record_id"] = record.id
+    db.commit()
+    return orphaned
+
+async def ingest_bulk(patient_id: int, files: List[UploadFile]) -> List[dict]:
+    """
+    Stage every file (expanding ZIPs), extract each distinct document once in the
+    ingestion worker pool with bounded concurrency, then insert all records in a
+    single transaction. Returns a per-file manifest.
+    """
+    # Staging mixes DB and storage I/O, so the session is only ever used from worker threads
+    with SessionLocal() as db:
+        return await _ingest_bulk(db, patient_id, files)
+
+async def _ingest_bulk(db, patient_id: int, files: List[UploadFile]) -> List[dict]:
+    manifest: List[dict] = []
+    staged: List[Tuple[dict, str, str, str]] = []
+    try:
+        orphaned = await _ingest_staged(db, patient_id, files, manifest, staged)
+    except Exception:
+        # Nothing was saved, so no record holds the references that were taken
+        orphaned = await run_in_threadpool(_release_staged, db, staged)
+        for key in orphaned:
+            await run_in_threadpool(purge_blob, key)
+        raise
+    for key in orphaned:
+        await run_in_threadpool(purge_blob, key)
+    return manifest
+
+async def _ingest_staged(db, patient_id: int, files: List[UploadFile], manifest: List[dict], staged) -> List[str]:
+    await run_in_threadpool(_stage_all, db, files, manifest, staged)
+    hashes = list({content_hash for _, _, _, content_hash in staged})
+
+    results: Dict[str, object] = await run_in_threadpool(_existing_extractions, db, patient_id, hashes) if hashes else {}
+    for item, _, _, content_hash in staged:
+        item["deduplicated"] = content_hash in results
+    pending = {content_hash: (storage_key, filename) for _, filename, storage_key, content_hash in staged if content_hash not in results}
+
+    semaphore = asyncio.Semaphore(settings.bulk_concurrency or os.cpu_count() or 1)
+
+    async def ingest_one(content_hash: str, storage_key: str, filename: str) -> None:
+        async with semaphore:
+            try:
+                text, fields, doc_type, info = await ingest_in_pool(storage_key, filename, content_hash)
+                extraction_cache.record(info)
+                record_ingestion(info)
+                results[content_hash] = (text, fields, doc_type)
+            except Exception as e:
+                logger.exception(f"Bulk ingestion of {filename} failed")
+                record_ingestion({"document_type": detect_type(filename)}, outcome="failed")
+                results[content_hash] = e
+
+    await asyncio.gather(*(ingest_one(h, key, name) for h, (key, name) in pending.items()))
+
+    # One transaction for the whole batch, so the store stage is timed per batch
+    with ingest_stage_seconds.time("store", "bulk"):
+        return await run_in_threadpool(_save_records, db, patient_id, staged, results)
@@ -0,0 +1,369 @@
+import math
+import re
+import time
+from collections import Counter, defaultdict
+from itertools import islice
+from typing import Collection, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import func, or_, select
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.models import Clinic
+from app.services import clinics
+from app.utils.geo import EARTH_RADIUS_KM, encode_geohash, geohash_cell_size, haversine_km, parse_lat_lng
+
+# /clinics/search is answered from the clinics table through an in-process index:
+# a geohash grid for nearest-neighbour lookups and trigram postings over names.
+# The Places API is only used when the directory has no match, and what it
+# returns is saved to the directory for next time.
+
+GEOHASH_PRECISION = 9  # stored (~5 m)
+GRID_PRECISION = 5     # indexed (~4.9 km cells)
+NAME_MATCH_THRESHOLD = 0.5
+IMPORT_CHUNK_SIZE = 500  # rows looked up against the table per query
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180.0
+
+# Query words that name a kind of clinic rather than part of its name
+TYPE_WORDS = {
+    "dentist": "dentist", "dentists": "dentist", "dental": "dentist",
+    "doctor": "doctor", "doctors": "doctor", "gp": "doctor", "gps": "doctor",
+    "hospital": "hospital", "hospitals": "hospital",
+    "pharmacy": "pharmacy", "pharmacies": "pharmacy", "chemist": "pharmacy", "chemists": "pharmacy",
+    "physio": "physiotherapist", "physios": "physiotherapist", "physiotherapy": "physiotherapist",
+    "physiotherapist": "physiotherapist", "physiotherapists": "physiotherapist",
+}
+FILLER_WORDS = frozenset({"a", "at", "clinic", "clinics", "in", "near", "the"})
+WORD = re.compile(r"[a-z0-9]+")
+TYPE_SEPARATORS = re.compile(r"[,;|]")
+
+def words(value: Optional[str]) -> List[str]:
+    return WORD.findall((value or "").lower())
+
+def trigrams(value: Optional[str]) -> Set[str]:
+    """pg_trgm-style trigrams: each word padded with two spaces in front and one behind."""
+    grams = set()
+    for w in words(value):
+        padded = f"  {w} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def parse_query(query: str, areas: Collection[str] = ()) -> Tuple[Set[str], str, Optional[str]]:
+    """
+    "dentists in carlton" -> ({"dentist"}, "", "carlton"): clinic kinds, the words
+    left to match names, and the suburb or postcode (a key of `areas`) that the
+    last of those words name, tried longest first before they are taken as a name.
+    """
+    kinds, rest = set(), []
+    for w in words(query):
+        if w in TYPE_WORDS:
+            kinds.add(TYPE_WORDS[w])
+        elif w not in FILLER_WORDS:
+            rest.append(w)
+    for n in range(len(rest), 0, -1):
+        area = " ".join(rest[-n:])
+        if area in areas:
+            return kinds, " ".join(rest[:-n]), area
+    return kinds, " ".join(rest), None
+
+def _ring(rows: int, cols: int, inner_cols: int):
+    """(row, column) offsets in the rows x cols rectangle around a cell that are not in the previous, smaller one."""
+    for i in range(-rows, rows + 1):
+        for j in range(-cols, cols + 1):
+            if abs(i) == rows or abs(j) > inner_cols:
+                yield i, j
+
+class ClinicIndex:
+    """Immutable snapshot of the directory. Build a new one rather than updating it."""
+
+    def __init__(self, entries: List[dict]):
+        self.entries = entries
+        self.built_at = time.monotonic()
+        self.cells: Dict[str, List[int]] = defaultdict(list)
+        self.grams: Dict[str, Set[int]] = defaultdict(set)
+        self.by_type: Dict[str, Set[int]] = defaultdict(set)
+        areas = defaultdict(lambda: [0.0, 0.0, 0])
+        for i, e in enumerate(entries):
+            self.cells[e["geohash"][:GRID_PRECISION]].append(i)
+            for gram in trigrams(e["name"]):
+                self.grams[gram].add(i)
+            for kind in e["types"]:
+                self.by_type[kind].add(i)
+            for area in (e["suburb"], e["postcode"]):
+                key = clinics.normalize(area)
+                if key:
+                    acc = areas[key]
+                    acc[0] += e["lat"]
+                    acc[1] += e["lng"]
+                    acc[2] += 1
+        # Suburbs and postcodes resolve to the centroid of their clinics
+        self.areas = {key: (lat / n, lng / n) for key, (lat, lng, n) in areas.items()}
+        lats = [e["lat"] for e in entries]
+        self.lat_range = (min(lats), max(lats)) if lats else None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def locate(self, location: str) -> Optional[Tuple[float, float]]:
+        """"lat,lng", or a suburb or postcode the directory has clinics in."""
+        point = parse_lat_lng(location)
+        if point:
+            return point
+        return self.areas.get(clinics.normalize(location)) or self.areas.get(clinics.normalize(location.split(",")[0]))
+
+    def matching(self, kinds: Set[str], name: str) -> Optional[Dict[int, float]]:
+        """{entry: name score} for entries of `kinds` matching `name`, or None if that is everything."""
+        scores = None
+        if name:
+            wanted = trigrams(name)
+            shared = Counter()
+            for gram in wanted:
+                shared.update(self.grams.get(gram, ()))
+            scores = {i: n / len(wanted) for i, n in shared.items() if n / len(wanted) >= NAME_MATCH_THRESHOLD}
+        if kinds:
+            typed = set().union(*(self.by_type.get(kind, set()) for kind in kinds))
+            scores = dict.fromkeys(typed, 1.0) if scores is None else {i: s for i, s in scores.items() if i in typed}
+        return scores
+
+    def nearest(self, lat: float, lng: float, scores: Optional[Dict[int, float]], limit: int, radius_km: float) -> Dict[int, float]:
+        """{entry: km} for the `limit` closest matches within `radius_km`, searching outward ring by ring."""
+        radius_deg = radius_km / KM_PER_DEGREE_LAT
+        if self.lat_range is None or not self.lat_range[0] - radius_deg <= lat <= self.lat_range[1] + radius_deg:
+            return {}  # nowhere near any clinic
+
+        dlat, dlng = geohash_cell_size(GRID_PRECISION)
+        step = dlat * KM_PER_DEGREE_LAT  # cell height, the same everywhere
+        rows = math.ceil(radius_km / step)
+        # Cells narrow toward the poles, so a ring needs more columns than rows to
+        # reach as far east and west as it does north and south. Size them for the
+        # most poleward latitude searched, and never beyond the whole circle.
+        edge_lat = min(abs(lat) + (rows + 1) * dlat, 90.0)
+        cell_width = haversine_km(edge_lat, 0.0, edge_lat, dlng)
+        half_circle = int(180.0 / dlng)
+        cols_per_row = step / cell_width if cell_width > step / half_circle else half_circle
+        cols = [min(math.ceil(r * cols_per_row), half_circle) for r in range(rows + 1)]
+
+        candidates = range(len(self.entries)) if scores is None else scores
+        if (2 * rows + 1) * (2 * cols[-1] + 1) > len(candidates):
+            # Fewer candidates than cells to visit (sparse index, or near a pole): check them all
+            found = {}
+            for entry in candidates:
+                e = self.entries[entry]
+                distance = haversine_km(lat, lng, e["lat"], e["lng"])
+                if distance <= radius_km:
+                    found[entry] = distance
+            return dict(sorted(found.items(), key=lambda item: item[1])[:limit])
+
+        found: Dict[int, float] = {}
+        for radius in range(rows + 1):
+            for i, j in _ring(radius, cols[radius], cols[radius - 1] if radius else -1):
+                cell_lat = lat + i * dlat
+                if not -90.0 <= cell_lat <= 90.0:
+                    continue
+                cell_lng = (lng + j * dlng + 180.0) % 360.0 - 180.0
+                for entry in self.cells.get(encode_geohash(cell_lat, cell_lng, GRID_PRECISION), ()):
+                    if scores is None or entry in scores:
+                        e = self.entries[entry]
+                        distance = haversine_km(lat, lng, e["lat"], e["lng"])
+                        if distance <= radius_km:
+                            found[entry] = distance
+            # Everything within radius * step km of the point has been seen once a ring is done
+            covered = radius * step
+            if sum(1 for d in found.values() if d <= covered) >= limit:
+                break
+        return dict(sorted(found.items(), key=lambda item: item[1])[:limit])
+
+    def search(
+        self,
+        query: str,
+        center: Optional[Tuple[float, float]] = None,
+        area: Optional[str] = None,
+        limit: int = 20,
+        radius_km: float = 25.0,
+    ) -> List[dict]:
+        """
+        Closest matches to `center`; without one, nearest to a suburb or postcode
+        named in the query, else best name matches (restricted to `area` text if given).
+        """
+        kinds, name, named_area = parse_query(query, self.areas if center is None and not area else ())
+        if named_area:
+            center = self.areas[named_area]
+        scores = self.matching(kinds, name)
+        if center:
+            near = self.nearest(center[0], center[1], scores, limit, radius_km)
+            return [_hit(self.entries[i], d) for i, d in near.items()]
+
+        candidates = range(len(self.entries)) if scores is None else scores
+        if area:
+            key = clinics.normalize(area)
+            candidates = [i for i in candidates if key in self.entries[i]["area_text"]]
+        ranked = sorted(
+            candidates,
+            key=lambda i: (-(scores[i] if scores else 1.0), -(self.entries[i]["rating"] or 0), self.entries[i]["name"]),
+        )
+        return [_hit(self.entries[i], None) for i in ranked[:limit]]
+
+def _hit(entry: dict, distance: Optional[float]) -> dict:
+    return {
+        "name": entry["name"],
+        "address": entry["address"],
+        "rating": entry["rating"],
+        "user_ratings_total": entry["user_ratings_total"],
+        "place_id": entry["place_id"],
+        "phone": entry["phone"],
+        "types": sorted(entry["types"]),
+        "lat": entry["lat"],
+        "lng": entry["lng"],
+        "distance_km": round(distance, 2) if distance is not None else None,
+    }
+
+INDEX_COLUMNS = select(
+    Clinic.name, Clinic.address, Clinic.suburb, Clinic.postcode, Clinic.lat, Clinic.lng, Clinic.geohash,
+    Clinic.types, Clinic.phone, Clinic.rating, Clinic.user_ratings_total, Clinic.place_id,
+)
+
+def build_index(rows) -> ClinicIndex:
+    entries = []
+    for row in rows:
+        entry = row._asdict()
+        entry["types"] = {t for t in (row.types or "").split(",") if t}
+        entry["area_text"] = clinics.normalize(" ".join(filter(None, (row.address, row.suburb, row.postcode))))
+        entries.append(entry)
+    return ClinicIndex(entries)
+
+class ClinicDirectory:
+    """
+    Holds the current ClinicIndex for this process. It is rebuilt after local
+    writes and at least every `ttl` seconds, to pick up other processes' imports.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._index: Optional[ClinicIndex] = None
+        self.loads = 0
+
+    async def index(self, db) -> ClinicIndex:
+        index = self._index
+        if index is None or time.monotonic() - index.built_at > self.ttl:
+            rows = (await db.execute(INDEX_COLUMNS)).all()
+            # Building takes a while for large directories; keep it off the event loop
+            index = self._index = await run_in_threadpool(build_index, rows)
+            self.loads += 1
+        return index
+
+    def invalidate(self) -> None:
+        self._index = None
+
+    def stats(self) -> dict:
+        return {"clinics": len(self._index) if self._index else None, "loads": self.loads}
+
+directory = ClinicDirectory(settings.clinic_index_ttl_seconds)
+
+def clinic_fields(row: dict, source: str = "import") -> Optional[dict]:
+    """Column values for one imported row (CSV/JSON or a Places result), or None without a name and position."""
+    try:
+        lat, lng = float(row["lat"]), float(row["lng"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    name = (row.get("name") or "").strip()
+    if not name or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    types = row.get("types") or []
+    if isinstance(types, str):
+        types = TYPE_SEPARATORS.split(types)
+    rating, ratings_total = row.get("rating"), row.get("user_ratings_total")
+    return {
+        "place_id": row.get("place_id") or None,
+        "name": name[:255],
+        "address": (row.get("address") or None),
+        "suburb": (row.get("suburb") or None),
+        "postcode": (str(row["postcode"]).strip() if row.get("postcode") else None),
+        "lat": lat,
+        "lng": lng,
+        "geohash": encode_geohash(lat, lng, GEOHASH_PRECISION),
+        "types": ",".join(sorted({t.strip().lower() for t in types if t and t.strip()})) or None,
+        "phone": row.get("phone") or None,
+        "rating": float(rating) if rating not in (None, "") else None,
+        "user_ratings_total": int(ratings_total) if ratings_total not in (None, "") else None,
+        "source": source,
+    }
+
+def _existing_clinics(db, rows: List[dict]) -> List[Clinic]:
+    """Clinics that share a place_id or a name with `rows`; the only ones they can update."""
+    place_ids = {f["place_id"] for f in rows if f["place_id"]}
+    names = {f["name"] for f in rows}
+    if not names:
+        return []
+    # Exact names too: SQLite's lower() only folds ASCII
+    lowered = {name.lower() for name in names}
+    query = select(Clinic).where(
+        or_(Clinic.place_id.in_(place_ids), Clinic.name.in_(names), func.lower(Clinic.name).in_(lowered))
+    )
+    return db.execute(query).scalars().all()
+
+def import_clinics(db, rows: Iterable[dict], source: str = "import") -> Dict[str, int]:
+    """
+    Upsert clinics, matching existing ones by place_id, else by name and address.
+    Fields missing from a row are left as they were. The caller commits.
+    """
+    by_place: Dict[str, Clinic] = {}
+    by_name: Dict[Tuple[str, str], Clinic] = {}
+    counts = Counter(created=0, updated=0, skipped=0)
+    rows = iter(rows)
+    while chunk := list(islice(rows, IMPORT_CHUNK_SIZE)):
+        prepared = []
+        for row in chunk:
+            fields = clinic_fields(row, source)
+            if fields is None:
+                counts["skipped"] += 1
+            else:
+                prepared.append(fields)
+        for c in _existing_clinics(db, prepared):
+            if c.place_id:
+                by_place.setdefault(c.place_id, c)
+            by_name.setdefault((c.name.lower(), (c.address or "").lower()), c)
+        for fields in prepared:
+            key = (fields["name"].lower(), (fields["address"] or "").lower())
+            clinic = by_place.get(fields["place_id"]) or by_name.get(key)
+            if clinic is None:
+                clinic = Clinic(**fields)
+                db.add(clinic)
+                counts["created"] += 1
+            else:
+                for name, value in fields.items():
+                    if value is not None:
+                        setattr(clinic, name, value)
+                counts["updated"] += 1
+            if clinic.place_id:
+                by_place[clinic.place_id] = clinic
+            by_name[key] = clinic
+    db.flush()
+    return dict(counts)
+
+async def _geocode(location: str) -> Optional[Tuple[float, float]]:
+    try:
+        return parse_lat_lng(await clinics.geocode_location(location))
+    except clinics.ClinicSearchUnavailable:
+        return None
+
+async def search(db, query: str, location: Optional[str] = None, limit: int = 20) -> Tuple[List[dict], str]:
+    """
+    Clinics matching `query`, nearest first when `location` is given.
+    Returns (results, source), where source is "directory" or "places".
+    """
+    index = await directory.index(db)
+    center = index.locate(location) if location else None
+    if location and center is None and settings.clinic_remote_fallback:
+        center = await _geocode(location)
+    # Ranking walks the grid (or the whole directory); keep it off the event loop
+    hits = await run_in_threadpool(
+        index.search, query, center, location if center is None else None, limit, settings.clinic_search_radius_km
+    )
+    if hits or not settings.clinic_remote_fallback:
+        return hits, "directory"
+
+    # Nothing local: ask the Places API, and keep what it finds
+    places = await clinics.search_clinics(query, location)
+    if places:
+        await db.run_sync(import_clinics, places, "places")
+        await db.commit()
+        directory.invalidate()
+    return places[:limit], "places"
@@ -1,70 +1,233 @@
-import requests
-from typing import List, Dict, Optional
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
 from app.config import settings
 
-GOOGLE_PLACES_TEXT_URL = "https://maps.googleapis.com/maps/api/place/textsearch/json"
-GOOGLE_PLACES_NEARBY_URL = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
-GOOGLE_GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+# Paths under settings.places_api_url (Google Maps by default, or tools/fake_places.py locally)
+PLACES_TEXT_PATH = "place/textsearch/json"
+PLACES_NEARBY_PATH = "place/nearbysearch/json"
+GEOCODE_PATH = "geocode/json"
 
+# Recognized medical related place types
+MEDICAL_TYPES = {"doctor", "dentist", "hospital", "pharmacy", "physiotherapist"}
 
-def geocode_location(location: str) -> Optional[str]:
-    """
-    Convert a location (suburb, postcode, or address) into lat,lng
-    """
-    # Add country context for more accurate geocoding
-    params = {"address": f"{location}, Australia", "key": settings.google_api_key}
-    resp = requests.get(GOOGLE_GEOCODE_URL, params=params)
-    data = resp.json()
+# Google reports quota and key problems with HTTP 200 and one of these statuses
+OK_STATUSES = {"OK", "ZERO_RESULTS"}
+
+_MISS = object()
+
+
+class ClinicSearchUnavailable(Exception):
+    """The places API could not be reached or refused the request."""
+
+
+class TTLCache:
+    """LRU with a per-entry lifetime. Only used from the event loop, so it needs no lock."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
 
-    if data.get("results"):
-        loc = data["results"][0]["geometry"]["location"]
-        return f"{loc['lat']},{loc['lng']}"
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
 
-    return None
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_entries <= 0 or self.ttl <= 0:
+            return
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
 
+    def clear(self) -> None:
+        self._entries.clear()
 
-def search_clinics(query: str, location: Optional[str] = None) -> List[Dict]:
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def normalize(value: Optional[str]) -> str:
+    return " ".join((value or "").lower().split())
+
+
+class ClinicSearchClient:
     """
-    If a location is provided -> use Nearby Search (places near suburb).
-    If no location -> use Text Search (best match, no radius constraint).
+    Places API client sharing one pooled HTTP connection set. Geocodes and search
+    results are cached by normalized (query, location), and concurrent identical
+    lookups wait on a single upstream call instead of each making their own.
     """
-    results = []
-
-    # Recognized medical related keywords
-    medical_types = {"doctor", "dentist", "hospital", "pharmacy", "physiotherapist"}
-
-    if location:
-        coords = geocode_location(location)
-        if coords:
-            # Nearby Search: find nearby places around suburb/postcode
-            params = {
-                "location": coords,
-                "rankby": "distance",
-                "keyword": query,
-                "type": "doctor",
-                "key": settings.google_api_key,
-            }
-            resp = requests.get(GOOGLE_PLACES_NEARBY_URL, params=params)
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        timeout: float,
+        max_connections: int,
+        search_ttl: float,
+        geocode_ttl: float,
+        max_entries: int,
+    ):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.searches = TTLCache(max_entries, search_ttl)
+        self.geocodes = TTLCache(max_entries, geocode_ttl)
+        self._http = None
+        self._loop = None
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.upstream_calls = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def _client(self):
+        # The connection pool belongs to one event loop; start afresh if the loop changed
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._loop is not loop:
+            import httpx  # imported on first use to keep startup fast
+
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+            self._loop = loop
+            self._inflight.clear()
+        return self._http
+
+    async def _get_json(self, path: str, params: dict) -> dict:
+        import httpx
+
+        self.upstream_calls += 1
+        try:
+            resp = await self._client().get(path, params={**params, "key": self.api_key})
+            resp.raise_for_status()
+            data = resp.json()
+        except (httpx.HTTPError, ValueError) as e:
+            self.errors += 1
+            raise ClinicSearchUnavailable(f"Places API request failed: {e}") from e
+        status = data.get("status", "OK")
+        if status not in OK_STATUSES:
+            self.errors += 1
+            raise ClinicSearchUnavailable(f"Places API returned {status}")
+        return data
+
+    async def _cached(self, cache: TTLCache, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        value = cache.get(key, _MISS)
+        if value is not _MISS:
+            return value
+        self._client()  # reset per-loop state before looking for an in-flight call
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = asyncio.ensure_future(self._fill(cache, key, fetch))
+            self._inflight[key] = flight
+            flight.add_done_callback(lambda f: self._landed(key, f))
         else:
-            # Fallback if geocoding fails
-            params = {"query": f"{query} in {location}, Australia", "key": settings.google_api_key}
-            resp = requests.get(GOOGLE_PLACES_TEXT_URL, params=params)
-    else:
-        # Text Search: no location, find best match
-        params = {"query": query, "key": settings.google_api_key}
-        resp = requests.get(GOOGLE_PLACES_TEXT_URL, params=params)
-
-    data = resp.json()
-
-    for place in data.get("results", []):
-        types = place.get("types", [])
-        if any(t in types for t in medical_types):
-            results.append({
-                "name": place.get("name"),
-                "address": place.get("vicinity") or place.get("formatted_address"),
-                "rating": place.get("rating"),
-                "user_ratings_total": place.get("user_ratings_total"),
-                "place_id": place.get("place_id"),
-            })
-
-    return results
+            self.coalesced += 1
+        # Shielded, so one caller giving up does not cancel the lookup for the others
+        return await asyncio.shield(flight)
+
+    async def _fill(self, cache: TTLCache, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        value = await fetch()
+        cache.put(key, value)  # failures raise before this and are never cached
+        return value
+
+    def _landed(self, key: Hashable, flight: asyncio.Future) -> None:
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        if not flight.cancelled():
+            flight.exception()  # mark retrieved even if every waiter was cancelled
+
+    async def geocode(self, location: str) -> Optional[str]:
+        """Convert a location (suburb, postcode, or address) into "lat,lng"."""
+        async def fetch():
+            # Add country context for more accurate geocoding
+            data = await self._get_json(GEOCODE_PATH, {"address": f"{location}, Australia"})
+            if data.get("results"):
+                loc = data["results"][0]["geometry"]["location"]
+                return f"{loc['lat']},{loc['lng']}"
+            return None
+
+        return await self._cached(self.geocodes, ("geocode", normalize(location)), fetch)
+
+    async def search(self, query: str, location: Optional[str] = None) -> List[Dict]:
+        """
+        If a location is provided -> use Nearby Search (places near suburb).
+        If no location -> use Text Search (best match, no radius constraint).
+        """
+        async def fetch():
+            if location:
+                coords = await self.geocode(location)
+                if coords:
+                    # Nearby Search: find nearby places around suburb/postcode
+                    params = {"location": coords, "rankby": "distance", "keyword": query, "type": "doctor"}
+                    data = await self._get_json(PLACES_NEARBY_PATH, params)
+                else:
+                    # Fallback if geocoding fails
+                    data = await self._get_json(PLACES_TEXT_PATH, {"query": f"{query} in {location}, Australia"})
+            else:
+                # Text Search: no location, find best match
+                data = await self._get_json(PLACES_TEXT_PATH, {"query": query})
+            return [
+                {
+                    "name": place.get("name"),
+                    "address": place.get("vicinity") or place.get("formatted_address"),
+                    "rating": place.get("rating"),
+                    "user_ratings_total": place.get("user_ratings_total"),
+                    "place_id": place.get("place_id"),
+                    "types": sorted(MEDICAL_TYPES.intersection(place.get("types", []))),
+                    "lat": place.get("geometry", {}).get("location", {}).get("lat"),
+                    "lng": place.get("geometry", {}).get("location", {}).get("lng"),
+                }
+                for place in data.get("results", [])
+                if MEDICAL_TYPES.intersection(place.get("types", []))
+            ]
+
+        return await self._cached(self.searches, ("search", normalize(query), normalize(location)), fetch)
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    def stats(self) -> dict:
+        return {
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "in_flight": len(self._inflight),
+            "search_cache": self.searches.stats(),
+            "geocode_cache": self.geocodes.stats(),
+        }
+
+
+client = ClinicSearchClient(
+    base_url=settings.places_api_url,
+    api_key=settings.google_api_key,
+    timeout=settings.places_timeout_seconds,
+    max_connections=settings.places_max_connections,
+    search_ttl=settings.clinic_search_cache_ttl_seconds,
+    geocode_ttl=settings.geocode_cache_ttl_seconds,
+    max_entries=settings.clinic_cache_max_entries,
+)
+
+
+async def geocode_location(location: str) -> Optional[str]:
+    return await client.geocode(location)
+
+
+async def search_clinics(query: str, location: Optional[str] = None) -> List[Dict]:
+    return await client.search(query, location)
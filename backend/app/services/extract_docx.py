@@ -1,7 +1,11 @@
 import io
+from typing import Union
 import docx
 
-def extract_docx_text(content: bytes) -> str:
-    doc = docx.Document(io.BytesIO(content))
+def extractor_version() -> str:
+    return f"python-docx-{docx.__version__}-1"
+
+def extract_docx_text(source: Union[str, bytes]) -> str:
+    doc = docx.Document(io.BytesIO(source) if isinstance(source, bytes) else source)
     parts = [p.text for p in doc.paragraphs]
     return "\n".join([p for p in parts if p and p.strip()])
@@ -1,9 +1,11 @@
-import io
-from PIL import Image
-import pytesseract
-from app.config import settings
+from typing import Union
+from app.services.ocr import ocr_images, ocr_version
 
-def extract_image_text(content: bytes) -> str:
-    image = Image.open(io.BytesIO(content))
-    text = pytesseract.image_to_string(image, lang=settings.tess_lang)
-    return text
+def extractor_version() -> str:
+    return f"{ocr_version()}-2"
+
+def extract_image_text(source: Union[str, bytes]) -> str:
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            source = f.read()
+    return ocr_images([source])[0].text
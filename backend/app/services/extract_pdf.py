@@ -1,12 +1,64 @@
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Union
 import fitz  # PyMuPDF
+from app.config import settings
+from app.services.ocr import ocr_images, ocr_version
 
-def extract_pdf_text(content: bytes) -> str:
-    text = ""
-    with fitz.open(stream=content, filetype="pdf") as doc:
-        for page in doc:
-            # Try text; if empty, fallback to page.get_text("text")
-            page_text = page.get_text()
-            if not page_text.strip():
-                page_text = page.get_text("text")
-            text += page_text + "\n"
-    return text
+# Bump the suffix when the extraction logic changes, to invalidate cached results.
+# Scanned pages are OCR'd, so the OCR engine, language and DPI are part of the version.
+def extractor_version() -> str:
+    return f"pymupdf-{fitz.VersionBind}-{ocr_version()}-dpi{settings.ocr_dpi}-4"
+
+@dataclass
+class PageResult:
+    number: int     # 0-based page index
+    text: str
+    seconds: float  # wall time spent on this page, including OCR
+    ocr: bool       # True when the page had no text layer and was OCR'd
+    image: Optional[bytes] = None  # rendered page awaiting OCR; cleared once recognised
+
+def _open_document(source: Union[str, bytes]) -> fitz.Document:
+    return fitz.open(source) if isinstance(source, str) else fitz.open(stream=source, filetype="pdf")
+
+def page_count(source: Union[str, bytes]) -> int:
+    with _open_document(source) as doc:
+        return doc.page_count
+
+def _extract_page_range(source: Union[str, bytes], start: int, stop: Optional[int]) -> List[PageResult]:
+    results: List[PageResult] = []
+    with _open_document(source) as doc:
+        for number in range(start, doc.page_count if stop is None else min(stop, doc.page_count)):
+            started = time.perf_counter()
+            page = doc[number]
+            text = page.get_text()
+            image = None
+            # Scanned pages have no text layer; render them for OCR only if there is an image to read
+            if not text.strip() and page.get_images(full=False):
+                image = page.get_pixmap(dpi=settings.ocr_dpi).tobytes("png")
+            results.append(PageResult(number, text, time.perf_counter() - started, image is not None, image))
+    return results
+
+def _ocr_scanned_pages(pages: List[PageResult]) -> List[PageResult]:
+    scanned = [page for page in pages if page.image is not None]
+    if scanned:
+        # One batch per range keeps every OCR worker busy
+        for page, result in zip(scanned, ocr_images([page.image for page in scanned])):
+            page.text = result.text
+            page.seconds += result.seconds
+            page.image = None
+    return pages
+
+def extract_pdf_pages(source: Union[str, bytes], start: int = 0, stop: Optional[int] = None) -> List[PageResult]:
+    """
+    Extract pages [start, stop) (default: all) with their timings. `source` is a
+    filesystem path (preferred, read lazily) or the raw bytes. Pages without a
+    text layer are sent to the OCR pool as one batch.
+
+    Pages are read serially here. Large documents are split into ranges that the
+    API process spreads over the ingestion pool (see jobs.ingest_in_pool).
+    """
+    return _ocr_scanned_pages(_extract_page_range(source, start, stop))
+
+def extract_pdf_text(source: Union[str, bytes]) -> str:
+    return "".join(f"{page.text}\n" for page in extract_pdf_pages(source))
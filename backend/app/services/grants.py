@@ -0,0 +1,227 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import event, or_, select
+from sqlalchemy.orm import Session, object_session
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.database import SessionLocal
+from app.models import AccessGrant
+from app.utils.logging import logger
+
+# A grant lets a grantee (name, plus date of birth when one was recorded)
+# read one record, or all of a patient's records when record_id is NULL, until
+# expires_at. Checks go through a per-process decision cache. Every committed
+# change to a patient's grants is stamped with a counter, and a cached decision
+# only counts if it was started after the patient's latest change.
+
+DecisionKey = Tuple[int, str, Optional[str], Optional[int]]
+
+class GrantDecisionCache:
+    """LRU of (patient, grantee, dob, record) -> allowed, each entry stamped with when its decision started."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[DecisionKey, Tuple[bool, float, int]]" = OrderedDict()
+        self._clock = 0  # bumped by every invalidation
+        # Latest stamp per recently changed patient, bounded like the entries. A
+        # patient dropped from here is assumed to have changed at `_floor`, which
+        # only ever makes older decisions look stale, never fresh.
+        self._changed: "OrderedDict[int, int]" = OrderedDict()
+        self._floor = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def stamp(self) -> int:
+        """Take before reading the grants a decision is based on, then pass to put()."""
+        return self._clock
+
+    def _fresh(self, patient_id: int, stamp: int) -> bool:
+        return stamp >= self._changed.get(patient_id, self._floor)
+
+    def get(self, key: DecisionKey) -> Optional[bool]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic() or not self._fresh(key[0], entry[2]):
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: DecisionKey, allowed: bool, stamp: int, valid_for: float) -> None:
+        ttl = min(self.ttl, valid_for)
+        if self.max_entries <= 0 or ttl <= 0:
+            return
+        with self._lock:
+            if not self._fresh(key[0], stamp):
+                return  # grants changed while this decision was being made
+            self._entries[key] = (allowed, time.monotonic() + ttl, stamp)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, patient_ids: Iterable[int]) -> None:
+        with self._lock:
+            for patient_id in patient_ids:
+                self._clock += 1
+                self._changed[patient_id] = self._clock
+                self._changed.move_to_end(patient_id)
+            while len(self._changed) > max(self.max_entries, 1):
+                _, dropped = self._changed.popitem(last=False)
+                self._floor = max(self._floor, dropped)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._changed.clear()
+            self._floor = self._clock
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "tracked_patients": len(self._changed), "hits": self.hits, "misses": self.misses}
+
+decisions = GrantDecisionCache(settings.grant_cache_max_entries, settings.grant_cache_ttl_seconds)
+
+# Changes are collected per session at flush and applied once they commit: an
+# invalidation at flush time would let a concurrent check re-cache the old state
+# for the full TTL before the change became visible.
+@event.listens_for(AccessGrant, "after_insert")
+@event.listens_for(AccessGrant, "after_update")
+@event.listens_for(AccessGrant, "after_delete")
+def _grant_changed(mapper, connection, target: AccessGrant) -> None:
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_grant_patients", set()).add(target.patient_id)
+
+@event.listens_for(Session, "after_commit")
+def _grants_committed(session: Session) -> None:
+    patients = session.info.pop("changed_grant_patients", None)
+    if patients:
+        decisions.invalidate(patients)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _grants_rolled_back(session: Session, previous_transaction) -> None:
+    # A savepoint rollback leaves the outer transaction's changes to commit
+    if not previous_transaction.nested:
+        session.info.pop("changed_grant_patients", None)
+
+def has_access(db, patient_id: int, grantee_name: str, grantee_dob: Optional[str] = None, record_id: Optional[int] = None) -> bool:
+    """
+    Whether the grantee may read `record_id` (or, with record_id None, all of the
+    patient's records) right now. A positive answer is cached no longer than the
+    longest-lived matching grant.
+    """
+    grantee_name = grantee_name.strip()
+    key = (patient_id, grantee_name, grantee_dob, record_id)
+    allowed = decisions.get(key)
+    if allowed is not None:
+        return allowed
+
+    stamp = decisions.stamp()
+    now = datetime.utcnow()
+    # A grant without a record_id covers every record; predicates follow ix_access_grants_lookup
+    covers_record = AccessGrant.record_id.is_(None)
+    if record_id is not None:
+        covers_record = or_(AccessGrant.record_id == record_id, covers_record)
+    expiries = db.execute(
+        select(AccessGrant.expires_at).where(
+            AccessGrant.patient_id == patient_id,
+            AccessGrant.grantee_name == grantee_name,
+            covers_record,
+            AccessGrant.active.is_(True),
+            or_(AccessGrant.expires_at.is_(None), AccessGrant.expires_at > now),
+            or_(AccessGrant.grantee_dob.is_(None), AccessGrant.grantee_dob == grantee_dob),
+        )
+    ).scalars().all()
+    allowed = bool(expiries)
+    valid_for = float(decisions.ttl)
+    if allowed and None not in expiries:
+        valid_for = (max(expiries) - now).total_seconds()
+    decisions.put(key, allowed, stamp, valid_for)
+    return allowed
+
+def revoke_grant(db, patient_id: int, grant_id: int) -> AccessGrant:
+    grant = db.query(AccessGrant).filter(AccessGrant.id == grant_id, AccessGrant.patient_id == patient_id).first()
+    if not grant:
+        raise ValueError("Grant not found")
+    grant.active = False
+    db.commit()
+    return grant
+
+def list_grants(db, patient_id: int) -> List[AccessGrant]:
+    return (
+        db.query(AccessGrant)
+        .filter(AccessGrant.patient_id == patient_id)
+        .order_by(AccessGrant.active.desc(), AccessGrant.expires_at.desc())
+        .all()
+    )
+
+def expire_grants(batch_size: int) -> int:
+    """Deactivate grants past their expiry, `batch_size` at a time, one transaction per batch."""
+    total = 0
+    while True:
+        with SessionLocal() as db:
+            rows = (
+                db.query(AccessGrant.id, AccessGrant.patient_id)
+                .filter(AccessGrant.active.is_(True), AccessGrant.expires_at <= datetime.utcnow())
+                .order_by(AccessGrant.expires_at)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            if not rows:
+                break
+            # A bulk UPDATE skips the ORM events, so the cache is told below
+            db.query(AccessGrant).filter(AccessGrant.id.in_([r.id for r in rows])).update(
+                {AccessGrant.active: False}, synchronize_session=False
+            )
+            db.commit()
+        decisions.invalidate({r.patient_id for r in rows})
+        total += len(rows)
+        if len(rows) < batch_size:
+            break
+    return total
+
+class GrantSweeper:
+    """Runs expire_grants every GRANT_SWEEP_SECONDS in the background."""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.expired = 0
+        self.last_run: Optional[datetime] = None
+
+    async def run(self) -> None:
+        while True:
+            try:
+                expired = await run_in_threadpool(expire_grants, settings.grant_sweep_batch_size)
+                self.expired += expired
+                self.last_run = datetime.utcnow()
+                if expired:
+                    logger.info(f"Deactivated {expired} expired access grants")
+            except Exception:
+                logger.exception("Access grant sweep failed")
+            await asyncio.sleep(settings.grant_sweep_seconds)
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self.run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "decisions": decisions.stats(),
+            "expired": self.expired,
+            "last_sweep": self.last_run.isoformat() if self.last_run else None,
+        }
+
+sweeper = GrantSweeper()
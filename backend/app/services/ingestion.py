@@ -1,11 +1,144 @@
-from typing import Tuple, Optional
-from app.services.extract_pdf import extract_pdf_text
-from app.services.extract_docx import extract_docx_text
-from app.services.extract_image import extract_image_text
+import hashlib
+import importlib
+import os
+import tempfile
+import threading
+import time
+from typing import BinaryIO, List, Optional, Tuple, Union
+from app.config import settings
 from app.utils.parsing import normalize_text, extract_fields
-from app.services.storage import generate_storage_key, save_file
+from app.services.storage import local_copy
+from app.services.blobs import acquire_blob
 from app.services.nlp import postprocess_structured
 
+# Extractor modules pull in PyMuPDF, python-docx, Pillow and Tesseract, so each
+# is imported on first use of its file type rather than at startup
+EXTRACTORS = {
+    "pdf": "app.services.extract_pdf",
+    "docx": "app.services.extract_docx",
+    "image": "app.services.extract_image",
+}
+
+def get_extractor(dtype: str):
+    module = EXTRACTORS.get(dtype)
+    return importlib.import_module(module) if module else None
+
+class ExtractionCache:
+    """
+    On-disk cache of extracted text keyed by (content hash, extractor, extractor version).
+    Entries are plain files shared by all worker processes; reads refresh the file
+    mtime so eviction can drop the least recently used entries once the directory
+    grows past `max_bytes`.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._approx_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path) and self.max_bytes > 0
+
+    @staticmethod
+    def make_key(content_hash: str, extractor: str, version: str) -> str:
+        return hashlib.sha256(f"{content_hash}|{extractor}|{version}".encode()).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], f"{key}.txt")
+
+    def contains(self, key: str) -> bool:
+        return os.path.exists(self._entry_path(key))
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # evicted by another process in the meantime
+        return text
+
+    def put(self, key: str, text: str) -> int:
+        """Store an entry; returns the number of entries evicted to make room."""
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file and rename so concurrent readers never see a partial entry
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+        with self._lock:
+            if self._approx_bytes is None:
+                self._approx_bytes = self._scan_size()
+            else:
+                self._approx_bytes += os.path.getsize(path)
+            if self._approx_bytes <= self.max_bytes:
+                return 0
+            return self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                if name.endswith(".txt"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield st.st_mtime, st.st_size, path
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self) -> int:
+        """Remove least recently used entries until the cache is at 90% of its budget."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        self._approx_bytes = total
+        self.evictions += evicted
+        return evicted
+
+    def record(self, info: dict) -> None:
+        """Fold lookup results reported by a worker process into this process's counters."""
+        with self._lock:
+            if info.get("cache_hit") is True:
+                self.hits += 1
+            elif info.get("cache_hit") is False:
+                self.misses += 1
+            self.evictions += info.get("cache_evictions", 0)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+extraction_cache = ExtractionCache(settings.extract_cache_path, settings.extract_cache_max_bytes)
+
 def detect_type(filename: str) -> str:
     name = filename.lower()
     if name.endswith(".pdf"):
@@ -16,22 +149,125 @@ def detect_type(filename: str) -> str:
         return "image"
     return "unknown"
 
-def ingest_document(patient_id: int, filename: str, content: bytes):
-    dtype = detect_type(filename)
-    if dtype == "pdf":
-        text = extract_pdf_text(content)
-    elif dtype == "docx":
-        text = extract_docx_text(content)
-    elif dtype == "image":
-        text = extract_image_text(content)
-    else:
+def hash_stream(fileobj: BinaryIO, chunk_size: int = 1024 * 1024) -> Tuple[str, int]:
+    """SHA-256 and size of a seekable file object, read in chunks; rewinds it afterwards."""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+        digest.update(chunk)
+        size += len(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest(), size
+
+def stage_document(db, filename: str, fileobj: BinaryIO) -> Tuple[str, str]:
+    """
+    Persist the raw upload so it can be ingested later by a worker.
+    Files are stored once per content hash; re-uploads only add a blob reference.
+    Rejects unsupported types up front so clients get a 4xx instead of a failed job.
+    Returns the storage key and the content hash.
+    """
+    if detect_type(filename) == "unknown":
         raise ValueError("Unsupported file type")
+    content_hash, size = hash_stream(fileobj)
+    blob = acquire_blob(db, content_hash, size, filename, fileobj)
+    return blob.storage_key, content_hash
+
+def _join_pages(pages: list, info: dict) -> str:
+    # Per-page (seconds, ocr) go back to the API process for medst_ingest_page_duration_seconds
+    info["pages"] = [(page.seconds, page.ocr) for page in pages]
+    return "".join(f"{page.text}\n" for page in pages)
+
+def extract_text(dtype: str, source: Union[str, bytes], content_hash: Optional[str] = None, pages: Optional[list] = None) -> Tuple[str, dict]:
+    """
+    Run the extractor for `dtype`, consulting the extraction cache when the content
+    hash is known. `pages` are PDF pages already extracted in parallel by
+    extract_pdf_range. Returns the raw text and info for the caller's counters.
+    """
+    extractor = get_extractor(dtype)
+    if extractor is None:
+        raise ValueError("Unsupported file type")
+    info: dict = {}
+
+    def extract() -> str:
+        if pages is not None:
+            return _join_pages(pages, info)
+        if hasattr(extractor, f"extract_{dtype}_pages"):
+            return _join_pages(getattr(extractor, f"extract_{dtype}_pages")(source), info)
+        return getattr(extractor, f"extract_{dtype}_text")(source)
 
+    if not content_hash or not extraction_cache.enabled:
+        return extract(), info
+
+    key = extraction_cache.make_key(content_hash, dtype, extractor.extractor_version())
+    text = extraction_cache.get(key)
+    if text is not None:
+        return text, {"cache_hit": True}
+    text = extract()
+    info.update(cache_hit=False, cache_evictions=extraction_cache.put(key, text))
+    return text, info
+
+def pdf_page_ranges(path: str, content_hash: Optional[str] = None) -> List[Tuple[int, int]]:
+    """
+    Page ranges to extract in parallel, or [] when the PDF is small enough (or
+    already cached) to go through ingest_document in one task.
+    """
+    if settings.pdf_parallel_min_pages <= 0:
+        return []
+    extractor = get_extractor("pdf")
+    if content_hash and extraction_cache.enabled:
+        key = extraction_cache.make_key(content_hash, "pdf", extractor.extractor_version())
+        if extraction_cache.contains(key):
+            return []
+    pages = extractor.page_count(path)
+    if pages < settings.pdf_parallel_min_pages:
+        return []
+    step = max(settings.pdf_pages_per_task, 1)
+    return [(start, min(start + step, pages)) for start in range(0, pages, step)]
+
+def extract_pdf_range(path: str, start: int, stop: int) -> list:
+    """Worker entrypoint for one page range of a large PDF; returns its PageResults."""
+    return get_extractor("pdf").extract_pdf_pages(path, start, stop)
+
+def ingest_document(
+    filename: str, source: Union[str, bytes], content_hash: Optional[str] = None, pages: Optional[list] = None
+) -> Tuple[str, dict, str, dict]:
+    """
+    `source` is a filesystem path or the raw bytes of the document; `pages` are
+    its PDF pages when they were extracted in parallel beforehand.
+    Returns the normalized text, parsed fields, document type and pipeline info.
+    The info dict carries per-stage timings and the document size, which the API
+    process folds into its metrics (see utils/metrics.record_ingestion).
+    """
+    stages = {}
+    clock = time.perf_counter()
+
+    def lap(stage: str) -> None:
+        nonlocal clock
+        now = time.perf_counter()
+        stages[stage] = now - clock
+        clock = now
+
+    dtype = detect_type(filename)
+    lap("detect")
+    text, info = extract_text(dtype, source, content_hash, pages)
+    lap("extract")
     text = normalize_text(text)
+    lap("normalize")
     fields = extract_fields(text)
+    lap("parse")
     fields = postprocess_structured(fields)
+    lap("postprocess")
 
-    storage_key = generate_storage_key(patient_id, filename)
-    uri = save_file(content, storage_key)
-    return storage_key, text, fields, dtype
+    info["document_type"] = dtype
+    info["bytes"] = len(source) if isinstance(source, bytes) else os.path.getsize(source)
+    info["stages"] = stages
+    return text, fields, dtype, info
 
+def ingest_stored_document(storage_key: str, filename: str, content_hash: Optional[str] = None) -> Tuple[str, dict, str, dict]:
+    """Worker entrypoint: load a staged upload from storage and run the pipeline."""
+    start = time.perf_counter()
+    with local_copy(storage_key) as path:
+        loaded = time.perf_counter() - start
+        text, fields, dtype, info = ingest_document(filename, path, content_hash)
+    info["stages"] = {"load": loaded, **info["stages"]}
+    return text, fields, dtype, info
@@ -0,0 +1,395 @@
+import asyncio
+import copy
+import os
+import socket
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import BinaryIO, Optional, Tuple
+from sqlalchemy import and_, or_, update
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.database import SessionLocal
+from app.models import IngestionJob, Record, UploadTokens
+from app.services.ingestion import (
+    detect_type,
+    extract_pdf_range,
+    extraction_cache,
+    ingest_document,
+    ingest_stored_document,
+    pdf_page_ranges,
+    stage_document,
+)
+from app.services.blobs import purge_blob, purge_orphaned_blobs, release_blob
+from app.services.aggregates import count_records
+from app.services.search import index_records
+from app.services.storage import local_copy
+from app.services.labs import lab_results_for
+from app.utils.logging import logger
+from app.utils.metrics import ingest_stage_seconds, record_ingestion
+
+# Extraction (PDF parsing, OCR) is CPU bound, so it runs in worker processes.
+# The API process only does the DB bookkeeping around each job.
+#
+# Any API process may pick up any job, so a job is claimed with a guarded
+# UPDATE before it runs, and the claim is a lease renewed while it runs. Jobs
+# whose process died (queued and never started, or running with a lapsed
+# lease) are picked up by the periodic recovery pass in whichever process gets
+# there first.
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+_executor: Optional[ProcessPoolExecutor] = None
+_tasks: set = set()
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    # A pool breaks for good when a worker dies or sends back an exception that
+    # cannot be unpickled; start a fresh one rather than failing every later job
+    if _executor is not None and _executor._broken:
+        logger.error(f"Ingestion worker pool is broken ({_executor._broken}); starting a new one")
+        shutdown_executor()
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.ingest_workers or None)
+    return _executor
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+async def ingest_in_pool(storage_key: str, filename: str, content_hash: Optional[str]) -> Tuple[str, dict, str, dict]:
+    """
+    Run the ingestion pipeline in the worker pool. A PDF is copied locally once and,
+    if it is large, split into page ranges that several workers extract at once
+    before one more task parses the joined text. Everything else is a single task.
+    """
+    loop = asyncio.get_running_loop()
+    if detect_type(filename) != "pdf" or settings.pdf_parallel_min_pages <= 0:
+        return await loop.run_in_executor(get_executor(), ingest_stored_document, storage_key, filename, content_hash)
+
+    started = time.perf_counter()
+    local = local_copy(storage_key)
+    path = await run_in_threadpool(local.__enter__)
+    try:
+        loaded = time.perf_counter() - started
+        ranges = await loop.run_in_executor(get_executor(), pdf_page_ranges, path, content_hash)
+        pages, extracted = None, 0.0
+        if ranges:
+            started = time.perf_counter()
+            # Wait for every range before raising, so none is still reading the copy when it goes
+            parts = await asyncio.gather(
+                *(loop.run_in_executor(get_executor(), extract_pdf_range, path, start, stop) for start, stop in ranges),
+                return_exceptions=True,
+            )
+            for part in parts:
+                if isinstance(part, BaseException):
+                    raise part
+            pages = [page for part in parts for page in part]
+            extracted = time.perf_counter() - started
+        text, fields, doc_type, info = await loop.run_in_executor(
+            get_executor(), ingest_document, filename, path, content_hash, pages
+        )
+    finally:
+        await run_in_threadpool(local.__exit__, None, None, None)
+    info["stages"] = {"load": loaded, **info["stages"]}
+    info["stages"]["extract"] += extracted
+    info["page_ranges"] = len(ranges)
+    return text, fields, doc_type, info
+
+def create_job(
+    db,
+    patient_id: int,
+    filename: str,
+    storage_key: str,
+    content_hash: Optional[str] = None,
+    upload_token_id: Optional[int] = None,
+) -> IngestionJob:
+    job = IngestionJob(
+        id=uuid.uuid4().hex,
+        patient_id=patient_id,
+        upload_token_id=upload_token_id,
+        filename=filename,
+        storage_key=storage_key,
+        content_hash=content_hash,
+        status="queued",
+    )
+    db.add(job)
+    return job
+
+def submit_upload(
+    patient_id: int,
+    filename: str,
+    fileobj: BinaryIO,
+    upload_token_id: Optional[int] = None,
+) -> IngestionJob:
+    """
+    Stage an upload and create its ingestion job in one transaction. Storage I/O
+    blocks, so this runs in a worker thread with its own session. Returns the
+    detached job, always queued: re-uploads are completed when the job starts,
+    so the response does not depend on what was uploaded before.
+    Raises ValueError for unsupported files or an already used upload token.
+    """
+    with SessionLocal() as db:
+        if upload_token_id is not None:
+            upload_token = db.query(UploadTokens).filter_by(id=upload_token_id).with_for_update().first()
+            if not upload_token or upload_token.used:
+                raise ValueError("Invalid or expired upload link")
+            upload_token.used = True
+        storage_key, content_hash = stage_document(db, filename, fileobj)
+        job = create_job(db, patient_id, filename, storage_key, content_hash, upload_token_id)
+        db.commit()
+        db.refresh(job)
+        db.expunge(job)
+    return job
+
+def run_in_background(coro) -> asyncio.Task:
+    """Start a task on the running loop, keeping a reference until it finishes."""
+    task = asyncio.get_running_loop().create_task(coro)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return task
+
+def enqueue_job(job_id: str) -> None:
+    """Schedule a committed job on the running event loop."""
+    run_in_background(run_job(job_id))
+
+def _lease_lapsed(now: datetime):
+    # Jobs marked running before leases existed have none, and count as lapsed
+    return and_(
+        IngestionJob.status == "running",
+        or_(IngestionJob.lease_expires_at.is_(None), IngestionJob.lease_expires_at <= now),
+    )
+
+def _stranded_job_ids() -> list:
+    """Jobs queued for longer than a lease without being claimed, and running jobs whose lease lapsed."""
+    now = datetime.utcnow()
+    queued_before = now - timedelta(seconds=settings.ingest_lease_seconds)
+    with SessionLocal() as db:
+        rows = db.query(IngestionJob.id).filter(
+            or_(and_(IngestionJob.status == "queued", IngestionJob.created_at <= queued_before), _lease_lapsed(now))
+        ).all()
+        return [j.id for j in rows]
+
+async def resume_pending_jobs() -> int:
+    """Re-enqueue stranded jobs, and purge blobs released by a process that died before purging them."""
+    try:
+        ids = await run_in_threadpool(_stranded_job_ids)
+        await run_in_threadpool(purge_orphaned_blobs)
+    except Exception:
+        logger.exception("Could not resume pending ingestion jobs")
+        return 0
+    for job_id in ids:
+        enqueue_job(job_id)
+    return len(ids)
+
+class JobRecovery:
+    """Runs resume_pending_jobs at startup and every INGEST_RECOVERY_SECONDS."""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.resumed = 0
+        self.last_run: Optional[datetime] = None
+
+    async def run(self) -> None:
+        while True:
+            resumed = await resume_pending_jobs()
+            self.resumed += resumed
+            self.last_run = datetime.utcnow()
+            if resumed:
+                logger.info(f"Resumed {resumed} stranded ingestion jobs")
+            await asyncio.sleep(settings.ingest_recovery_seconds)
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self.run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "worker": WORKER_ID,
+            "resumed": self.resumed,
+            "last_recovery": self.last_run.isoformat() if self.last_run else None,
+        }
+
+recovery = JobRecovery()
+
+def build_record(
+    patient_id: int,
+    storage_key: str,
+    content_hash: Optional[str],
+    text: str,
+    fields: dict,
+    doc_type: str,
+    upload_token: Optional[UploadTokens] = None,
+) -> Record:
+    if upload_token:
+        record = Record(
+            patient_id=patient_id,
+            provider_name=upload_token.clinic_name,
+            provider_clinic=upload_token.clinic_name,
+            provider_specialty=upload_token.service_type,
+            document_type=doc_type,
+            storage_key=storage_key,
+            content_hash=content_hash,
+            content_text=text,
+            structured_data=fields,
+        )
+    else:
+        record = Record(
+            patient_id=patient_id,
+            provider_name=fields.get("provider_name"),
+            provider_clinic=fields.get("provider_clinic"),
+            provider_specialty=fields.get("provider_specialty"),
+            document_type=doc_type,
+            visit_date=fields.get("visit_date"),
+            storage_key=storage_key,
+            content_hash=content_hash,
+            content_text=text,
+            structured_data=fields,
+        )
+    record.lab_results = lab_results_for(patient_id, fields, fields.get("visit_date"))
+    return record
+
+def _finish_job(db, job: IngestionJob, text: str, fields: dict, doc_type: str) -> Record:
+    upload_token = db.get(UploadTokens, job.upload_token_id) if job.upload_token_id else None
+    record = build_record(job.patient_id, job.storage_key, job.content_hash, text, fields, doc_type, upload_token)
+    db.add(record)
+    db.flush()
+    count_records(db, [record])
+    index_records(db, [record])
+    job.record_id = record.id
+    job.status = "done"
+    job.error = None
+    job.finished_at = datetime.utcnow()
+    return record
+
+def complete_from_duplicate(db, job: IngestionJob) -> Optional[Record]:
+    """
+    If the patient ingested these exact bytes before, reuse that extraction instead
+    of running the pipeline again. The caller commits. Only the patient's own
+    records are considered: another patient's extraction carries their details,
+    and whether it exists must not show. Across patients only the blob is shared.
+    """
+    if not job.content_hash:
+        return None
+    existing = (
+        db.query(Record)
+        .filter(
+            Record.patient_id == job.patient_id,
+            Record.content_hash == job.content_hash,
+            Record.content_text.isnot(None),
+        )
+        .order_by(Record.id)
+        .first()
+    )
+    if not existing:
+        return None
+    fields = copy.deepcopy(existing.structured_data or {})
+    return _finish_job(db, job, existing.content_text, fields, existing.document_type)
+
+def _claim_job(db, job_id: str) -> bool:
+    """Mark the job running under this process, unless it is finished or another process holds a live lease."""
+    now = datetime.utcnow()
+    claimed = db.execute(
+        update(IngestionJob)
+        .where(IngestionJob.id == job_id, or_(IngestionJob.status == "queued", _lease_lapsed(now)))
+        .values(
+            status="running",
+            claimed_by=WORKER_ID,
+            started_at=now,
+            lease_expires_at=now + timedelta(seconds=settings.ingest_lease_seconds),
+        )
+    )
+    return claimed.rowcount == 1
+
+def _renew_lease(job_id: str) -> bool:
+    with SessionLocal() as db:
+        renewed = db.execute(
+            update(IngestionJob)
+            .where(IngestionJob.id == job_id, IngestionJob.status == "running", IngestionJob.claimed_by == WORKER_ID)
+            .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=settings.ingest_lease_seconds))
+        )
+        db.commit()
+        return renewed.rowcount == 1
+
+def _locked_if_claimed(db, job_id: str) -> Optional[IngestionJob]:
+    """The job, locked, if this process still holds its claim; a job whose lease lapsed may be running elsewhere."""
+    job = db.query(IngestionJob).filter(IngestionJob.id == job_id).with_for_update().first()
+    if job is None or job.status != "running" or job.claimed_by != WORKER_ID:
+        logger.warning(f"Ingestion job {job_id} is no longer claimed by this process; dropping its result")
+        return None
+    return job
+
+def _start_job(job_id: str) -> Optional[IngestionJob]:
+    with SessionLocal() as db:
+        if not _claim_job(db, job_id):
+            return None
+        job = db.get(IngestionJob, job_id)
+        # Re-uploads of a file the patient already ingested skip the extraction pipeline
+        if complete_from_duplicate(db, job):
+            db.commit()
+            return None
+        db.commit()
+        db.refresh(job)
+        db.expunge(job)
+        return job
+
+def _fail_job(job_id: str, error: str) -> None:
+    with SessionLocal() as db:
+        job = _locked_if_claimed(db, job_id)
+        if job is None:
+            return
+        job.status = "failed"
+        job.error = error
+        job.finished_at = datetime.utcnow()
+        if job.upload_token_id:
+            # The upload never became a record, so let the clinic retry with the same link
+            upload_token = db.get(UploadTokens, job.upload_token_id)
+            if upload_token:
+                upload_token.used = False
+        # No record will point at the staged blob, so give up the job's reference
+        orphaned_key = release_blob(db, job.storage_key)
+        db.commit()
+    if orphaned_key:
+        purge_blob(orphaned_key)
+
+def _complete_job(job_id: str, text: str, fields: dict, doc_type: str) -> None:
+    with SessionLocal() as db:
+        job = _locked_if_claimed(db, job_id)
+        if job is None:
+            return
+        _finish_job(db, job, text, fields, doc_type)
+        db.commit()
+
+async def _keep_lease(job_id: str) -> None:
+    while True:
+        await asyncio.sleep(settings.ingest_lease_seconds / 3)
+        try:
+            if not await run_in_threadpool(_renew_lease, job_id):
+                return
+        except Exception:
+            logger.exception(f"Could not renew the lease on ingestion job {job_id}")
+
+async def run_job(job_id: str) -> None:
+    job = await run_in_threadpool(_start_job, job_id)
+    if job is None:
+        return
+    loop = asyncio.get_running_loop()
+    heartbeat = loop.create_task(_keep_lease(job_id))
+    try:
+        text, fields, doc_type, info = await ingest_in_pool(job.storage_key, job.filename, job.content_hash)
+        extraction_cache.record(info)
+        with ingest_stage_seconds.time("store", doc_type):
+            await run_in_threadpool(_complete_job, job_id, text, fields, doc_type)
+        record_ingestion(info)
+    except Exception as e:
+        logger.exception(f"Ingestion job {job_id} failed")
+        record_ingestion({"document_type": detect_type(job.filename)}, outcome="failed")
+        await run_in_threadpool(_fail_job, job_id, str(e) or e.__class__.__name__)
+    finally:
+        heartbeat.cancel()
@@ -0,0 +1,155 @@
+from datetime import date, datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.orm import load_only
+from app.models import LabResult, Record
+from app.utils.labs import normalize_lab
+
+BUCKETS = ("day", "week", "month")
+
+def _taken_on(visit_date: Optional[str], fallback: Optional[datetime] = None) -> date:
+    try:
+        return date.fromisoformat(visit_date or "")
+    except ValueError:
+        return (fallback or datetime.utcnow()).date()
+
+def lab_results_for(patient_id: int, fields: dict, visit_date: Optional[str], fallback: Optional[datetime] = None) -> List[LabResult]:
+    """Normalized LabResult rows for a record's parsed `lab_results`; unparseable readings are skipped."""
+    taken_on = _taken_on(visit_date, fallback)
+    results = []
+    for name, reading in (fields.get("lab_results") or {}).items():
+        lab = normalize_lab(name, str(reading))
+        if lab:
+            test, value, unit = lab
+            results.append(LabResult(patient_id=patient_id, test=test, value=value, unit=unit, taken_on=taken_on))
+    return results
+
+def backfill_lab_results(db) -> int:
+    """Populate lab_results for databases that had records before the table existed. The caller commits."""
+    if db.query(LabResult.id).first() or not db.query(Record.id).first():
+        return 0
+    records = db.query(Record).options(
+        load_only(Record.id, Record.patient_id, Record.visit_date, Record.created_at, Record.structured_data)
+    ).all()
+    added = 0
+    for record in records:
+        for lab in lab_results_for(record.patient_id, record.structured_data or {}, record.visit_date, record.created_at):
+            lab.record_id = record.id
+            db.add(lab)
+            added += 1
+    return added
+
+def lab_tests(db, patient_id: int) -> List[dict]:
+    rows = (
+        db.query(
+            LabResult.test,
+            LabResult.unit,
+            func.count(LabResult.id),
+            func.min(LabResult.taken_on),
+            func.max(LabResult.taken_on),
+        )
+        .filter(LabResult.patient_id == patient_id)
+        .group_by(LabResult.test, LabResult.unit)
+        .order_by(LabResult.test, func.count(LabResult.id).desc())
+        .all()
+    )
+    return [
+        {"test": test, "unit": unit, "count": count, "first_taken": first, "last_taken": last}
+        for test, unit, count, first, last in rows
+    ]
+
+def _bucket_start(db, bucket: str):
+    """SQL expression for the ISO date that starts each value's bucket."""
+    # Constants are inlined (bucket is validated against BUCKETS) so the same
+    # expression can be repeated in GROUP BY without differing bind parameters
+    col = LabResult.taken_on
+    if db.get_bind().dialect.name == "postgresql":
+        if bucket != "day":
+            col = func.date_trunc(literal_column(f"'{bucket}'"), col)
+        return func.to_char(col, literal_column("'YYYY-MM-DD'"))
+    if bucket == "week":
+        return func.date(col, literal_column("'-6 days'"), literal_column("'weekday 1'"))  # the Monday on or before
+    return func.strftime(literal_column("'%Y-%m-01'" if bucket == "month" else "'%Y-%m-%d'"), col)
+
+def default_unit(db, patient_id: int, test: str) -> Optional[str]:
+    row = (
+        db.query(LabResult.unit)
+        .filter(LabResult.patient_id == patient_id, LabResult.test == test)
+        .group_by(LabResult.unit)
+        .order_by(func.count(LabResult.id).desc())
+        .first()
+    )
+    return row[0] if row else None
+
+def lab_trend(
+    db,
+    patient_id: int,
+    test: str,
+    unit: str,
+    bucket: str = "month",
+    window: int = 3,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> List[dict]:
+    """
+    Downsample one series into day/week/month buckets and compute rolling
+    statistics over the last `window` buckets, all in a single SQL query.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket {bucket!r}")
+    bucket_col = _bucket_start(db, bucket).label("bucket")
+    grouped = select(
+        bucket_col,
+        func.sum(LabResult.value).label("total"),
+        func.count(LabResult.id).label("count"),
+        func.min(LabResult.value).label("min"),
+        func.max(LabResult.value).label("max"),
+    ).where(LabResult.patient_id == patient_id, LabResult.test == test, LabResult.unit == unit)
+    if start:
+        grouped = grouped.where(LabResult.taken_on >= start)
+    if end:
+        grouped = grouped.where(LabResult.taken_on <= end)
+    g = grouped.group_by(bucket_col).subquery()
+
+    frame = {"order_by": g.c.bucket, "rows": (-(window - 1), 0)}
+    stmt = select(
+        g.c.bucket,
+        g.c.total,
+        g.c.count,
+        g.c.min,
+        g.c.max,
+        func.sum(g.c.total).over(**frame).label("rolling_total"),
+        func.sum(g.c.count).over(**frame).label("rolling_count"),
+        func.min(g.c.min).over(**frame).label("rolling_min"),
+        func.max(g.c.max).over(**frame).label("rolling_max"),
+    ).order_by(g.c.bucket)
+
+    return [
+        {
+            "bucket": row.bucket,
+            "mean": row.total / row.count,
+            "min": row.min,
+            "max": row.max,
+            "count": row.count,
+            "rolling_mean": row.rolling_total / row.rolling_count,
+            "rolling_min": row.rolling_min,
+            "rolling_max": row.rolling_max,
+        }
+        for row in db.execute(stmt)
+    ]
+
+def lab_series(
+    db,
+    patient_id: int,
+    test: str,
+    unit: Optional[str] = None,
+    bucket: str = "month",
+    window: int = 3,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> Tuple[Optional[str], List[dict]]:
+    """lab_trend in the requested unit, or the unit the test is most often recorded in."""
+    unit = unit or default_unit(db, patient_id, test)
+    if not unit:
+        return None, []
+    return unit, lab_trend(db, patient_id, test, unit, bucket, window, start, end)
@@ -0,0 +1,280 @@
+import asyncio
+import math
+import random
+import smtplib
+import ssl
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from email.mime.text import MIMEText
+from typing import List, Optional, Tuple
+from sqlalchemy import update
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.database import SessionLocal
+from app.models import OutboundEmail
+from app.utils.logging import logger
+
+# Emails are written to outbound_emails in the same transaction as whatever
+# they announce, and sent afterwards by a background loop over a small pool of
+# persistent, authenticated SMTP connections. Failures are retried with
+# exponential backoff; requests only ever pay for the insert.
+
+MAX_RETRY_DELAY_SECONDS = 3600
+# SMTP errors after which the same connection can carry on with the next message
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+def message_id_domain() -> str:
+    return settings.notify_from_email.rpartition("@")[2] or "localhost"
+
+def _close(smtp: smtplib.SMTP) -> None:
+    try:
+        smtp.quit()
+    except (smtplib.SMTPException, OSError):
+        smtp.close()
+
+class SMTPPool:
+    """Up to `size` connections, each logged in once and reused until idle for `idle_seconds`."""
+
+    def __init__(self, size: int, idle_seconds: float):
+        self.size = size
+        self.idle_seconds = idle_seconds
+        self._idle: List[Tuple[smtplib.SMTP, float]] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self.opened = 0
+        self.reused = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(settings.smtp_host, settings.smtp_port, timeout=settings.smtp_timeout_seconds)
+        try:
+            smtp.ehlo()
+            if settings.smtp_starttls:
+                smtp.starttls(context=ssl.create_default_context())
+                smtp.ehlo()
+            if settings.smtp_username:
+                smtp.login(settings.smtp_username, settings.smtp_password)
+        except Exception:
+            _close(smtp)
+            raise
+        self.opened += 1
+        return smtp
+
+    def _reusable(self) -> Optional[smtplib.SMTP]:
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                smtp, released_at = self._idle.pop()
+            if time.monotonic() - released_at < self.idle_seconds:
+                try:
+                    if smtp.noop()[0] == 250:  # the server may have dropped us
+                        self.reused += 1
+                        return smtp
+                except (smtplib.SMTPException, OSError):
+                    pass
+            _close(smtp)
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        try:
+            smtp = self._reusable() or self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+        try:
+            yield smtp
+        except MESSAGE_ERRORS:
+            self._release(smtp)
+            raise
+        except Exception:
+            _close(smtp)
+            self._slots.release()
+            raise
+        else:
+            self._release(smtp)
+
+    def _release(self, smtp: smtplib.SMTP) -> None:
+        with self._lock:
+            self._idle.append((smtp, time.monotonic()))
+        self._slots.release()
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for smtp, _ in idle:
+            _close(smtp)
+
+    def stats(self) -> dict:
+        return {"size": self.size, "idle": len(self._idle), "opened": self.opened, "reused": self.reused}
+
+def enqueue_email(db, to_address: str, subject: str, body: str, upload_token_id: Optional[int] = None) -> OutboundEmail:
+    """Queue an email for delivery. The caller commits, then calls mailer.notify()."""
+    email = OutboundEmail(
+        upload_token_id=upload_token_id,
+        to_address=to_address,
+        subject=subject,
+        body=body,
+        status="queued",
+        attempts=0,
+        next_attempt_at=datetime.utcnow(),
+    )
+    db.add(email)
+    return email
+
+def retry_delay(attempts: int) -> float:
+    delay = settings.email_retry_base_seconds * 2 ** (attempts - 1)
+    return min(delay, MAX_RETRY_DELAY_SECONDS) * random.uniform(0.8, 1.2)
+
+def claim_due(limit: int) -> List[dict]:
+    """
+    Mark up to `limit` due emails as sending and return them. The claim lasts as
+    long as the pool needs to send them all, an SMTP timeout per round of
+    `smtp_pool_size` messages plus one round for connecting; after that emails
+    held by a process that died are picked up again. Each claim bumps `attempts`,
+    which record_results checks to tell a live claim from a lapsed one.
+    """
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        emails = (
+            db.query(OutboundEmail)
+            .filter(OutboundEmail.status.in_(("queued", "sending")), OutboundEmail.next_attempt_at <= now)
+            .order_by(OutboundEmail.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        rounds = math.ceil(len(emails) / max(settings.smtp_pool_size, 1)) + 1
+        lease = timedelta(seconds=rounds * settings.smtp_timeout_seconds)
+        claimed = []
+        for email in emails:
+            email.status = "sending"
+            email.attempts += 1
+            email.next_attempt_at = now + lease
+            claimed.append({
+                "id": email.id,
+                "to_address": email.to_address,
+                "subject": email.subject,
+                "body": email.body,
+                "attempts": email.attempts,
+            })
+        db.commit()
+    return claimed
+
+def record_results(results: List[Tuple[dict, Optional[str], bool]]) -> Tuple[int, int, int]:
+    """
+    Store (email, error, permanent) outcomes of emails claimed by claim_due.
+    Returns (sent, retrying, failed). An outcome is dropped when its claim lapsed
+    and another pass claimed the email again; that pass records its own.
+    """
+    now = datetime.utcnow()
+    outcomes = Counter()
+    with SessionLocal() as db:
+        for item, error, permanent in results:
+            if error is None:
+                values = {"status": "sent", "sent_at": now}
+            elif permanent or item["attempts"] >= settings.email_max_attempts:
+                values = {"status": "failed"}
+            else:
+                values = {"status": "queued", "next_attempt_at": now + timedelta(seconds=retry_delay(item["attempts"]))}
+            claim = update(OutboundEmail).where(
+                OutboundEmail.id == item["id"],
+                OutboundEmail.status == "sending",
+                OutboundEmail.attempts == item["attempts"],
+            )
+            if db.execute(claim.values(last_error=error, **values)).rowcount != 1:
+                logger.warning(f"Email {item['id']} attempt {item['attempts']}: claim lost, outcome not recorded")
+                continue
+            outcomes[values["status"]] += 1
+        db.commit()
+    return outcomes["sent"], outcomes["queued"], outcomes["failed"]
+
+class Mailer:
+    """Background sender; notify() after committing new emails to send them right away."""
+
+    def __init__(self):
+        self.pool = SMTPPool(settings.smtp_pool_size, settings.smtp_idle_seconds)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    def _send(self, item: dict) -> Tuple[dict, Optional[str], bool]:
+        msg = MIMEText(item["body"])
+        msg["Subject"] = item["subject"]
+        msg["From"] = settings.notify_from_email
+        msg["To"] = item["to_address"]
+        # Derived from the row id only, so every retry carries the same ID and recipients can de-duplicate
+        msg["Message-ID"] = f"<outbound-{item['id']}@{message_id_domain()}>"
+        try:
+            with self.pool.connection() as smtp:
+                smtp.send_message(msg)
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused) as e:
+            return item, str(e), True
+        except smtplib.SMTPAuthenticationError as e:
+            return item, str(e), False  # a configuration problem; retry once it is fixed
+        except smtplib.SMTPResponseException as e:
+            return item, f"{e.smtp_code} {e.smtp_error!r}", 500 <= e.smtp_code < 600
+        except (smtplib.SMTPException, OSError) as e:
+            return item, f"{type(e).__name__}: {e}", False
+        return item, None, False
+
+    async def deliver_due(self) -> int:
+        batch = await run_in_threadpool(claim_due, settings.email_batch_size)
+        if not batch:
+            return 0
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.pool.size, thread_name_prefix="smtp")
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(loop.run_in_executor(self._executor, self._send, item) for item in batch))
+        sent, retrying, failed = await run_in_threadpool(record_results, results)
+        self.sent += sent
+        self.retried += retrying
+        self.failed += failed
+        for item, error, _ in results:
+            if error:
+                logger.warning(f"Email {item['id']} attempt {item['attempts']} failed: {error}")
+        return len(batch)
+
+    async def run(self) -> None:
+        self._wake = asyncio.Event()
+        while True:
+            try:
+                delivered = await self.deliver_due()
+            except Exception:
+                logger.exception("Email delivery pass failed")
+                delivered = 0
+            if delivered >= settings.email_batch_size:
+                continue  # more may be waiting
+            try:
+                await asyncio.wait_for(self._wake.wait(), settings.email_poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self.run())
+
+    def notify(self) -> None:
+        if self._wake is not None:
+            self._wake.set()
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self.pool.close_all()
+
+    def stats(self) -> dict:
+        return {"sent": self.sent, "retried": self.retried, "failed": self.failed, "smtp": self.pool.stats()}
+
+mailer = Mailer()
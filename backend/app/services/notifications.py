@@ -1,5 +1,236 @@
-# Stub: later integrate email/SMS push. For now, just log.
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
 from app.utils.logging import logger
 
-def notify_patient(email: str, message: str):
-    logger.info(f"Notify {email}: {message}")
+# notify_patient() only puts the notification on an in-process queue. A
+# dispatcher task merges everything for one recipient that arrives within
+# NOTIFY_DIGEST_SECONDS into a single digest, then hands digests to each
+# configured channel in batches. Requests never wait on delivery; when the
+# queue is full, notifications are dropped and counted.
+
+@dataclass(frozen=True)
+class Notification:
+    recipient: str
+    message: str
+    kind: str = "general"
+    created_at: float = field(default_factory=time.time)
+
+@dataclass
+class Digest:
+    """Everything queued for one recipient during one digest window."""
+    recipient: str
+    notifications: List[Notification]
+    due: float  # monotonic time the window closes
+
+    @property
+    def subject(self) -> str:
+        if len(self.notifications) == 1:
+            return f"MEDST: {self.notifications[0].message}"
+        return f"MEDST: {len(self.notifications)} new notifications"
+
+    @property
+    def body(self) -> str:
+        return "\n".join(f"- {n.message}" for n in self.notifications) + "\n"
+
+class Channel:
+    """Delivers batches of digests. Subclass and add to CHANNELS to plug in SMS, push, etc."""
+    name = "channel"
+    max_batch = 100
+
+    async def send(self, digests: List[Digest]) -> None:
+        raise NotImplementedError
+
+class LogChannel(Channel):
+    name = "log"
+
+    async def send(self, digests: List[Digest]) -> None:
+        for digest in digests:
+            logger.info(f"Notify {digest.recipient}: " + "; ".join(n.message for n in digest.notifications))
+
+class EmailChannel(Channel):
+    """Writes each digest to the outbound email queue (services/mailer.py), one transaction per batch."""
+    name = "email"
+
+    def _enqueue(self, digests: List[Digest]) -> None:
+        from app.database import SessionLocal
+        from app.services.mailer import enqueue_email
+
+        with SessionLocal() as db:
+            for digest in digests:
+                enqueue_email(db, digest.recipient, digest.subject, digest.body)
+            db.commit()
+
+    async def send(self, digests: List[Digest]) -> None:
+        from app.services.mailer import mailer
+
+        await run_in_threadpool(self._enqueue, digests)
+        mailer.notify()
+
+class MemoryChannel(Channel):
+    """Keeps what it is sent, for tests and local runs. Set `fail` to make sends raise."""
+    name = "memory"
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.fail = False
+        self.batches: List[List[Digest]] = []
+
+    @property
+    def delivered(self) -> List[Digest]:
+        return [digest for batch in self.batches for digest in batch]
+
+    async def send(self, digests: List[Digest]) -> None:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("memory channel set to fail")
+        self.batches.append(list(digests))
+
+CHANNELS = {"log": LogChannel, "email": EmailChannel, "memory": MemoryChannel}
+
+def channels_from_settings() -> List[Channel]:
+    names = [n.strip() for n in settings.notify_channels.split(",") if n.strip()]
+    unknown = [n for n in names if n not in CHANNELS]
+    if unknown:
+        raise ValueError(f"Unknown notification channels: {', '.join(unknown)}")
+    return [CHANNELS[n]() for n in names]
+
+class NotificationDispatcher:
+    def __init__(self, channels: List[Channel], window: float, max_items: int, max_queue: int):
+        self.channels = channels
+        self.window = window
+        self.max_items = max_items
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: Dict[str, Digest] = {}
+        self.enqueued = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.digests_dispatched = 0
+        self.notifications_dispatched = 0
+        self.batches_sent = 0
+        self.channel_errors: Dict[str, int] = {}
+        self.max_queue_depth = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def submit(self, notification: Notification) -> bool:
+        """Queue a notification without blocking. Returns False if it was dropped."""
+        if self._queue is None:
+            # Dispatcher not running (scripts, tests): deliver nowhere but the log
+            logger.info(f"Notify {notification.recipient}: {notification.message}")
+            return False
+        try:
+            self._queue.put_nowait(notification)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:  # once, then periodically; the count is in stats()
+                logger.warning(f"Notification queue full; {self.dropped} notifications dropped so far")
+            return False
+        self.enqueued += 1
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return True
+
+    def _add(self, notification: Notification) -> None:
+        digest = self._pending.get(notification.recipient)
+        if digest is None:
+            self._pending[notification.recipient] = Digest(
+                notification.recipient, [notification], time.monotonic() + self.window
+            )
+        else:
+            digest.notifications.append(notification)
+            self.coalesced += 1
+            if len(digest.notifications) >= self.max_items:
+                digest.due = time.monotonic()
+
+    async def _deliver(self, digests: List[Digest]) -> None:
+        for channel in self.channels:
+            for start in range(0, len(digests), channel.max_batch):
+                batch = digests[start:start + channel.max_batch]
+                try:
+                    await channel.send(batch)
+                except Exception:
+                    self.channel_errors[channel.name] = self.channel_errors.get(channel.name, 0) + len(batch)
+                    logger.exception(f"Notification channel {channel.name} failed for {len(batch)} digests")
+                else:
+                    self.batches_sent += 1
+        now = time.time()
+        for digest in digests:
+            self.last_lag = now - digest.notifications[0].created_at
+            self.max_lag = max(self.max_lag, self.last_lag)
+        self.digests_dispatched += len(digests)
+        self.notifications_dispatched += sum(len(d.notifications) for d in digests)
+
+    async def flush(self, everything: bool = False) -> int:
+        """Deliver digests whose window has closed (or all of them). Returns digests delivered."""
+        now = time.monotonic()
+        due = [r for r, d in self._pending.items() if everything or d.due <= now]
+        digests = [self._pending.pop(r) for r in due]
+        if digests:
+            await self._deliver(digests)
+        return len(digests)
+
+    async def run(self) -> None:
+        while True:
+            timeout = None
+            if self._pending:
+                timeout = max(0.0, min(d.due for d in self._pending.values()) - time.monotonic())
+            try:
+                notification = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            else:
+                self._add(notification)
+                while not self._queue.empty():
+                    self._add(self._queue.get_nowait())
+            await self.flush()
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop the dispatcher and deliver whatever is still waiting."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._queue is not None:
+            while not self._queue.empty():
+                self._add(self._queue.get_nowait())
+            self._queue = None
+        await self.flush(everything=True)
+
+    def stats(self) -> dict:
+        oldest = min((d.notifications[0].created_at for d in self._pending.values()), default=None)
+        return {
+            "channels": [c.name for c in self.channels],
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "queue_capacity": self.max_queue,
+            "pending_digests": len(self._pending),
+            "oldest_pending_seconds": round(time.time() - oldest, 3) if oldest else 0.0,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "digests_dispatched": self.digests_dispatched,
+            "notifications_dispatched": self.notifications_dispatched,
+            "batches_sent": self.batches_sent,
+            "channel_errors": self.channel_errors,
+            "last_lag_seconds": round(self.last_lag, 3),
+            "max_lag_seconds": round(self.max_lag, 3),
+        }
+
+dispatcher = NotificationDispatcher(
+    channels_from_settings(),
+    window=settings.notify_digest_seconds,
+    max_items=settings.notify_digest_max_items,
+    max_queue=settings.notify_queue_size,
+)
+
+def notify_patient(email: str, message: str, kind: str = "general") -> bool:
+    return dispatcher.submit(Notification(email, message, kind))
@@ -0,0 +1,115 @@
+import io
+import os
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional
+from PIL import Image
+from app.config import settings
+
+# tesserocr binds the Tesseract C API, so a worker loads the language data once
+# and reuses it. It is required (see check_engine); with OCR_REQUIRED=false we
+# fall back to pytesseract, which starts a tesseract process per image.
+try:
+    import tesserocr
+except ImportError:  # pragma: no cover - depends on system libtesseract
+    tesserocr = None
+import pytesseract
+
+class OcrError(RuntimeError):
+    """OCR failed. Raised in place of engine errors, which do not all survive pickling back to the API process."""
+
+class OcrTimeout(OcrError):
+    pass
+
+@dataclass
+class OcrResult:
+    text: str
+    seconds: float
+
+# OCR runs in the ingestion worker process that needs it; documents are already
+# spread over INGEST_WORKERS processes, so there is no pool of its own. The
+# tesserocr handle (and its language data) is loaded once per process.
+_api = None
+
+def _get_api():
+    global _api
+    if _api is None and tesserocr is not None:
+        _api = tesserocr.PyTessBaseAPI(lang=settings.tess_lang)
+    return _api
+
+def _forget_api() -> None:
+    # The handle wraps native state that must not be shared with a forked child
+    global _api
+    _api = None
+
+os.register_at_fork(after_in_child=_forget_api)
+
+def _ocr_one(image_bytes: bytes, timeout: float) -> OcrResult:
+    started = time.perf_counter()
+    api = _get_api()
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        if api is not None:
+            api.SetImage(image)
+            try:
+                if not api.Recognize(int(timeout * 1000)):
+                    raise OcrTimeout(f"OCR exceeded {timeout}s")
+                text = api.GetUTF8Text()
+            finally:
+                api.Clear()
+        else:
+            # pytesseract kills the tesseract process when the timeout expires
+            try:
+                text = pytesseract.image_to_string(image, lang=settings.tess_lang, timeout=timeout)
+            except pytesseract.TesseractNotFoundError as e:
+                raise OcrError(str(e)) from None
+            except pytesseract.TesseractError as e:
+                raise OcrError(f"tesseract exited with {e.status}: {e.message}") from None
+            except RuntimeError as e:
+                raise OcrTimeout(str(e)) from None
+    return OcrResult(text, time.perf_counter() - started)
+
+def check_engine() -> str:
+    """
+    Load the Tesseract engine once, so a missing tesserocr or language pack fails
+    at startup instead of on the first scanned upload. Returns ocr_version().
+    """
+    if tesserocr is None:
+        raise OcrError("tesserocr is not installed; it is required to OCR scanned documents")
+    try:
+        with tesserocr.PyTessBaseAPI(lang=settings.tess_lang):
+            pass
+    except RuntimeError as e:
+        raise OcrError(f"Tesseract could not load language {settings.tess_lang!r}: {e}") from None
+    return ocr_version()
+
+@lru_cache(maxsize=1)
+def ocr_version() -> str:
+    """Engine, engine version and language, for extraction cache keys."""
+    if tesserocr is not None:
+        engine = "tesserocr-" + tesserocr.tesseract_version().splitlines()[0].split()[-1]
+    else:
+        try:
+            engine = f"tesseract-{pytesseract.get_tesseract_version()}"
+        except pytesseract.TesseractNotFoundError:
+            engine = "no-ocr"  # text-layer PDFs still extract; images fail with OcrError
+    return f"{engine}-{settings.tess_lang}"
+
+def ocr_images(
+    images: List[bytes], timeout: Optional[float] = None, batch_timeout: Optional[float] = None
+) -> List[OcrResult]:
+    """
+    OCR a batch of encoded images (PNG, JPEG, TIFF...) in order. Each image gets
+    `timeout` seconds (OCR_TIMEOUT_SECONDS by default) and the whole batch
+    `batch_timeout` (OCR_BATCH_TIMEOUT_SECONDS), both enforced by the engine.
+    """
+    timeout = timeout or settings.ocr_timeout_seconds
+    batch_timeout = batch_timeout or settings.ocr_batch_timeout_seconds
+    deadline = time.monotonic() + batch_timeout
+    results = []
+    for image in images:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise OcrTimeout(f"OCR of {len(images)} images exceeded {batch_timeout}s")
+        results.append(_ocr_one(image, min(timeout, remaining)))
+    return results
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+from app.config import settings
+from app.security import hash_password, verify_and_update_password
+from app.utils.logging import logger
+from app.utils.metrics import password_hash_rejected, password_hash_seconds, registry
+
+# Password hashing is deliberately slow, so it runs on its own small process
+# pool rather than the threadpool shared by every sync endpoint. Callers beyond
+# PASSWORD_HASH_MAX_PENDING are turned away instead of queueing without bound.
+
+class HasherBusy(RuntimeError):
+    pass
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pending = 0
+_stats = {"completed": 0, "rejected": 0, "hash_seconds": 0.0, "wait_seconds": 0.0, "max_seconds": 0.0}
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.password_hash_workers)
+    return _pool
+
+def _forget_pool() -> None:
+    # A forked child must not reuse its parent's pool
+    global _pool, _pending
+    _pool = None
+    _pending = 0
+
+os.register_at_fork(after_in_child=_forget_pool)
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+registry.gauge("medst_password_hash_pending", "Password operations queued or running.", lambda: {(): _pending})
+
+def _discard_pool(broken: ProcessPoolExecutor) -> None:
+    global _pool
+    broken.shutdown(wait=False, cancel_futures=True)
+    if _pool is broken:  # a concurrent caller may have replaced it already
+        _pool = None
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+async def _submit(fn, *args):
+    global _pending
+    if _pending >= settings.password_hash_max_pending:
+        _stats["rejected"] += 1
+        password_hash_rejected.inc()
+        raise HasherBusy("Too many password operations in progress")
+    _pending += 1
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    try:
+        pool = _get_pool()
+        try:
+            result, hash_seconds = await loop.run_in_executor(pool, _timed, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (killed, out of memory) and took the pool with it;
+            # start a new one and retry once, as hashing is safe to repeat
+            logger.error("Password hashing pool is broken; starting a new one")
+            _discard_pool(pool)
+            result, hash_seconds = await loop.run_in_executor(_get_pool(), _timed, fn, *args)
+    finally:
+        _pending -= 1
+    total = time.perf_counter() - started
+    password_hash_seconds.observe(hash_seconds, "hash")
+    password_hash_seconds.observe(total - hash_seconds, "wait")
+    _stats["completed"] += 1
+    _stats["hash_seconds"] += hash_seconds
+    _stats["wait_seconds"] += total - hash_seconds
+    _stats["max_seconds"] = max(_stats["max_seconds"], total)
+    return result
+
+async def hash_password_async(password: str) -> str:
+    return await _submit(hash_password, password)
+
+async def verify_and_update_async(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return await _submit(verify_and_update_password, password, hashed)
+
+def stats() -> dict:
+    return {
+        "pending": _pending,
+        "max_pending": settings.password_hash_max_pending,
+        "workers": settings.password_hash_workers,
+        **_stats,
+    }
@@ -0,0 +1,173 @@
+import html
+import math
+import re
+from collections import Counter, defaultdict
+from datetime import date
+from typing import Iterable, List, Optional
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.orm import load_only
+from app.models import Record, RecordTerm
+
+# PostgreSQL searches a generated tsvector column (records.search_vector, see
+# migration 0002) with a GIN index. Other databases (SQLite in local setups)
+# use the record_terms inverted index, maintained here in Python.
+
+SEARCH_CONFIG = "english"
+# Highlights are delimited with private-use characters rather than HTML, so the
+# (untrusted, uploaded) text can be escaped before the <mark> tags are added
+MARK_START, MARK_STOP = "\ue000", "\ue001"
+HEADLINE_OPTIONS = f"StartSel={MARK_START}, StopSel={MARK_STOP}, MaxFragments=2, MaxWords=20, MinWords=5"
+
+TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or that the this to was were with".split()
+)
+MAX_TERM_LENGTH = 64
+SNIPPET_WORDS = 20
+
+def is_postgres(db) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+def tokenize(value: Optional[str]) -> List[str]:
+    return [t for t in TOKEN.findall((value or "").lower()) if t not in STOPWORDS and len(t) <= MAX_TERM_LENGTH]
+
+def backfill_search_terms(db) -> int:
+    """Build the fallback index for records that predate it. A no-op on PostgreSQL."""
+    if is_postgres(db) or db.query(RecordTerm.record_id).first():
+        return 0
+    records = db.query(Record).options(
+        load_only(Record.id, Record.patient_id, Record.document_type, Record.provider_name,
+                  Record.provider_clinic, Record.content_text)
+    ).all()
+    index_records(db, records)
+    return len(records)
+
+def index_records(db, records: Iterable[Record]) -> None:
+    """Add flushed records to the fallback index. A no-op on PostgreSQL. The caller commits."""
+    if is_postgres(db):
+        return
+    rows = []
+    for record in records:
+        counts = Counter(tokenize(record.content_text))
+        for field in (record.document_type, record.provider_name, record.provider_clinic):
+            counts.update(tokenize(field))
+        rows.extend(
+            {"record_id": record.id, "patient_id": record.patient_id, "term": term, "count": n}
+            for term, n in counts.items()
+        )
+    if rows:
+        db.execute(RecordTerm.__table__.insert(), rows)
+
+def unindex_records(db, records: Iterable[Record]) -> None:
+    if is_postgres(db):
+        return
+    ids = [record.id for record in records]
+    if ids:
+        db.query(RecordTerm).filter(RecordTerm.record_id.in_(ids)).delete(synchronize_session=False)
+
+def _filtered(stmt, document_type: Optional[str], visit_from: Optional[date], visit_to: Optional[date]):
+    if document_type:
+        stmt = stmt.where(Record.document_type == document_type)
+    if visit_from:
+        stmt = stmt.where(Record.visit_date >= visit_from.isoformat())
+    if visit_to:
+        stmt = stmt.where(Record.visit_date <= visit_to.isoformat())
+    return stmt
+
+def _to_html(snippet: Optional[str]) -> Optional[str]:
+    """Escape a snippet delimited with MARK_START/MARK_STOP and turn the delimiters into <mark> tags."""
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(MARK_START, "<mark>").replace(MARK_STOP, "</mark>")
+
+def _hit(record: Record, rank: float, snippet: Optional[str]) -> dict:
+    return {
+        "id": record.id,
+        "document_type": record.document_type,
+        "visit_date": record.visit_date,
+        "provider_name": record.provider_name,
+        "provider_clinic": record.provider_clinic,
+        "created_at": record.created_at,
+        "rank": rank,
+        "snippet": _to_html(snippet),
+    }
+
+def _search_postgres(db, patient_id, query, limit, offset, document_type, visit_from, visit_to) -> List[dict]:
+    tsquery = func.websearch_to_tsquery(literal_column(f"'{SEARCH_CONFIG}'"), query)
+    vector = literal_column("records.search_vector")
+    rank = func.ts_rank_cd(vector, tsquery).label("rank")
+    ranked = _filtered(
+        select(Record.id, rank).where(Record.patient_id == patient_id, vector.op("@@")(tsquery)),
+        document_type, visit_from, visit_to,
+    ).order_by(rank.desc(), Record.id.desc()).limit(limit).offset(offset).subquery()
+
+    # Headlines are costly, so they are only built for the page being returned
+    headline = func.ts_headline(
+        literal_column(f"'{SEARCH_CONFIG}'"), func.translate(Record.content_text, MARK_START + MARK_STOP, ""),
+        tsquery, HEADLINE_OPTIONS,
+    ).label("snippet")
+    stmt = (
+        select(Record, ranked.c.rank, headline)
+        .join(ranked, ranked.c.id == Record.id)
+        .options(load_only(Record.id, Record.document_type, Record.visit_date, Record.provider_name,
+                           Record.provider_clinic, Record.created_at))
+        .order_by(ranked.c.rank.desc(), Record.id.desc())
+    )
+    return [_hit(record, float(r), snippet) for record, r, snippet in db.execute(stmt)]
+
+def _snippet(content: Optional[str], terms: List[str]) -> Optional[str]:
+    if not content:
+        return None
+    # Stray delimiters in the text itself must not open or close a highlight
+    words = content.replace(MARK_START, "").replace(MARK_STOP, "").split()
+    wanted = set(terms)
+    first = next((i for i, w in enumerate(words) if set(tokenize(w)) & wanted), 0)
+    start = max(first - SNIPPET_WORDS // 4, 0)
+    out = []
+    for w in words[start:start + SNIPPET_WORDS]:
+        out.append(f"{MARK_START}{w}{MARK_STOP}" if set(tokenize(w)) & wanted else w)
+    return " ".join(out)
+
+def _search_fallback(db, patient_id, query, limit, offset, document_type, visit_from, visit_to) -> List[dict]:
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return []
+    postings = db.execute(
+        select(RecordTerm.record_id, RecordTerm.term, RecordTerm.count)
+        .where(RecordTerm.patient_id == patient_id, RecordTerm.term.in_(terms))
+    ).all()
+    by_record = defaultdict(dict)
+    doc_freq = Counter()
+    for record_id, term, count in postings:
+        by_record[record_id][term] = count
+        doc_freq[term] += 1
+    # Every term must match, as with websearch_to_tsquery
+    candidates = {rid: tf for rid, tf in by_record.items() if len(tf) == len(terms)}
+    if not candidates:
+        return []
+
+    allowed = set(db.execute(
+        _filtered(select(Record.id).where(Record.id.in_(candidates)), document_type, visit_from, visit_to)
+    ).scalars())
+    total_docs = db.query(func.count(Record.id)).filter(Record.patient_id == patient_id).scalar() or 1
+    scores = {
+        rid: sum((1 + math.log(tf[t])) * math.log(1 + total_docs / doc_freq[t]) for t in terms)
+        for rid, tf in candidates.items() if rid in allowed
+    }
+    page = sorted(scores, key=lambda rid: (-scores[rid], -rid))[offset:offset + limit]
+    records = {r.id: r for r in db.query(Record).filter(Record.id.in_(page)).all()} if page else {}
+    return [_hit(records[rid], scores[rid], _snippet(records[rid].content_text, terms)) for rid in page]
+
+def search_records(
+    db,
+    patient_id: int,
+    query: str,
+    limit: int = 20,
+    offset: int = 0,
+    document_type: Optional[str] = None,
+    visit_from: Optional[date] = None,
+    visit_to: Optional[date] = None,
+) -> List[dict]:
+    """Ranked full-text search over a patient's records, with highlighted snippets."""
+    search = _search_postgres if is_postgres(db) else _search_fallback
+    return search(db, patient_id, query, limit, offset, document_type, visit_from, visit_to)
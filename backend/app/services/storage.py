@@ -1,87 +1,369 @@
+import asyncio
+import io
 import os
-import uuid
-from datetime import datetime
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
 from app.config import settings
+from app.utils.metrics import storage_call
 
-# Optional: S3 and GCS clients
-import boto3
-from google.cloud import storage as gcs
+# The S3 and GCS SDKs are slow to import, so each backend imports its own on creation
 
-def _s3_client():
-    return boto3.client(
-        "s3",
-        region_name=settings.s3_region,
-        aws_access_key_id=settings.s3_access_key_id,
-        aws_secret_access_key=settings.s3_secret_access_key,
-    )
+def generate_storage_key(content_hash: str, filename: str) -> str:
+    """Content-addressed key: identical files share one stored blob."""
+    ext = os.path.splitext(filename)[1].lower()
+    return f"blobs/{content_hash[:2]}/{content_hash}{ext}"
 
-def _gcs_client():
-    return gcs.Client.from_service_account_json(settings.google_app_creds)
+def _read_range(f: BinaryIO, start: int, end: int, chunk_size: int) -> Iterator[bytes]:
+    f.seek(start)
+    remaining = end - start + 1
+    while remaining > 0:
+        data = f.read(min(chunk_size, remaining))
+        if not data:
+            break
+        remaining -= len(data)
+        yield data
 
-def generate_storage_key(patient_id: int, filename: str) -> str:
-    ext = os.path.splitext(filename)[1].lower()
-    ts = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-    return f"patients/{patient_id}/{ts}-{uuid.uuid4().hex}{ext}"
 
-def save_file(content: bytes, storage_key: str) -> str:
-    provider = settings.storage_provider
-    if provider == "local":
-        base = settings.storage_local_path
-        path = os.path.join(base, storage_key)
+class StorageBackend:
+    """
+    Base class for file storage providers. Backends are created once per process
+    (see get_storage) and keep their clients and connection pools for reuse.
+    Subclasses implement the blocking primitives; async and batch variants are derived.
+    """
+    provider = "base"
+
+    def __init__(self):
+        self._batch_pool = ThreadPoolExecutor(max_workers=settings.storage_max_connections)
+
+    def put(self, storage_key: str, fileobj: BinaryIO) -> str:
+        """Write a file object in chunks and return the object's URI."""
+        raise NotImplementedError
+
+    def get(self, storage_key: str) -> bytes:
+        raise NotImplementedError
+
+    def delete(self, storage_key: str) -> None:
+        raise NotImplementedError
+
+    def size(self, storage_key: str) -> int:
+        raise NotImplementedError
+
+    def iter_range(self, storage_key: str, start: int, end: int, chunk_size: int = 256 * 1024) -> Iterator[bytes]:
+        """Yield bytes start..end (inclusive), chunk by chunk."""
+        raise NotImplementedError
+
+    def download_to(self, storage_key: str, fileobj: BinaryIO) -> None:
+        for chunk in self.iter_range(storage_key, 0, self.size(storage_key) - 1):
+            fileobj.write(chunk)
+
+    def local_path(self, storage_key: str) -> Optional[str]:
+        """Filesystem path of the object, for backends that keep files on local disk."""
+        return None
+
+    # Batch operations
+    def put_many(self, items: Iterable[Tuple[str, BinaryIO]]) -> List[str]:
+        return list(self._batch_pool.map(lambda item: self.put(*item), items))
+
+    def get_many(self, storage_keys: Iterable[str]) -> Dict[str, bytes]:
+        keys = list(storage_keys)
+        return dict(zip(keys, self._batch_pool.map(self.get, keys)))
+
+    def delete_many(self, storage_keys: Iterable[str]) -> None:
+        list(self._batch_pool.map(self.delete, storage_keys))
+
+    # Async variants run the blocking call in a worker thread
+    async def aput(self, storage_key: str, fileobj: BinaryIO) -> str:
+        return await asyncio.to_thread(self.put, storage_key, fileobj)
+
+    async def aget(self, storage_key: str) -> bytes:
+        return await asyncio.to_thread(self.get, storage_key)
+
+    async def adelete(self, storage_key: str) -> None:
+        await asyncio.to_thread(self.delete, storage_key)
+
+    async def asize(self, storage_key: str) -> int:
+        return await asyncio.to_thread(self.size, storage_key)
+
+    async def aput_many(self, items: Iterable[Tuple[str, BinaryIO]]) -> List[str]:
+        return await asyncio.to_thread(self.put_many, list(items))
+
+    async def aget_many(self, storage_keys: Iterable[str]) -> Dict[str, bytes]:
+        return await asyncio.to_thread(self.get_many, list(storage_keys))
+
+    async def adelete_many(self, storage_keys: Iterable[str]) -> None:
+        await asyncio.to_thread(self.delete_many, list(storage_keys))
+
+
+class LocalStorageBackend(StorageBackend):
+    provider = "local"
+
+    def __init__(self, base_path: str):
+        super().__init__()
+        self.base_path = base_path
+
+    def _path(self, storage_key: str) -> str:
+        return os.path.join(self.base_path, storage_key)
+
+    def put(self, storage_key: str, fileobj: BinaryIO) -> str:
+        path = self._path(storage_key)
         os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "wb") as f:
-            f.write(content)
+        try:
+            with open(path, "wb") as f:
+                shutil.copyfileobj(fileobj, f, settings.upload_chunk_bytes)
+        except BaseException:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
         return path
-    elif provider == "s3":
-        client = _s3_client()
-        client.put_object(Bucket=settings.s3_bucket, Key=storage_key, Body=content)
-        return f"s3://{settings.s3_bucket}/{storage_key}"
-    elif provider == "gcs":
-        client = _gcs_client()
-        bucket = client.bucket(settings.gcs_bucket)
-        blob = bucket.blob(storage_key)
-        blob.upload_from_string(content)
-        return f"gs://{settings.gcs_bucket}/{storage_key}"
-    else:
-        raise ValueError(f"Unsupported storage provider: {provider}")
 
-def get_file_content(storage_key: str) -> bytes:
-    """Retrieve file content from storage."""
-    provider = settings.storage_provider
-    if provider == "local":
-        base = settings.storage_local_path
-        path = os.path.join(base, storage_key)
+    def get(self, storage_key: str) -> bytes:
+        path = self._path(storage_key)
         if not os.path.exists(path):
             raise FileNotFoundError(f"File not found: {path}")
         with open(path, "rb") as f:
             return f.read()
-    elif provider == "s3":
-        client = _s3_client()
-        response = client.get_object(Bucket=settings.s3_bucket, Key=storage_key)
-        return response['Body'].read()
-    elif provider == "gcs":
-        client = _gcs_client()
-        bucket = client.bucket(settings.gcs_bucket)
-        blob = bucket.blob(storage_key)
-        return blob.download_as_bytes()
-    else:
-        raise ValueError(f"Unsupported storage provider: {provider}")
 
-def delete_file(storage_key: str) -> None:
-    """Delete file from storage."""
-    provider = settings.storage_provider
-    if provider == "local":
-        base = settings.storage_local_path
-        path = os.path.join(base, storage_key)
+    def delete(self, storage_key: str) -> None:
+        path = self._path(storage_key)
         if os.path.exists(path):
             os.remove(path)
-    elif provider == "s3":
-        client = _s3_client()
-        client.delete_object(Bucket=settings.s3_bucket, Key=storage_key)
-    elif provider == "gcs":
-        client = _gcs_client()
-        bucket = client.bucket(settings.gcs_bucket)
-        blob = bucket.blob(storage_key)
-        blob.delete()
-    else:
-        raise ValueError(f"Unsupported storage provider: {provider}")
+
+    def size(self, storage_key: str) -> int:
+        path = self._path(storage_key)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"File not found: {path}")
+        return os.path.getsize(path)
+
+    def iter_range(self, storage_key: str, start: int, end: int, chunk_size: int = 256 * 1024) -> Iterator[bytes]:
+        with open(self._path(storage_key), "rb") as f:
+            yield from _read_range(f, start, end, chunk_size)
+
+    def local_path(self, storage_key: str) -> Optional[str]:
+        return self._path(storage_key)
+
+
+class MemoryStorageBackend(StorageBackend):
+    """
+    In-process dict store; a stand-in for tests and local experiments.
+    Objects are not visible to the ingestion worker processes.
+    """
+    provider = "memory"
+
+    def __init__(self):
+        super().__init__()
+        self.objects: Dict[str, bytes] = {}
+
+    def put(self, storage_key: str, fileobj: BinaryIO) -> str:
+        self.objects[storage_key] = fileobj.read()
+        return f"memory://{storage_key}"
+
+    def get(self, storage_key: str) -> bytes:
+        if storage_key not in self.objects:
+            raise FileNotFoundError(f"File not found: {storage_key}")
+        return self.objects[storage_key]
+
+    def delete(self, storage_key: str) -> None:
+        self.objects.pop(storage_key, None)
+
+    def size(self, storage_key: str) -> int:
+        return len(self.get(storage_key))
+
+    def iter_range(self, storage_key: str, start: int, end: int, chunk_size: int = 256 * 1024) -> Iterator[bytes]:
+        yield from _read_range(io.BytesIO(self.get(storage_key)), start, end, chunk_size)
+
+
+class S3StorageBackend(StorageBackend):
+    provider = "s3"
+
+    def __init__(self):
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config as BotoConfig
+
+        super().__init__()
+        self.bucket = settings.s3_bucket
+        # boto3 clients are thread-safe; one client shares a single urllib3 pool
+        self.client = boto3.client(
+            "s3",
+            region_name=settings.s3_region,
+            aws_access_key_id=settings.s3_access_key_id,
+            aws_secret_access_key=settings.s3_secret_access_key,
+            config=BotoConfig(max_pool_connections=settings.storage_max_connections),
+        )
+        chunk = settings.upload_chunk_bytes
+        self.transfer_config = TransferConfig(multipart_threshold=chunk, multipart_chunksize=chunk)
+
+    def put(self, storage_key: str, fileobj: BinaryIO) -> str:
+        self.client.upload_fileobj(fileobj, self.bucket, storage_key, Config=self.transfer_config)
+        return f"s3://{self.bucket}/{storage_key}"
+
+    def get(self, storage_key: str) -> bytes:
+        response = self.client.get_object(Bucket=self.bucket, Key=storage_key)
+        return response["Body"].read()
+
+    def delete(self, storage_key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=storage_key)
+
+    def delete_many(self, storage_keys: Iterable[str]) -> None:
+        keys = list(storage_keys)
+        # DeleteObjects accepts up to 1000 keys per call
+        for i in range(0, len(keys), 1000):
+            objects = [{"Key": k} for k in keys[i:i + 1000]]
+            self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": objects, "Quiet": True})
+
+    def size(self, storage_key: str) -> int:
+        return self.client.head_object(Bucket=self.bucket, Key=storage_key)["ContentLength"]
+
+    def iter_range(self, storage_key: str, start: int, end: int, chunk_size: int = 256 * 1024) -> Iterator[bytes]:
+        response = self.client.get_object(Bucket=self.bucket, Key=storage_key, Range=f"bytes={start}-{end}")
+        body = response["Body"]
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def download_to(self, storage_key: str, fileobj: BinaryIO) -> None:
+        self.client.download_fileobj(self.bucket, storage_key, fileobj, Config=self.transfer_config)
+
+
+class GCSStorageBackend(StorageBackend):
+    provider = "gcs"
+
+    def __init__(self):
+        from google.cloud import storage as gcs
+
+        super().__init__()
+        # Credentials are loaded once; the client reuses its authorized HTTP session
+        self.client = gcs.Client.from_service_account_json(settings.google_app_creds)
+        self.bucket = self.client.bucket(settings.gcs_bucket)
+
+    def put(self, storage_key: str, fileobj: BinaryIO) -> str:
+        blob = self.bucket.blob(storage_key, chunk_size=settings.upload_chunk_bytes)
+        blob.upload_from_file(fileobj)
+        return f"gs://{settings.gcs_bucket}/{storage_key}"
+
+    def get(self, storage_key: str) -> bytes:
+        return self.bucket.blob(storage_key).download_as_bytes()
+
+    def delete(self, storage_key: str) -> None:
+        self.bucket.blob(storage_key).delete()
+
+    def delete_many(self, storage_keys: Iterable[str]) -> None:
+        keys = list(storage_keys)
+        # JSON API batches are limited to 100 calls
+        for i in range(0, len(keys), 100):
+            with self.client.batch():
+                for key in keys[i:i + 100]:
+                    self.bucket.blob(key).delete()
+
+    def size(self, storage_key: str) -> int:
+        blob = self.bucket.get_blob(storage_key)
+        if blob is None:
+            raise FileNotFoundError(f"File not found: {storage_key}")
+        return blob.size
+
+    def iter_range(self, storage_key: str, start: int, end: int, chunk_size: int = 256 * 1024) -> Iterator[bytes]:
+        with self.bucket.blob(storage_key).open("rb", chunk_size=chunk_size) as f:
+            yield from _read_range(f, start, end, chunk_size)
+
+    def download_to(self, storage_key: str, fileobj: BinaryIO) -> None:
+        self.bucket.blob(storage_key).download_to_file(fileobj)
+
+
+def _create_backend(provider: str) -> StorageBackend:
+    if provider == "local":
+        return LocalStorageBackend(settings.storage_local_path)
+    if provider == "memory":
+        return MemoryStorageBackend()
+    if provider == "s3":
+        return S3StorageBackend()
+    if provider == "gcs":
+        return GCSStorageBackend()
+    raise ValueError(f"Unsupported storage provider: {provider}")
+
+_backend_override: Optional[StorageBackend] = None
+
+@lru_cache(maxsize=None)
+def _configured_backend() -> StorageBackend:
+    return _create_backend(settings.storage_provider)
+
+def get_storage() -> StorageBackend:
+    """The process-wide storage backend for the configured provider."""
+    return _backend_override or _configured_backend()
+
+def set_storage(backend: Optional[StorageBackend]) -> None:
+    """Replace the process-wide backend (e.g. with MemoryStorageBackend in tests); None restores it."""
+    global _backend_override
+    _backend_override = backend
+
+# Clients and sockets must not be shared with forked ingestion workers
+os.register_at_fork(after_in_child=_configured_backend.cache_clear)
+
+# Module-level helpers used by the routers and ingestion pipeline; each call is
+# timed per provider (medst_storage_call_duration_seconds)
+
+def save_stream(fileobj: BinaryIO, storage_key: str) -> str:
+    backend = get_storage()
+    with storage_call(backend.provider, "put"):
+        return backend.put(storage_key, fileobj)
+
+def save_file(content: bytes, storage_key: str) -> str:
+    return save_stream(io.BytesIO(content), storage_key)
+
+def get_file_content(storage_key: str) -> bytes:
+    """Retrieve file content from storage."""
+    backend = get_storage()
+    with storage_call(backend.provider, "get"):
+        return backend.get(storage_key)
+
+def delete_file(storage_key: str) -> None:
+    """Delete file from storage."""
+    backend = get_storage()
+    with storage_call(backend.provider, "delete"):
+        backend.delete(storage_key)
+
+def get_file_size(storage_key: str) -> int:
+    backend = get_storage()
+    with storage_call(backend.provider, "size"):
+        return backend.size(storage_key)
+
+def iter_file_range(storage_key: str, start: int, end: int, chunk_size: int = 256 * 1024) -> Iterator[bytes]:
+    """Stream a byte range. Only the wait for the first chunk is timed; the rest is paced by the client."""
+    backend = get_storage()
+    chunks = backend.iter_range(storage_key, start, end, chunk_size)
+    with storage_call(backend.provider, "read_range"):
+        first = next(chunks, None)
+    if first is not None:
+        yield first
+        yield from chunks
+
+def local_path(storage_key: str) -> Optional[str]:
+    """Filesystem path of a stored object when using local storage, else None."""
+    return get_storage().local_path(storage_key)
+
+@contextmanager
+def local_copy(storage_key: str) -> Iterator[str]:
+    """
+    Yield a filesystem path for a stored object. Local files are used in place;
+    remote objects are downloaded in chunks to a temp file that is removed afterwards.
+    """
+    backend = get_storage()
+    path = backend.local_path(storage_key)
+    if path:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"File not found: {path}")
+        yield path
+        return
+
+    suffix = os.path.splitext(storage_key)[1]
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as f, storage_call(backend.provider, "download"):
+            backend.download_to(storage_key, f)
+        yield path
+    finally:
+        os.remove(path)
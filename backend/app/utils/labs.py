@@ -0,0 +1,92 @@
+import re
+from typing import Optional, Tuple
+from app.utils.logging import logger
+
+# Parsed lab names vary ("HbA1c", "Hb A1c", "Glycated haemoglobin"); map them to one key
+TEST_ALIASES = {
+    "hba1c": "hba1c",
+    "hb a1c": "hba1c",
+    "a1c": "hba1c",
+    "glycated haemoglobin": "hba1c",
+    "glycated hemoglobin": "hba1c",
+    "cholesterol": "cholesterol",
+    "total cholesterol": "cholesterol",
+    "serum cholesterol": "cholesterol",
+    "ldl": "ldl",
+    "ldl cholesterol": "ldl",
+    "hdl": "hdl",
+    "hdl cholesterol": "hdl",
+    "triglycerides": "triglycerides",
+    "triglyceride": "triglycerides",
+    "glucose": "glucose",
+    "blood glucose": "glucose",
+    "fasting glucose": "glucose",
+    "fasting blood glucose": "glucose",
+    "random glucose": "glucose",
+    "haemoglobin": "haemoglobin",
+    "hemoglobin": "haemoglobin",
+    "hb": "haemoglobin",
+    "temperature": "temperature",
+    "temp": "temperature",
+    "body temperature": "temperature",
+}
+
+CANONICAL_UNITS = {
+    "mmol/l": "mmol/L",
+    "g/l": "g/L",
+    "g/dl": "g/dL",
+    "mg/dl": "mg/dL",
+    "%": "%",
+    "°c": "°C",
+}
+
+# mg/dL -> mmol/L divisors for analytes usually reported in molar units
+MOLAR_DIVISORS = {
+    "glucose": 18.016,
+    "cholesterol": 38.67,
+    "ldl": 38.67,
+    "hdl": 38.67,
+    "triglycerides": 88.57,
+}
+
+LAB_READING = re.compile(r"^\s*(?P<value>[0-9]*\.?[0-9]+)\s*(?P<unit>\S+)\s*$")
+NON_NAME = re.compile(r"[^a-z0-9% ]+")
+SPACES = re.compile(r"\s+")
+
+def _name_key(name: str) -> str:
+    return SPACES.sub(" ", NON_NAME.sub(" ", name.lower())).strip()
+
+def normalize_test_name(name: str) -> str:
+    key = _name_key(name)
+    return TEST_ALIASES.get(key, key)
+
+def is_known_test(name: str) -> bool:
+    return _name_key(name) in TEST_ALIASES
+
+def normalize_lab(name: str, reading: str) -> Optional[Tuple[str, float, str]]:
+    """
+    Turn a parsed lab result such as ("Fasting Glucose", "99 mg/dL") into
+    (test, value, unit) with a canonical name and unit: mg/dL becomes mmol/L
+    for analytes with a known molar mass and g/L otherwise, and g/dL becomes g/L.
+    Returns None if the reading is not a number with a unit we know.
+    """
+    m = LAB_READING.match(reading or "")
+    if not m:
+        return None
+    test = normalize_test_name(name)
+    if not test:
+        return None
+    unit = CANONICAL_UNITS.get(m.group("unit").lower())
+    if not unit:
+        # Logged so missing units can be added rather than quietly losing readings
+        logger.warning(f"Skipping lab reading {name!r}: unknown unit {m.group('unit')!r}")
+        return None
+    value = float(m.group("value"))
+    if unit == "g/dL":
+        value, unit = value * 10, "g/L"
+    elif unit == "mg/dL":
+        if test in MOLAR_DIVISORS:
+            value, unit = value / MOLAR_DIVISORS[test], "mmol/L"
+        else:
+            value, unit = value / 100, "g/L"
+    return test, round(value, 4), unit
@@ -1,8 +1,11 @@
 import logging
+from app.config import settings
 
 logger = logging.getLogger("medst")
-logger.setLevel(logging.INFO)
-handler = logging.StreamHandler()
-formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s")
-handler.setFormatter(formatter)
-logger.addHandler(handler)
+logger.setLevel(settings.log_level.upper())
+# Guard against a second handler (and doubled lines) if this module is imported under two names
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(process)d %(name)s: %(message)s")
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
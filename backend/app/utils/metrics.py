@@ -0,0 +1,327 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.config import settings
+from app.utils.logging import logger
+
+# A small in-process registry rendered in the Prometheus text format at
+# /metrics. Each API process keeps its own numbers, so scrape every process
+# (or run one per container). Work done in ingestion worker processes is
+# reported back with each result and recorded here by the API process.
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+IO_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Sequence[str]) -> LabelValues:
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"{self.name} takes labels {self.label_names}")
+        return tuple(str(v) for v in labels)
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_labels(self.label_names, key)} {_number(value)}"
+
+class Gauge(Metric):
+    """A value read at scrape time from `read`, which returns {label values: value}."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, read: Callable[[], Dict[LabelValues, float]], labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self.read = read
+
+    def samples(self) -> Iterator[str]:
+        try:
+            values = self.read()
+        except Exception:
+            logger.exception(f"Could not read gauge {self.name}")
+            return
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.label_names, key)} {_number(value)}"
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = REQUEST_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (last one is +Inf), sum, count
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0, 0])
+            series[0][index] += 1
+            series[1][0] += value
+            series[1][1] += 1
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return int(series[1][1]) if series else 0
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), list(totals))) for key, (counts, totals) in self._series.items())
+        for key, (counts, (total, count)) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.label_names, key)} {int(count)}"
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = REQUEST_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name: str, help: str, read: Callable[[], Dict[LabelValues, float]], labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, read, labels))
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+
+registry = Registry()
+
+http_request_seconds = registry.histogram(
+    "medst_http_request_duration_seconds", "Time to serve an HTTP request, by route template and status.",
+    ("method", "route", "status"),
+)
+http_requests_in_flight = 0
+registry.gauge("medst_http_requests_in_flight", "HTTP requests currently being served.", lambda: {(): http_requests_in_flight})
+
+db_checkout_seconds = registry.histogram(
+    "medst_db_pool_checkout_seconds", "Time spent waiting for a connection from the pool (including connecting).",
+    ("engine",), IO_BUCKETS,
+)
+db_checkout_timeouts = registry.counter(
+    "medst_db_pool_checkout_timeouts_total", "Pool checkouts that gave up after DB_POOL_TIMEOUT.", ("engine",),
+)
+storage_call_seconds = registry.histogram(
+    "medst_storage_call_duration_seconds", "Latency of storage backend calls.", ("provider", "operation"), IO_BUCKETS,
+)
+storage_call_errors = registry.counter(
+    "medst_storage_call_errors_total", "Storage backend calls that raised.", ("provider", "operation"),
+)
+ingest_stage_seconds = registry.histogram(
+    "medst_ingest_stage_duration_seconds", "Time spent in each stage of the ingestion pipeline.",
+    ("stage", "document_type"), STAGE_BUCKETS,
+)
+ingest_page_seconds = registry.histogram(
+    "medst_ingest_page_duration_seconds", "Time to extract one PDF page, by whether it needed OCR.",
+    ("method",), STAGE_BUCKETS,
+)
+ingest_documents = registry.counter(
+    "medst_ingested_documents_total", "Documents run through the ingestion pipeline.", ("document_type", "outcome"),
+)
+ingest_bytes = registry.counter(
+    "medst_ingested_bytes_total", "Bytes of documents run through the ingestion pipeline.", ("document_type",),
+)
+password_hash_seconds = registry.histogram(
+    "medst_password_hash_duration_seconds", "Password hashing and verification: time on a worker, and waiting for one.",
+    ("phase",),
+)
+password_hash_rejected = registry.counter(
+    "medst_password_hash_rejected_total", "Password operations turned away at PASSWORD_HASH_MAX_PENDING.",
+)
+
+# Database pools
+
+class _TimedPoolMixin:
+    """Times every checkout; `_do_get` is where QueuePool waits for a free connection or opens one."""
+    metrics_name = "sync"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception as e:
+            if type(e).__name__ == "TimeoutError":  # sqlalchemy.exc.TimeoutError
+                db_checkout_timeouts.inc(self.metrics_name)
+            raise
+        finally:
+            db_checkout_seconds.observe(time.perf_counter() - start, self.metrics_name)
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    metrics_name = "sync"
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    metrics_name = "async"
+
+def register_pools(pools: Dict[str, object]) -> None:
+    """Expose checked-out and idle connection counts for each {engine name: pool}."""
+    def in_use():
+        return {(name,): pool.checkedout() for name, pool in pools.items() if hasattr(pool, "checkedout")}
+
+    def idle():
+        return {(name,): pool.checkedin() for name, pool in pools.items() if hasattr(pool, "checkedin")}
+
+    registry.gauge("medst_db_pool_connections_in_use", "Connections currently checked out of the pool.", in_use, ("engine",))
+    registry.gauge("medst_db_pool_connections_idle", "Connections idle in the pool.", idle, ("engine",))
+
+# Storage
+
+@contextmanager
+def storage_call(provider: str, operation: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        storage_call_errors.inc(provider, operation)
+        raise
+    finally:
+        storage_call_seconds.observe(time.perf_counter() - start, provider, operation)
+
+# Ingestion
+
+def record_ingestion(info: dict, outcome: str = "ok") -> None:
+    """Fold the stage timings and size an ingestion worker reported in `info` into the registry."""
+    doc_type = info.get("document_type", "unknown")
+    for stage, seconds in info.get("stages", {}).items():
+        ingest_stage_seconds.observe(seconds, stage, doc_type)
+    for seconds, ocr in info.get("pages", ()):
+        ingest_page_seconds.observe(seconds, "ocr" if ocr else "text")
+    ingest_documents.inc(doc_type, outcome)
+    if info.get("bytes"):
+        ingest_bytes.inc(doc_type, amount=info["bytes"])
+
+# HTTP
+
+def _route_templates(app) -> Dict[object, str]:
+    templates = getattr(app.state, "metrics_route_templates", None)
+    if templates is None:
+        templates = {route.endpoint: route.path for route in app.routes if hasattr(route, "endpoint")}
+        app.state.metrics_route_templates = templates
+    return templates
+
+class MetricsMiddleware:
+    """
+    Time every HTTP request, labelled by the route's path template (not the raw
+    path, which would create a series per record id). Requests slower than
+    SLOW_REQUEST_SECONDS are also logged.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        global http_requests_in_flight
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight -= 1
+            elapsed = time.perf_counter() - start
+            # The router records the matched endpoint in the (shared) scope
+            endpoint = scope.get("endpoint")
+            route = _route_templates(scope["app"]).get(endpoint, "unmatched") if endpoint and "app" in scope else "unmatched"
+            http_request_seconds.observe(elapsed, scope["method"], route, str(status))
+            if settings.slow_request_seconds and elapsed >= settings.slow_request_seconds:
+                logger.warning(f"Slow request: {scope['method']} {scope['path']} -> {status} in {elapsed:.3f}s")
+
+def render() -> str:
+    return registry.render()
+
+def _reset_after_fork() -> None:
+    # Forked ingestion workers must not inherit a lock another thread held at fork
+    # time; they start from empty series and report back through info dicts instead
+    for metric in registry._metrics.values():
+        if isinstance(metric, Counter):
+            metric._values = {}
+        elif isinstance(metric, Histogram):
+            metric._series = {}
+        metric._lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,27 +1,80 @@
 import re
-from typing import Dict, List, Tuple, Optional
-
-SECTION_PATTERNS = {
-    "presenting_complaint": r"(?:^|\n)\s*(Presenting complaint)[:\-]\s*(.+?)(?=\n[A-Z][A-Za-z ]+:|\n[A-Z][A-Za-z ]+\n|$)",
-    "history": r"(?:^|\n)\s*(History)[:\-]\s*(.+?)(?=\n[A-Z][A-Za-z ]+:|\n[A-Z][A-Za-z ]+\n|$)",
-    "examination": r"(?:^|\n)\s*(Examination)[:\-]\s*(.+?)(?=\n[A-Z][A-Za-z ]+:|\n[A-Z][A-Za-z ]+\n|$)",
-    "assessment": r"(?:^|\n)\s*(Assessment)[:\-]\s*(.+?)(?=\n[A-Z][A-Za-z ]+:|\n[A-Z][A-Za-z ]+\n|$)",
-    "plan": r"(?:^|\n)\s*(Plan)[:\-]\s*(.+?)(?=\n[A-Z][A-Za-z ]+:|\n[A-Z][A-Za-z ]+\n|$)",
-    "tests": r"(?:^|\n)\s*(Tests)[:\-]\s*(.+?)(?=\n[A-Z][A-Za-z ]+:|\n[A-Z][A-Za-z ]+\n|$)",
-    "follow_up": r"(?:^|\n)\s*(Follow-up)[:\-]\s*(.+?)(?=\n[A-Z][A-Za-z ]+:|\n[A-Z][A-Za-z ]+\n|$)",
-    "medications": r"(?:^|\n)\s*(Medications?)[:\-]\s*(.+?)(?=\n[A-Z][A-Za-z ]+:|\n[A-Z][A-Za-z ]+\n|$)",
+from typing import Dict, List, Optional
+from app.utils.labs import is_known_test
+
+# Section headers recognised at the start of a line, mapped to their result key.
+SECTION_KEYS = {
+    "presenting complaint": "presenting_complaint",
+    "history": "history",
+    "examination": "examination",
+    "assessment": "assessment",
+    "plan": "plan",
+    "tests": "tests",
+    "follow-up": "follow_up",
+    "medication": "medications",
+    "medications": "medications",
 }
 
-CLINIC_LINE = r"^(?P<clinic>.*?(Practice|Clinic).*)$"
-CLINIC_CONTACT = r"^(?P<address>.+\bVIC\b.*?)(?:\s*\|\s*(?P<phone>\(0[0-9]\)\s*[0-9]{4}\s*[0-9]{3,4}))?$"
+# One scanner for every section: a header at the start of a line, followed by its body,
+# which is the first non-blank text after the separator up to the end of that line.
+# The body is captured inside a lookahead so a header on the following line (e.g.
+# "Plan:\nHistory: ...") is still found, and `\s*` / `\S` are disjoint, so each
+# header costs time linear in the whitespace and line after it.
+SECTION_HEADER = re.compile(
+    r"^[^\S\n]*(?P<header>presenting complaint|history|examination|assessment|plan|tests|follow-up|medications?)"
+    r"[:\-](?=\s*(?P<body>\S[^\n]*))",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+CLINIC_LINE = re.compile(r"^(?P<clinic>.*?(Practice|Clinic).*)$", re.IGNORECASE | re.MULTILINE)
+CLINIC_CONTACT = re.compile(
+    r"^(?P<address>.+\bVIC\b.*?)(?:\s*\|\s*(?P<phone>\(0[0-9]\)\s*[0-9]{4}\s*[0-9]{3,4}))?$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+PATIENT_BLOCK = re.compile(r"Patient:\s*(?P<patient_name>[A-Z][A-Za-z]+(?:\s+[A-Z][A-Za-z]+)+)\s*\|\s*DOB:\s*(?P<dob>[0-9]{1,2}\s+\w+\s+[0-9]{4})")
+VISIT_DATE = re.compile(
+    r"(Date of visit|Visit Date)[:\-]\s*(?P<visit_date>[0-9]{1,2}\s+\w+\s+[0-9]{4}|[0-9]{4}-[0-9]{2}-[0-9]{2}|[0-9]{1,2}/[0-9]{1,2}/[0-9]{4})",
+    re.IGNORECASE,
+)
 
-PATIENT_BLOCK = r"Patient:\s*(?P<patient_name>[A-Z][A-Za-z]+(?:\s+[A-Z][A-Za-z]+)+)\s*\|\s*DOB:\s*(?P<dob>[0-9]{1,2}\s+\w+\s+[0-9]{4})"
-VISIT_DATE = r"(Date of visit|Visit Date)[:\-]\s*(?P<visit_date>[0-9]{1,2}\s+\w+\s+[0-9]{4}|[0-9]{4}-[0-9]{2}-[0-9]{2}|[0-9]{1,2}/[0-9]{1,2}/[0-9]{4})"
+CLINICIAN_LINE = re.compile(r"Clinician:\s*(?P<provider_name>Dr\.?\s+[A-Z][A-Za-z]+(?:\s+[A-Z][A-Za-z]+)*)\s*\((?P<provider_specialty>[^)]+)\)")
+SIGNATURE_LINE = re.compile(r"Signature:\s*(?P<signature>.+)")
 
-CLINICIAN_LINE = r"Clinician:\s*(?P<provider_name>Dr\.?\s+[A-Z][A-Za-z]+(?:\s+[A-Z][A-Za-z]+)*)\s*\((?P<provider_specialty>[^)]+)\)"
-SIGNATURE_LINE = r"Signature:\s*(?P<signature>.+)"
+MEDICATIONS_LINE = re.compile(r"Medications?:\s*(.+)", re.IGNORECASE)
+MEDICATION_SPLIT = re.compile(r";|\.\s+(?=[A-Z])|,\s+(?=[A-Z])")
 
-LAB_RESULT = r"(?P<name>[A-Za-z ][A-Za-z ]+)[\:\-]\s*(?P<value>[0-9.]+)\s*(?P<units>mmol/L|g/L|mg/dL|%|°C)"
+# A lab result is "<name>: <value> <units>", or "<name> <value> <units>" for a known
+# test name. Only the value/units tail is matched by regex; the separator and the
+# name (the run of letters, digits and spaces before it) are found by walking
+# backwards (see _extract_lab_results), which keeps the scan linear. Units are
+# the ones utils/labs.py can normalize. The pattern starts with a plain digit class
+# (no group or lookbehind) so the regex engine can skip ahead to candidate digits.
+LAB_VALUE = re.compile(r"[0-9][0-9.]*\s*(?P<units>mmol/L|g/dL|g/L|mg/dL|%|°C)(?![A-Za-z])", re.IGNORECASE)
+LAB_NAME_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789 ")
+LAB_NAME_MAX_WORDS = 3  # longest alias in utils/labs.TEST_ALIASES
+
+WHITESPACE_RUN = re.compile(r"\s+")
+TRAILING_SPACE = re.compile(r"[ \t]+\n")
+BLANK_LINES = re.compile(r"\n{3,}")
+
+DATE_DMY_SLASH = re.compile(r"(?P<d>[0-9]{1,2})/(?P<m>[0-9]{1,2})/(?P<y>[0-9]{4})$")
+DATE_ISO = re.compile(r"[0-9]{4}-[0-9]{2}-[0-9]{2}$")
+DATE_D_MONTH_Y = re.compile(r"(?P<d>[0-9]{1,2})\s+(?P<month>[A-Za-z]+)\s+(?P<y>[0-9]{4})$")
+MONTHS = {
+    "January": 1, "Jan": 1,
+    "February": 2, "Feb": 2,
+    "March": 3, "Mar": 3,
+    "April": 4, "Apr": 4,
+    "May": 5,
+    "June": 6, "Jun": 6,
+    "July": 7, "Jul": 7,
+    "August": 8, "Aug": 8,
+    "September": 9, "Sep": 9, "Sept": 9,
+    "October": 10, "Oct": 10,
+    "November": 11, "Nov": 11,
+    "December": 12, "Dec": 12,
+}
 
 def normalize_text(text: str) -> str:
     """
@@ -31,32 +84,27 @@ def normalize_text(text: str) -> str:
         return ""
     # Normalize line endings and strip trailing spaces
     text = text.replace("\r", "")
-    text = re.sub(r"[ \t]+\n", "\n", text)
+    text = TRAILING_SPACE.sub("\n", text)
     # Collapse multiple blank lines
-    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = BLANK_LINES.sub("\n\n", text)
     # Normalize dashes and bullets
     text = text.replace("—", "-").replace("–", "-")
     return text.strip()
 
-def _match_first(pattern: str, text: str, flags: int = 0) -> Optional[re.Match]:
-    m = re.search(pattern, text, flags)
-    return m
-
-def _match_all(pattern: str, text: str, flags: int = 0) -> List[re.Match]:
-    return list(re.finditer(pattern, text, flags))
-
-def _extract_section(pattern: str, text: str) -> Optional[str]:
-    m = re.search(pattern, text, flags=re.IGNORECASE | re.DOTALL | re.MULTILINE)
-    if m:
-        content = m.group(2).strip()
-        content = re.sub(r"\s+", " ", content).strip()
-        return content
-    return None
-
 def _collect_sections(text: str) -> Dict[str, Optional[str]]:
-    sections: Dict[str, Optional[str]] = {}
-    for key, pattern in SECTION_PATTERNS.items():
-        sections[key] = _extract_section(pattern, text)
+    """
+    Single pass over the text: the first occurrence of each section header wins,
+    and its body is whitespace-collapsed once.
+    """
+    sections: Dict[str, Optional[str]] = dict.fromkeys(SECTION_KEYS.values())
+    remaining = len(sections)
+    for m in SECTION_HEADER.finditer(text):
+        key = SECTION_KEYS[m.group("header").lower()]
+        if sections[key] is None:
+            sections[key] = WHITESPACE_RUN.sub(" ", m.group("body")).strip()
+            remaining -= 1
+            if not remaining:
+                break
     return sections
 
 def _extract_medications_global(text: str) -> List[str]:
@@ -65,22 +113,53 @@ def _extract_medications_global(text: str) -> List[str]:
     We scan globally as a fallback.
     """
     meds: List[str] = []
-    for m in _match_all(r"Medications?:\s*(.+)", text, flags=re.IGNORECASE):
+    for m in MEDICATIONS_LINE.finditer(text):
         line = m.group(1).strip()
         # Split on typical separators while keeping dose info intact
-        parts = re.split(r";|\.\s+(?=[A-Z])|,\s+(?=[A-Z])", line)
+        parts = MEDICATION_SPLIT.split(line)
         for p in parts:
             p = p.strip()
             if p:
                 meds.append(p)
     return meds
 
+def _known_test_suffix(name: str) -> Optional[str]:
+    """The last few words of `name` that form a known test name ("fasting glucose" in "Today fasting glucose")."""
+    words = name.split()
+    for n in range(min(len(words), LAB_NAME_MAX_WORDS), 0, -1):
+        candidate = " ".join(words[-n:])
+        if is_known_test(candidate):
+            return candidate
+    return None
+
 def _extract_lab_results(text: str) -> Dict[str, str]:
     labs: Dict[str, str] = {}
-    for m in _match_all(LAB_RESULT, text, flags=re.IGNORECASE):
-        name = m.group("name").strip()
-        value = f"{m.group('value')} {m.group('units')}".strip()
-        labs[name] = value
+    last_end = 0
+    for m in LAB_VALUE.finditer(text):
+        # Walk back over the separator, then the name, never reaching into the
+        # previous match. Walks are disjoint, so this is linear.
+        end = m.start()
+        while end > last_end and text[end - 1].isspace():
+            end -= 1
+        gap = text[end:m.start()]
+        separated = end > last_end and text[end - 1] in ":-"
+        if separated:
+            end -= 1
+        elif not gap or "\n" in gap:
+            last_end = m.end()
+            continue  # glued to a word, or on a line of its own
+        start = end
+        while start > last_end and text[start - 1] in LAB_NAME_CHARS:
+            start -= 1
+        name = text[start:end].strip()
+        last_end = m.end()
+        if not is_known_test(name):
+            # Without a separator, any prose before a number would do; require a test name
+            name = _known_test_suffix(name) or (name if separated else "")
+        if len(name) < 2:
+            continue
+        value = text[m.start():m.start("units")].rstrip()
+        labs[name] = f"{value} {m.group('units')}"
     return labs
 
 def _normalize_date_str(date_str: Optional[str]) -> Optional[str]:
@@ -93,7 +172,7 @@ def _normalize_date_str(date_str: Optional[str]) -> Optional[str]:
     s = date_str.strip()
 
     # dd/mm/yyyy -> yyyy-mm-dd
-    m = re.match(r"(?P<d>[0-9]{1,2})/(?P<m>[0-9]{1,2})/(?P<y>[0-9]{4})$", s)
+    m = DATE_DMY_SLASH.match(s)
     if m:
         d = int(m.group("d"))
         mo = int(m.group("m"))
@@ -101,39 +180,19 @@ def _normalize_date_str(date_str: Optional[str]) -> Optional[str]:
         return f"{y:04d}-{mo:02d}-{d:02d}"
 
     # yyyy-mm-dd already normalized
-    if re.match(r"[0-9]{4}-[0-9]{2}-[0-9]{2}$", s):
+    if DATE_ISO.match(s):
         return s
 
-    # “17 September 2025” -> yyyy-mm-dd
-    m = re.match(r"(?P<d>[0-9]{1,2})\s+(?P<month>[A-Za-z]+)\s+(?P<y>[0-9]{4})$", s)
+    # “17 September 2025” / “01 Jan 1990” -> yyyy-mm-dd
+    m = DATE_D_MONTH_Y.match(s)
     if m:
-        month_map = {
-            "January": 1, "Jan": 1,
-            "February": 2, "Feb": 2,
-            "March": 3, "Mar": 3,
-            "April": 4, "Apr": 4,
-            "May": 5,
-            "June": 6, "Jun": 6,
-            "July": 7, "Jul": 7,
-            "August": 8, "Aug": 8,
-            "September": 9, "Sep": 9, "Sept": 9,
-            "October": 10, "Oct": 10,
-            "November": 11, "Nov": 11,
-            "December": 12, "Dec": 12,
-        }
         d = int(m.group("d"))
-        mon = month_map.get(m.group("month"), 0)
+        mon = MONTHS.get(m.group("month"), 0)
         y = int(m.group("y"))
         if mon:
             return f"{y:04d}-{mon:02d}-{d:02d}"
         return s
 
-    # “01 Jan 1990” -> yyyy-mm-dd
-    m = re.match(r"(?P<d>[0-9]{1,2})\s+(?P<month>[A-Za-z]+)\s+(?P<y>[0-9]{4})$", s)
-    if m:
-        # handled above; keeping fallback
-        return s
-
     # Otherwise return original string for audit
     return s
 
@@ -146,45 +205,41 @@ def extract_fields(text: str) -> Dict:
     result: Dict = {}
 
     # Header clinic line
-    clinic_line = _match_first(CLINIC_LINE, text, flags=re.IGNORECASE | re.MULTILINE)
+    clinic_line = CLINIC_LINE.search(text)
     if clinic_line:
         result["provider_clinic"] = clinic_line.group("clinic").strip()
 
     # Header contact line (address | phone)
-    contact_line = _match_first(CLINIC_CONTACT, text, flags=re.IGNORECASE | re.MULTILINE)
+    contact_line = CLINIC_CONTACT.search(text)
     if contact_line:
         result["clinic_address"] = (contact_line.group("address") or "").strip()
         result["clinic_phone"] = (contact_line.group("phone") or "").strip() or None
 
     # Patient block (name | DOB)
-    pb = _match_first(PATIENT_BLOCK, text)
+    pb = PATIENT_BLOCK.search(text)
     if pb:
         result["patient_name"] = pb.group("patient_name").strip()
         result["patient_dob"] = _normalize_date_str(pb.group("dob").strip())
 
     # Visit date
-    vd = _match_first(VISIT_DATE, text, flags=re.IGNORECASE)
+    vd = VISIT_DATE.search(text)
     if vd:
         result["visit_date"] = _normalize_date_str(vd.group("visit_date").strip())
     else:
         result["visit_date"] = None
 
     # Clinician line and specialty
-    cl = _match_first(CLINICIAN_LINE, text)
+    cl = CLINICIAN_LINE.search(text)
     if cl:
         result["provider_name"] = cl.group("provider_name").strip()
         result["provider_specialty"] = cl.group("provider_specialty").strip()
 
     # Signature (optional)
-    sig = _match_first(SIGNATURE_LINE, text)
+    sig = SIGNATURE_LINE.search(text)
     result["signature"] = sig.group("signature").strip() if sig else None
 
-    # Sections
+    # Sections (already collapsed to single spaced lines)
     sections = _collect_sections(text)
-    # Clean each section to single spaced lines
-    for key, val in sections.items():
-        if val:
-            sections[key] = re.sub(r"\s+", " ", val).strip()
     result["sections"] = sections
 
     # Diagnosis: prefer 'assessment' section as primary diagnosis summary
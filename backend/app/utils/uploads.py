@@ -0,0 +1,50 @@
+from typing import Dict, Optional
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+class UploadSizeLimitMiddleware:
+    """
+    Enforce a maximum request body size on upload routes while the body is streamed,
+    rather than after it has been buffered. Requests advertising a larger
+    Content-Length are rejected before any of the body is read.
+    `overrides` maps exact paths to their own limit (e.g. bulk uploads).
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int, path_prefix: str = "/records", overrides: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_prefix = path_prefix
+        self.overrides = overrides or {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("POST", "PUT")
+            or not scope["path"].startswith(self.path_prefix)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = self.overrides.get(scope["path"].rstrip("/"), self.max_bytes)
+        detail = f"Upload exceeds the {max_bytes} byte limit"
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+            response = JSONResponse({"detail": detail}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    # Raised from inside body parsing, so it surfaces as a normal 413 response
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,107 @@
+"""
+Deterministic synthetic corpus for the ingestion benchmarks.
+
+Every generator takes a seed, so the same arguments always produce the same
+document and results stay comparable between runs and machines.
+"""
+import io
+import random
+from typing import List
+
+FIRST_NAMES = ["John", "Mary", "Aisha", "Wei", "Liam", "Olivia", "Noah", "Priya", "Lucas", "Mia"]
+LAST_NAMES = ["Smith", "Nguyen", "Patel", "Brown", "Wilson", "Chen", "Taylor", "Kelly", "Murphy", "Singh"]
+SUBURBS = ["Carlton", "Fitzroy", "Brunswick", "Richmond", "Footscray", "Box Hill", "St Kilda"]
+SPECIALTIES = ["General Practitioner", "Cardiologist", "Endocrinologist", "Dermatologist"]
+COMPLAINTS = ["cough for 3 days", "lower back pain", "fatigue and thirst", "rash on forearm", "headaches"]
+ASSESSMENTS = ["Viral URTI", "Mechanical back pain", "Type 2 diabetes", "Contact dermatitis", "Tension headache"]
+MEDICATIONS = ["Paracetamol 500mg", "Metformin 500mg", "Ibuprofen 400mg", "Atorvastatin 20mg", "Ventolin PRN"]
+LABS = [("Sodium", "mmol/L", 130, 148), ("Glucose", "mmol/L", 4.0, 11.0), ("Cholesterol", "mmol/L", 3.5, 7.0),
+        ("Haemoglobin", "g/L", 110, 170), ("Temperature", "°C", 36.0, 39.0)]
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September",
+          "October", "November", "December"]
+FILLER = ("Patient reports symptoms have been stable overall with intermittent flare ups noted in the "
+          "evenings and discussed lifestyle factors including sleep diet and exercise at length").split()
+
+def gp_report(seed: int, pages: int = 1) -> str:
+    """A GP-style consultation report; `pages` adds roughly a page of notes each."""
+    rnd = random.Random(seed)
+    name = f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}"
+    day, month, year = rnd.randint(1, 28), rnd.choice(MONTHS), rnd.randint(2018, 2025)
+    lines = [
+        f"{rnd.choice(SUBURBS)} Medical Clinic",
+        f"{rnd.randint(1, 200)} High St, {rnd.choice(SUBURBS)} VIC 30{rnd.randint(10, 99)} | (03) 9{rnd.randint(100, 999)} {rnd.randint(1000, 9999)}",
+        f"Patient: {name} | DOB: {rnd.randint(1, 28)} {rnd.choice(MONTHS)} {rnd.randint(1940, 2010)}",
+        f"Date of visit: {day} {month} {year}",
+        f"Clinician: Dr. {rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)} ({rnd.choice(SPECIALTIES)})",
+        "",
+        f"Presenting complaint: {rnd.choice(COMPLAINTS)}",
+        f"History: {' '.join(rnd.choices(FILLER, k=20))}",
+        f"Examination: {' '.join(rnd.choices(FILLER, k=15))}",
+        f"Assessment: {rnd.choice(ASSESSMENTS)}",
+        f"Plan: {' '.join(rnd.choices(FILLER, k=12))}",
+        f"Medications: {'; '.join(rnd.sample(MEDICATIONS, 3))}",
+    ]
+    for lab, units, lo, hi in rnd.sample(LABS, 3):
+        lines.append(f"{lab}: {rnd.uniform(lo, hi):.1f} {units}")
+    for page in range(pages - 1):
+        lines.append("")
+        lines.append(f"Progress notes - page {page + 2}")
+        for _ in range(40):
+            lines.append(" ".join(rnd.choices(FILLER, k=12)))
+    lines.append("Follow-up: 2 weeks")
+    lines.append(f"Signature: Dr {rnd.choice(LAST_NAMES)}")
+    return "\n".join(lines)
+
+def adversarial_texts(size: int = 50_000) -> List[str]:
+    """Near-miss inputs aimed at backtracking in the parsing regexes."""
+    return [
+        # Long runs of name characters with no separator (lab-result name scan)
+        ("abc " * (size // 4) + "\n") * 3,
+        # Headers followed by long whitespace and nothing else (section body lookahead)
+        "\n".join(["Plan:" + " " * 500] * (size // 500)),
+        # Many header-like lines that never have a separator
+        "\n".join(["Assessment of the patient continues"] * (size // 36)),
+        # Separators with numbers but no units
+        "Glucose: " + "5.5 " * (size // 4),
+        # A clinic line that never mentions VIC, and a patient line without DOB
+        "Medical Clinic " * (size // 15) + "\nPatient: " + "Ab " * (size // 3),
+    ]
+
+def pdf_bytes(text: str, lines_per_page: int = 50) -> bytes:
+    import fitz  # PyMuPDF
+
+    doc = fitz.open()
+    lines = text.split("\n")
+    for i in range(0, len(lines), lines_per_page):
+        page = doc.new_page()
+        page.insert_text((40, 40), "\n".join(lines[i:i + lines_per_page]), fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+def docx_bytes(text: str) -> bytes:
+    import docx
+
+    document = docx.Document()
+    for line in text.split("\n"):
+        document.add_paragraph(line)
+    buf = io.BytesIO()
+    document.save(buf)
+    return buf.getvalue()
+
+def image_bytes(text: str, width: int = 1654, line_height: int = 28) -> bytes:
+    """Render text onto a white A4-ish page at ~200 dpi as a PNG."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    lines = text.split("\n")
+    image = Image.new("L", (width, max(line_height * (len(lines) + 2), 200)), color=255)
+    draw = ImageDraw.Draw(image)
+    try:
+        font = ImageFont.load_default(size=20)
+    except TypeError:  # Pillow < 10.1
+        font = ImageFont.load_default()
+    for i, line in enumerate(lines):
+        draw.text((40, line_height * (i + 1)), line, fill=0, font=font)
+    buf = io.BytesIO()
+    image.save(buf, format="PNG")
+    return buf.getvalue()
@@ -0,0 +1,204 @@
+"""
+Benchmarks for the ingestion and parsing pipeline.
+
+Run from the backend directory:
+
+    python -m benchmarks.run                   # run and compare with benchmarks/baseline.json
+    python -m benchmarks.run --save-baseline   # record the current numbers as the baseline
+    python -m benchmarks.run --stage extract_fields --stage normalize_text
+
+Each stage reports docs/sec, p50/p99 latency and peak traced memory per document
+size. Runs fully offline; stages whose dependencies are missing (e.g. the
+tesseract binary for OCR) are skipped. The baseline is per machine and not
+committed; save one before making the changes you want to measure.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+# Benchmark the extractors themselves, not the on-disk extraction cache
+os.environ["EXTRACT_CACHE_PATH"] = ""
+
+from benchmarks import corpus
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+SIZES = {"small": 1, "medium": 20, "large": 200}  # pages of notes per document
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def measure(fn: Callable, inputs: List, min_seconds: float, min_rounds: int = 3) -> Dict[str, float]:
+    """Time `fn` over `inputs` repeatedly, then trace peak Python heap use over one more pass."""
+    fn(inputs[0])  # warm-up: imports, pools, compiled patterns
+    latencies: List[float] = []
+    started = time.perf_counter()
+    rounds = 0
+    while rounds < min_rounds or time.perf_counter() - started < min_seconds:
+        for item in inputs:
+            t0 = time.perf_counter()
+            fn(item)
+            latencies.append(time.perf_counter() - t0)
+        rounds += 1
+
+    tracemalloc.start()
+    for item in inputs:
+        fn(item)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "docs_per_sec": len(latencies) / sum(latencies),
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "peak_mem_kb": peak / 1024,
+        "samples": len(latencies),
+    }
+
+def _write_files(tmpdir: str, suffix: str, blobs: List[bytes]) -> List[str]:
+    paths = []
+    for i, data in enumerate(blobs):
+        path = os.path.join(tmpdir, f"doc{i}{suffix}")
+        with open(path, "wb") as f:
+            f.write(data)
+        paths.append(path)
+    return paths
+
+def build_stages(tmpdir: str, docs_per_size: int) -> Dict[str, Callable[[], Optional[Dict[str, tuple]]]]:
+    """Each stage factory returns {case name: (function, inputs)} or None if unavailable."""
+    from app.utils.parsing import normalize_text, extract_fields, _normalize_date_str
+
+    texts = {size: [corpus.gp_report(seed, pages) for seed in range(docs_per_size)] for size, pages in SIZES.items()}
+
+    def parsing_stage(fn):
+        def factory():
+            cases = {size: (fn, [normalize_text(t) for t in docs]) for size, docs in texts.items()}
+            cases["adversarial"] = (fn, corpus.adversarial_texts())
+            return cases
+        return factory
+
+    def normalize_stage():
+        return {size: (normalize_text, docs) for size, docs in texts.items()}
+
+    def date_stage():
+        dates = ["17 September 2025", "01/02/2020", "2020-01-02", "5 Sept 2023", "3 Foo 2020", "n/a"] * 50
+        return {"mixed": (lambda batch: [_normalize_date_str(d) for d in batch], [dates])}
+
+    def pdf_stage():
+        from app.services.extract_pdf import extract_pdf_text
+        return {
+            size: (extract_pdf_text, _write_files(tmpdir, f"-{size}.pdf", [corpus.pdf_bytes(t) for t in docs]))
+            for size, docs in texts.items()
+        }
+
+    def docx_stage():
+        from app.services.extract_docx import extract_docx_text
+        return {
+            size: (extract_docx_text, _write_files(tmpdir, f"-{size}.docx", [corpus.docx_bytes(t) for t in docs]))
+            for size, docs in texts.items()
+        }
+
+    def image_stage():
+        if not shutil.which("tesseract"):
+            return None
+        from app.services.extract_image import extract_image_text
+        images = [corpus.image_bytes(t) for t in texts["small"]]
+        return {"small": (extract_image_text, _write_files(tmpdir, ".png", images))}
+
+    def ingest_stage():
+        from app.services.ingestion import ingest_document
+        cases = {}
+        for size in ("small", "medium"):
+            paths = _write_files(tmpdir, f"-ingest-{size}.pdf", [corpus.pdf_bytes(t) for t in texts[size]])
+            cases[f"pdf-{size}"] = (lambda path: ingest_document(os.path.basename(path), path), paths)
+        return cases
+
+    return {
+        "normalize_text": normalize_stage,
+        "extract_fields": parsing_stage(extract_fields),
+        "normalize_date_str": date_stage,
+        "extract_pdf_text": pdf_stage,
+        "extract_docx_text": docx_stage,
+        "extract_image_text": image_stage,
+        "ingest_document": ingest_stage,
+    }
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get("results", {}).get(key)
+        if not previous:
+            continue
+        for metric in ("p50_ms", "p99_ms"):
+            if current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(
+                    f"{key} {metric}: {current[metric]:.3f} vs baseline {previous[metric]:.3f} "
+                    f"(+{(current[metric] / previous[metric] - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stage", action="append", help="only run these stages (repeatable)")
+    parser.add_argument("--docs", type=int, default=5, help="documents per size (default 5)")
+    parser.add_argument("--min-seconds", type=float, default=1.0, help="minimum timed seconds per case")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    results: Dict[str, Dict[str, float]] = {}
+    tmpdir = tempfile.mkdtemp(prefix="medst-bench-")
+    try:
+        stages = build_stages(tmpdir, args.docs)
+        for name, factory in stages.items():
+            if args.stage and name not in args.stage:
+                continue
+            try:
+                cases = factory()
+            except ImportError as e:
+                cases, reason = None, str(e)
+            else:
+                reason = "dependency not installed"
+            if cases is None:
+                print(f"{name:<22} skipped ({reason})")
+                continue
+            for case, (fn, inputs) in cases.items():
+                stats = measure(fn, inputs, args.min_seconds)
+                results[f"{name}/{case}"] = stats
+                print(
+                    f"{name:<22} {case:<12} {stats['docs_per_sec']:>10.1f} docs/s  "
+                    f"p50 {stats['p50_ms']:>9.3f} ms  p99 {stats['p99_ms']:>9.3f} ms  "
+                    f"peak {stats['peak_mem_kb']:>9.0f} KiB"
+                )
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "results": results}, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found; run with --save-baseline to record one.")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print(f"No regressions beyond {args.tolerance:.0%} of baseline.")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
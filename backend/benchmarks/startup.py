@@ -0,0 +1,73 @@
+"""
+Cold-start profile: how long `import app.main` takes and which modules dominate it.
+
+Run from the backend directory:
+
+    python -m benchmarks.startup            # median of 5 fresh interpreters, top 15 modules
+    python -m benchmarks.startup --top 30 --runs 10
+
+Each run imports the app in a new interpreter with `-X importtime`, so nothing
+is cached between runs. Modules that should only load on first use (cloud SDKs,
+document extractors) are reported if they show up at import time; the exit code
+is 1 when any do.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+# Loaded on demand by storage, ingestion and clinic search; never by `import app.main`
+LAZY_MODULES = ("boto3", "botocore", "google.cloud.storage", "fitz", "docx", "PIL", "pytesseract", "tesserocr", "httpx")
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+def profile_once(module: str) -> Tuple[float, Dict[str, Tuple[int, int]]]:
+    """Import `module` in a fresh interpreter. Returns (wall seconds, {module: (self us, cumulative us)})."""
+    code = f"import time; t0 = time.perf_counter(); import {module}; print(time.perf_counter() - t0)"
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+    modules = {}
+    for line in proc.stderr.splitlines():
+        m = IMPORTTIME_LINE.match(line)
+        if m:
+            modules[m.group(4)] = (int(m.group(1)), int(m.group(2)))
+    return float(proc.stdout.strip().splitlines()[-1]), modules
+
+def loaded_lazy_modules(modules: Dict[str, Tuple[int, int]]) -> List[str]:
+    return [name for name in LAZY_MODULES if name in modules or any(m.startswith(name + ".") for m in modules)]
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="modules to list, by self time")
+    args = parser.parse_args(argv)
+
+    walls, last = [], {}
+    for _ in range(args.runs):
+        wall, last = profile_once(args.module)
+        walls.append(wall)
+    print(f"import {args.module}: median {statistics.median(walls) * 1000:.0f} ms, "
+          f"min {min(walls) * 1000:.0f} ms over {args.runs} runs ({len(last)} modules)")
+
+    print(f"\n{'self ms':>9} {'cumul ms':>9}  module")
+    for name, (own, cumulative) in sorted(last.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"{own / 1000:>9.1f} {cumulative / 1000:>9.1f}  {name}")
+
+    eager = loaded_lazy_modules(last)
+    if eager:
+        print(f"\nLoaded at import time but should be lazy: {', '.join(eager)}")
+        return 1
+    print("\nNo provider SDKs or extractors loaded at import time.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy import create_engine
+from app.database import DATABASE_URL, Base
+import app.models  # noqa: F401  registers every table on Base.metadata
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+def database_url() -> str:
+    return context.get_x_argument(as_dictionary=True).get("url", DATABASE_URL)
+
+def run_migrations_offline() -> None:
+    """Emit the SQL to stdout (`alembic upgrade head --sql`) instead of running it."""
+    context.configure(url=database_url(), target_metadata=target_metadata, literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online() -> None:
+    engine = create_engine(database_url())
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,97 @@
+"""Baseline: the schema previously created by Base.metadata.create_all
+
+Databases created that way should be stamped rather than upgraded through this
+revision:  alembic stamp 0001 && alembic upgrade head
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(255), nullable=False),
+        sa.Column("hashed_password", sa.String(255), nullable=False),
+        sa.Column("full_name", sa.String(255), nullable=True),
+        sa.Column("role", sa.String(50), nullable=False),
+        sa.Column("dob", sa.String(20), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "records",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("patient_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("provider_name", sa.String(255), nullable=True),
+        sa.Column("provider_clinic", sa.String(255), nullable=True),
+        sa.Column("provider_specialty", sa.String(100), nullable=True),
+        sa.Column("document_type", sa.String(100), nullable=True),
+        sa.Column("visit_date", sa.String(50), nullable=True),
+        sa.Column("storage_key", sa.String(512), nullable=False),
+        sa.Column("content_text", sa.Text(), nullable=True),
+        sa.Column("structured_data", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_records_id", "records", ["id"])
+    op.create_index("ix_records_patient_id", "records", ["patient_id"])
+
+    op.create_table(
+        "consents",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("patient_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("requester_name", sa.String(255), nullable=False),
+        sa.Column("requester_dob", sa.String(20), nullable=True),
+        sa.Column("record_id", sa.Integer(), sa.ForeignKey("records.id"), nullable=True),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("reason", sa.String(500), nullable=True),
+        sa.Column("notified_at", sa.DateTime(), nullable=False),
+        sa.Column("decided_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_consents_patient_id", "consents", ["patient_id"])
+    op.create_index("ix_consents_record_id", "consents", ["record_id"])
+
+    op.create_table(
+        "access_grants",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("patient_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("grantee_name", sa.String(255), nullable=False),
+        sa.Column("grantee_dob", sa.String(20), nullable=True),
+        sa.Column("record_id", sa.Integer(), sa.ForeignKey("records.id"), nullable=True),
+        sa.Column("expires_at", sa.DateTime(), nullable=True),
+        sa.Column("active", sa.Boolean(), nullable=False),
+    )
+    op.create_index("ix_access_grants_patient_id", "access_grants", ["patient_id"])
+    op.create_index("ix_access_grants_record_id", "access_grants", ["record_id"])
+
+    op.create_table(
+        "upload_tokens",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("token", sa.String(), nullable=False),
+        sa.Column("patient_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("clinic_name", sa.String(), nullable=True),
+        sa.Column("service_type", sa.String(), nullable=True),
+        sa.Column("used", sa.Boolean(), nullable=True),
+    )
+    op.create_index("ix_upload_tokens_id", "upload_tokens", ["id"])
+    op.create_index("ix_upload_tokens_token", "upload_tokens", ["token"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_table("upload_tokens")
+    op.drop_table("access_grants")
+    op.drop_table("consents")
+    op.drop_table("records")
+    op.drop_table("users")
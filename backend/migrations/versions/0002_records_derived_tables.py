@@ -0,0 +1,120 @@
+"""Content hashes, ingestion jobs, lab results, aggregates and the search index
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce(document_type, '') || ' ' || "
+    "coalesce(provider_name, '') || ' ' || coalesce(provider_clinic, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(content_text, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("records") as batch:
+        batch.add_column(sa.Column("content_hash", sa.String(64), nullable=True))
+        batch.create_index("ix_records_content_hash", ["content_hash"])
+        batch.create_index("ix_records_patient_created", ["patient_id", "created_at", "id"])
+
+    op.create_table(
+        "blobs",
+        sa.Column("content_hash", sa.String(64), primary_key=True),
+        sa.Column("storage_key", sa.String(512), nullable=False, unique=True),
+        sa.Column("size", sa.BigInteger(), nullable=False),
+        sa.Column("ref_count", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+
+    op.create_table(
+        "ingestion_jobs",
+        sa.Column("id", sa.String(32), primary_key=True),
+        sa.Column("patient_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("upload_token_id", sa.Integer(), sa.ForeignKey("upload_tokens.id"), nullable=True),
+        sa.Column("filename", sa.String(255), nullable=False),
+        sa.Column("storage_key", sa.String(512), nullable=False),
+        sa.Column("content_hash", sa.String(64), nullable=True),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("record_id", sa.Integer(), sa.ForeignKey("records.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_ingestion_jobs_patient_id", "ingestion_jobs", ["patient_id"])
+    op.create_index("ix_ingestion_jobs_status", "ingestion_jobs", ["status"])
+
+    op.create_table(
+        "lab_results",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("patient_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("record_id", sa.Integer(), sa.ForeignKey("records.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("test", sa.String(100), nullable=False),
+        sa.Column("value", sa.Float(), nullable=False),
+        sa.Column("unit", sa.String(20), nullable=False),
+        sa.Column("taken_on", sa.Date(), nullable=False),
+    )
+    op.create_index("ix_lab_results_record_id", "lab_results", ["record_id"])
+    op.create_index("ix_lab_results_series", "lab_results", ["patient_id", "test", "taken_on"])
+
+    op.create_table(
+        "record_terms",
+        sa.Column("record_id", sa.Integer(), sa.ForeignKey("records.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("term", sa.String(64), primary_key=True),
+        sa.Column("patient_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_record_terms_lookup", "record_terms", ["patient_id", "term"])
+
+    op.create_table(
+        "patient_term_counts",
+        sa.Column("patient_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("kind", sa.String(20), primary_key=True),
+        sa.Column("month", sa.String(7), primary_key=True),
+        sa.Column("term", sa.String(255), primary_key=True),
+        sa.Column("count", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_patient_term_counts_lookup", "patient_term_counts", ["patient_id", "kind", "month"])
+
+    op.create_table(
+        "patient_month_counts",
+        sa.Column("patient_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("month", sa.String(7), primary_key=True),
+        sa.Column("count", sa.Integer(), nullable=False),
+    )
+
+    if op.get_context().dialect.name == "postgresql":
+        # Not mapped on Record; only the search service reads it
+        op.execute(
+            f"ALTER TABLE records ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({SEARCH_VECTOR_SQL}) STORED"
+        )
+        op.execute("CREATE INDEX ix_records_search_vector ON records USING gin (search_vector)")
+
+    # Existing records are not backfilled here: the derived rows come from the
+    # current parsing code, which a migration must not depend on. Run
+    # `python -m tools.backfill_derived` once after upgrading an existing database.
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_records_search_vector")
+        op.execute("ALTER TABLE records DROP COLUMN IF EXISTS search_vector")
+    op.drop_table("patient_month_counts")
+    op.drop_table("patient_term_counts")
+    op.drop_table("record_terms")
+    op.drop_table("lab_results")
+    op.drop_table("ingestion_jobs")
+    op.drop_table("blobs")
+    with op.batch_alter_table("records") as batch:
+        batch.drop_index("ix_records_patient_created")
+        batch.drop_index("ix_records_content_hash")
+        batch.drop_column("content_hash")
@@ -0,0 +1,41 @@
+"""Local clinic directory
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "clinics",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("place_id", sa.String(255), nullable=True, unique=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("address", sa.String(512), nullable=True),
+        sa.Column("suburb", sa.String(100), nullable=True),
+        sa.Column("postcode", sa.String(10), nullable=True),
+        sa.Column("lat", sa.Float(), nullable=False),
+        sa.Column("lng", sa.Float(), nullable=False),
+        sa.Column("geohash", sa.String(12), nullable=False),
+        sa.Column("types", sa.String(255), nullable=True),
+        sa.Column("phone", sa.String(50), nullable=True),
+        sa.Column("rating", sa.Float(), nullable=True),
+        sa.Column("user_ratings_total", sa.Integer(), nullable=True),
+        sa.Column("source", sa.String(20), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_clinics_postcode", "clinics", ["postcode"])
+    op.create_index("ix_clinics_geohash", "clinics", ["geohash"])
+
+
+def downgrade() -> None:
+    op.drop_table("clinics")
@@ -0,0 +1,37 @@
+"""Outbound email queue
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "outbound_emails",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("upload_token_id", sa.Integer(), sa.ForeignKey("upload_tokens.id"), nullable=True),
+        sa.Column("to_address", sa.String(255), nullable=False),
+        sa.Column("subject", sa.String(500), nullable=False),
+        sa.Column("body", sa.Text(), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("next_attempt_at", sa.DateTime(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("sent_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_outbound_emails_upload_token_id", "outbound_emails", ["upload_token_id"])
+    op.create_index("ix_outbound_emails_due", "outbound_emails", ["status", "next_attempt_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("outbound_emails")
@@ -0,0 +1,25 @@
+"""Indexes for access-grant checks and the expiry sweeper
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_access_grants_lookup", "access_grants", ["patient_id", "grantee_name", "record_id", "active", "expires_at"]
+    )
+    op.create_index("ix_access_grants_expiry", "access_grants", ["active", "expires_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_access_grants_expiry", table_name="access_grants")
+    op.drop_index("ix_access_grants_lookup", table_name="access_grants")
@@ -0,0 +1,26 @@
+"""Claim and lease columns for ingestion jobs
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("ingestion_jobs") as batch:
+        batch.add_column(sa.Column("claimed_by", sa.String(100), nullable=True))
+        batch.add_column(sa.Column("lease_expires_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("ingestion_jobs") as batch:
+        batch.drop_column("lease_expires_at")
+        batch.drop_column("claimed_by")
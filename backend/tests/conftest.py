@@ -0,0 +1,55 @@
+import os
+
+# Settings are read at import, so these must be set before anything under app/ loads
+os.environ.setdefault("STORAGE_PROVIDER", "memory")
+os.environ.setdefault("EXTRACT_CACHE_PATH", "")
+os.environ.setdefault("NOTIFY_FROM_EMAIL", "noreply@medst.test")
+
+import asyncio
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.database import AsyncSessionLocal, Base, SessionLocal
+import app.models  # noqa: F401  registers every table on Base.metadata
+from app.models import User
+from app.services.storage import MemoryStorageBackend, set_storage
+
+@pytest.fixture
+def engine(tmp_path):
+    """A fresh SQLite database behind SessionLocal for the duration of one test."""
+    test_engine = create_engine(f"sqlite:///{tmp_path / 'medst.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(test_engine)
+    previous = SessionLocal.kw.get("bind")
+    SessionLocal.configure(bind=test_engine)
+    yield test_engine
+    SessionLocal.configure(bind=previous)
+    test_engine.dispose()
+
+@pytest.fixture
+def async_engine(engine):
+    """The same database behind AsyncSessionLocal, for the async routers."""
+    test_engine = create_async_engine(engine.url.set(drivername="sqlite+aiosqlite"))
+    previous = AsyncSessionLocal.kw.get("bind")
+    AsyncSessionLocal.configure(bind=test_engine)
+    yield test_engine
+    AsyncSessionLocal.configure(bind=previous)
+    asyncio.run(test_engine.dispose())
+
+@pytest.fixture
+def db(engine):
+    with SessionLocal() as session:
+        yield session
+
+@pytest.fixture
+def storage():
+    backend = MemoryStorageBackend()
+    set_storage(backend)
+    yield backend
+    set_storage(None)
+
+@pytest.fixture
+def patient(db):
+    user = User(email="patient@medst.test", hashed_password="x", full_name="John Smith", dob="1990-01-01")
+    db.add(user)
+    db.commit()
+    return user
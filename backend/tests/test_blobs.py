@@ -0,0 +1,84 @@
+import hashlib
+import io
+from app.models import Blob
+from app.services.blobs import acquire_blob, purge_blob, purge_orphaned_blobs, release_blob
+
+DATA = b"%PDF-1.4 pathology report"
+HASH = hashlib.sha256(DATA).hexdigest()
+
+def _acquire(db, data: bytes = DATA, filename: str = "report.pdf") -> Blob:
+    blob = acquire_blob(db, hashlib.sha256(data).hexdigest(), len(data), filename, io.BytesIO(data))
+    db.commit()
+    return blob
+
+def _ref_count(db, content_hash: str = HASH):
+    db.expire_all()
+    blob = db.get(Blob, content_hash)
+    return blob.ref_count if blob else None
+
+def test_identical_uploads_share_one_object(db, storage):
+    first = _acquire(db)
+    second = _acquire(db, filename="copy.PDF")
+
+    assert first.storage_key == second.storage_key
+    assert list(storage.objects) == [first.storage_key]
+    assert storage.objects[first.storage_key] == DATA
+    assert _ref_count(db) == 2
+
+def test_last_release_purges_file_and_row(db, storage):
+    key = _acquire(db).storage_key
+    _acquire(db)
+
+    assert release_blob(db, key) is None
+    db.commit()
+    assert _ref_count(db) == 1
+
+    assert release_blob(db, key) == key
+    db.commit()
+    # Released but not yet purged: the row stays as a tombstone and the file is kept
+    assert _ref_count(db) == 0
+    assert key in storage.objects
+
+    assert purge_blob(key) is True
+    assert _ref_count(db) is None
+    assert key not in storage.objects
+
+def test_reacquire_before_purge_keeps_file(db, storage):
+    key = _acquire(db).storage_key
+    assert release_blob(db, key) == key
+    db.commit()
+
+    # Another upload of the same bytes lands between the release and the purge
+    assert _acquire(db).storage_key == key
+    assert purge_blob(key) is False
+    assert _ref_count(db) == 1
+    assert storage.objects[key] == DATA
+
+def test_purge_after_reacquire_and_release(db, storage):
+    key = _acquire(db).storage_key
+    assert release_blob(db, key) == key
+    db.commit()
+    assert purge_blob(key) is True
+
+    # Uploading again after the purge stores a fresh copy
+    assert _acquire(db).storage_key == key
+    assert storage.objects[key] == DATA
+    assert _ref_count(db) == 1
+
+def test_release_of_key_without_blob_row(db, storage):
+    # Records stored before deduplication own their file outright
+    storage.objects["legacy/report.pdf"] = DATA
+    assert release_blob(db, "legacy/report.pdf") == "legacy/report.pdf"
+    assert purge_blob("legacy/report.pdf") is True
+    assert "legacy/report.pdf" not in storage.objects
+
+def test_purge_orphaned_blobs(db, storage):
+    orphan = _acquire(db, b"orphaned").storage_key
+    kept = _acquire(db, b"still referenced").storage_key
+    release_blob(db, orphan)
+    db.commit()
+
+    assert purge_orphaned_blobs() == 1
+    assert orphan not in storage.objects
+    assert kept in storage.objects
+    assert _ref_count(db, hashlib.sha256(b"still referenced").hexdigest()) == 1
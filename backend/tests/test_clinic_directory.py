@@ -0,0 +1,87 @@
+import random
+import pytest
+from sqlalchemy import event
+from app.models import Clinic
+from app.services import clinic_directory
+from app.services.clinic_directory import ClinicIndex, import_clinics, parse_query
+from app.utils.geo import encode_geohash, haversine_km
+
+def _entry(name: str, lat: float, lng: float, suburb=None, postcode=None, types=("doctor",)) -> dict:
+    return {
+        "name": name, "address": None, "suburb": suburb, "postcode": postcode, "lat": lat, "lng": lng,
+        "geohash": encode_geohash(lat, lng), "types": set(types), "phone": None, "rating": None,
+        "user_ratings_total": None, "place_id": None, "area_text": "",
+    }
+
+DIRECTORY = ClinicIndex([
+    _entry("Swan Street Dental", -37.8250, 144.9980, "Richmond", "3121", ("dentist",)),
+    _entry("Lygon Dental", -37.7990, 144.9670, "Carlton", "3053", ("dentist",)),
+    _entry("Carlton Family Doctors", -37.8000, 144.9660, "Carlton", "3053"),
+    _entry("Collins Street Dental", -37.8150, 144.9650, "Melbourne", "3000", ("dentist",)),
+])
+
+def _names(hits):
+    return [hit["name"] for hit in hits]
+
+def test_parse_query_splits_kinds_names_and_area():
+    areas = {"carlton", "3000", "north melbourne"}
+    assert parse_query("dentists in carlton", areas) == ({"dentist"}, "", "carlton")
+    assert parse_query("dentists near 3000", areas) == ({"dentist"}, "", "3000")
+    assert parse_query("smile dental north melbourne", areas) == ({"dentist"}, "smile", "north melbourne")
+    assert parse_query("lygon dental", areas) == ({"dentist"}, "lygon", None)
+    assert parse_query("dentists in carlton") == ({"dentist"}, "carlton", None)  # no areas to try
+
+@pytest.mark.parametrize("query", ["dentists in carlton", "dentists near 3053"])
+def test_area_in_the_query_is_a_location(query):
+    hits = DIRECTORY.search(query)
+    assert _names(hits)[0] == "Lygon Dental"
+    assert all(hit["distance_km"] is not None for hit in hits)
+    assert "Carlton Family Doctors" not in _names(hits)
+
+def test_postcode_query_ranks_by_distance():
+    assert _names(DIRECTORY.search("dentists near 3000"))[:2] == ["Collins Street Dental", "Lygon Dental"]
+
+def test_words_that_are_not_an_area_match_names():
+    assert _names(DIRECTORY.search("swan street"))[0] == "Swan Street Dental"
+    assert all(hit["distance_km"] is None for hit in DIRECTORY.search("swan street"))
+    # An explicit location wins over words in the query
+    assert _names(DIRECTORY.search("carlton", center=(-37.8250, 144.9980)))[:1] == ["Carlton Family Doctors"]
+
+def test_grid_search_matches_brute_force():
+    rng = random.Random(7)
+    index = ClinicIndex([
+        _entry(f"Clinic {i}", -37.8 + rng.uniform(-0.6, 0.6), 145.0 + rng.uniform(-0.6, 0.6)) for i in range(3000)
+    ])
+    for _ in range(25):
+        lat, lng = -37.8 + rng.uniform(-0.7, 0.7), 145.0 + rng.uniform(-0.7, 0.7)
+        expected = sorted(
+            (d, i) for i, e in enumerate(index.entries) if (d := haversine_km(lat, lng, e["lat"], e["lng"])) <= 10
+        )[:15]
+        found = index.nearest(lat, lng, None, 15, 10)
+        assert sorted((d, i) for i, d in found.items()) == pytest.approx(expected)
+
+def test_import_only_loads_the_clinics_it_matches(db, monkeypatch):
+    monkeypatch.setattr(clinic_directory, "IMPORT_CHUNK_SIZE", 2)
+    db.add_all([
+        Clinic(name="Unrelated Clinic", lat=-37.0, lng=145.0, geohash=encode_geohash(-37.0, 145.0)),
+        Clinic(name="Lygon Dental", place_id="p-lygon", lat=-37.799, lng=144.967, geohash=encode_geohash(-37.799, 144.967)),
+        Clinic(name="Carlton Family Doctors", address="1 Lygon St", lat=-37.8, lng=144.966, geohash=encode_geohash(-37.8, 144.966)),
+    ])
+    db.commit()
+    loaded = []
+    event.listen(db, "loaded_as_persistent", lambda session, obj: loaded.append(obj.name))
+
+    counts = import_clinics(db, [
+        {"name": "Lygon Dental (new name)", "place_id": "p-lygon", "lat": -37.799, "lng": 144.967, "phone": "03 9000 0000"},
+        {"name": "CARLTON FAMILY DOCTORS", "address": "1 lygon st", "lat": -37.8, "lng": 144.966},
+        {"name": "New Clinic", "lat": -37.81, "lng": 144.96},
+        {"name": "", "lat": 1, "lng": 1},
+        {"name": "New Clinic", "lat": -37.81, "lng": 144.96, "rating": 4.5},  # next chunk, same clinic
+    ])
+    db.commit()
+
+    assert counts == {"created": 1, "updated": 3, "skipped": 1}
+    assert sorted(loaded) == ["Carlton Family Doctors", "Lygon Dental"]
+    assert db.query(Clinic).count() == 4
+    assert db.query(Clinic).filter_by(place_id="p-lygon").one().phone == "03 9000 0000"
+    assert db.query(Clinic).filter_by(name="New Clinic").one().rating == 4.5
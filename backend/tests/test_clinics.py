@@ -0,0 +1,112 @@
+import asyncio
+import httpx
+import pytest
+from app.services.clinics import ClinicSearchClient, ClinicSearchUnavailable
+from tools import fake_places
+
+def _client(**overrides) -> ClinicSearchClient:
+    options = dict(base_url="http://places.test", api_key="test-key", timeout=5, max_connections=4,
+                   search_ttl=60, geocode_ttl=60, max_entries=100)
+    options.update(overrides)
+    return ClinicSearchClient(**options)
+
+def _use_fake_places(client: ClinicSearchClient) -> None:
+    """Serve the client's requests from tools/fake_places.py in-process."""
+    client._http = httpx.AsyncClient(base_url=client.base_url, transport=httpx.ASGITransport(app=fake_places.app))
+    client._loop = asyncio.get_running_loop()
+
+def run(client: ClinicSearchClient, coro_fn):
+    async def main():
+        _use_fake_places(client)
+        try:
+            return await coro_fn()
+        finally:
+            await client.aclose()
+    return asyncio.run(main())
+
+def test_search_is_cached_by_normalized_query():
+    client = _client()
+
+    async def searches():
+        first = await client.search("Dentist", "Richmond")
+        second = await client.search("  dentist ", "RICHMOND")
+        return first, second
+
+    first, second = run(client, searches)
+    assert first == second
+    assert first[0]["name"] == "Swan Street Dental"  # nearest first
+    assert client.upstream_calls == 2  # one geocode, one nearby search
+    assert client.searches.stats()["hits"] == 1
+
+def test_geocode_is_cached_across_searches():
+    client = _client()
+
+    async def searches():
+        await client.search("dentist", "carlton")
+        await client.search("doctor", "Carlton")
+
+    run(client, searches)
+    assert client.upstream_calls == 3  # one geocode shared by two nearby searches
+    assert client.geocodes.stats()["hits"] == 1
+
+def test_non_medical_places_are_dropped():
+    client = _client()
+    results = run(client, lambda: client.search("swan st", "richmond"))
+    names = {c["name"] for c in results}
+    assert "Richmond Pharmacy" in names
+    assert "Richmond Espresso" not in names
+
+def test_concurrent_identical_searches_share_one_call(monkeypatch):
+    monkeypatch.setenv("FAKE_PLACES_LATENCY_MS", "50")
+    client = _client()
+
+    async def searches():
+        return await asyncio.gather(*(client.search("doctor", "Melbourne") for _ in range(10)))
+
+    results = run(client, searches)
+    assert all(r == results[0] for r in results)
+    assert client.upstream_calls == 2
+    assert client.coalesced == 9
+    assert client.stats()["in_flight"] == 0
+
+def test_cancelled_waiter_does_not_cancel_shared_call(monkeypatch):
+    monkeypatch.setenv("FAKE_PLACES_LATENCY_MS", "50")
+    client = _client()
+
+    async def searches():
+        impatient = asyncio.ensure_future(client.search("doctor"))
+        patient = asyncio.ensure_future(client.search("doctor"))
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        return await patient
+
+    assert run(client, searches)
+    assert client.upstream_calls == 1
+
+def test_errors_are_raised_and_not_cached(monkeypatch):
+    monkeypatch.setenv("FAKE_PLACES_STATUS", "OVER_QUERY_LIMIT")
+    client = _client()
+
+    async def searches():
+        with pytest.raises(ClinicSearchUnavailable, match="OVER_QUERY_LIMIT"):
+            await client.search("doctor")
+        monkeypatch.delenv("FAKE_PLACES_STATUS")
+        return await client.search("doctor")
+
+    assert run(client, searches)
+    assert client.errors == 1
+    assert client.upstream_calls == 2
+
+def test_unreachable_api_raises():
+    client = _client()
+
+    async def search():
+        def refuse(request):
+            raise httpx.ConnectError("connection refused", request=request)
+
+        client._http = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(refuse))
+        with pytest.raises(ClinicSearchUnavailable):
+            await client.search("doctor")
+
+    run(client, search)
+    assert client.errors == 1
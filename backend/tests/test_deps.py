@@ -0,0 +1,88 @@
+import asyncio
+import time
+import pytest
+from app.database import AsyncSessionLocal
+from app.deps import Principal, PrincipalCache, get_current_user, principal_cache
+from app.models import User
+from app.security import create_access_token
+
+def _principal(email: str = "patient@medst.test") -> Principal:
+    return Principal(id=1, email=email, full_name="John Smith", role="patient", dob=None)
+
+@pytest.fixture
+def principals():
+    principal_cache.clear()
+    yield principal_cache
+    principal_cache.clear()
+
+def _authenticate(token: str) -> Principal:
+    async def call():
+        async with AsyncSessionLocal() as session:
+            return await get_current_user(token, session)
+    return asyncio.run(call())
+
+def test_cache_evicts_least_recently_used():
+    cache = PrincipalCache(max_entries=2, ttl=60)
+    cache.put("a", _principal("a@medst.test"), None)
+    cache.put("b", _principal("b@medst.test"), None)
+    assert cache.get("a") is not None  # "b" is now the oldest
+    cache.put("c", _principal("c@medst.test"), None)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+def test_entries_never_outlive_the_token():
+    cache = PrincipalCache(max_entries=10, ttl=60)
+    cache.put("expired", _principal(), time.time() - 1)
+    assert cache.get("expired") is None
+    cache.put("short", _principal(), time.time() + 0.05)
+    assert cache.get("short") is not None
+    time.sleep(0.06)
+    assert cache.get("short") is None
+
+def test_disabled_cache_stores_nothing():
+    cache = PrincipalCache(max_entries=0, ttl=60)
+    cache.put("a", _principal(), None)
+    assert cache.get("a") is None
+
+def test_repeated_requests_hit_the_cache(db, patient, async_engine, principals):
+    token = create_access_token(patient.email)
+    first = _authenticate(token)
+    assert first.id == patient.id
+    assert _authenticate(token) is first
+    assert principals.stats()["hits"] == 1
+
+def test_update_evicts_only_after_commit(db, patient, async_engine, principals):
+    token = create_access_token(patient.email)
+    _authenticate(token)
+
+    patient.full_name = "John A. Smith"
+    db.flush()
+    assert principals.get(token) is not None  # not visible to other sessions yet
+    db.commit()
+    assert principals.get(token) is None
+    assert _authenticate(token).full_name == "John A. Smith"
+
+def test_rolled_back_update_keeps_the_entry(db, patient, async_engine, principals):
+    token = create_access_token(patient.email)
+    _authenticate(token)
+
+    patient.full_name = "Someone Else"
+    db.flush()
+    db.rollback()
+    db.commit()  # nothing pending is carried into the next transaction
+    assert principals.get(token) is not None
+    assert "changed_principals" not in db.info
+
+def test_email_change_evicts_the_old_address(db, patient, async_engine, principals):
+    token = create_access_token(patient.email)
+    _authenticate(token)
+    patient.email = "john@medst.test"
+    db.commit()
+    assert principals.get(token) is None
+
+def test_deleted_user_is_evicted(db, patient, async_engine, principals):
+    token = create_access_token(patient.email)
+    _authenticate(token)
+    db.delete(db.get(User, patient.id))
+    db.commit()
+    assert principals.get(token) is None
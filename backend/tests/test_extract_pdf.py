@@ -0,0 +1,66 @@
+import asyncio
+import pytest
+from app.config import settings
+from app.services import jobs, storage
+from app.services.storage import LocalStorageBackend
+from app.utils import metrics
+
+fitz = pytest.importorskip("fitz")
+
+def _pdf(pages: int) -> bytes:
+    doc = fitz.open()
+    for number in range(pages):
+        doc.new_page().insert_text((40, 40), f"Page {number + 1} of the discharge summary")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+@pytest.fixture
+def local_pdf(tmp_path, monkeypatch):
+    backend = LocalStorageBackend(str(tmp_path / "store"))
+    storage.set_storage(backend)
+    monkeypatch.setattr(jobs, "get_executor", lambda: None)  # the loop's default thread pool
+    monkeypatch.setattr(settings, "pdf_parallel_min_pages", 8)
+    monkeypatch.setattr(settings, "pdf_pages_per_task", 3)
+
+    def store(pages: int) -> str:
+        key = f"blobs/{pages}.pdf"
+        storage.save_file(_pdf(pages), key)
+        return key
+
+    yield store
+    storage.set_storage(None)
+
+def test_large_pdf_is_split_into_page_ranges(local_pdf):
+    key = local_pdf(10)
+    before = metrics.ingest_page_seconds.count("text")
+    text, _, doc_type, info = asyncio.run(jobs.ingest_in_pool(key, "summary.pdf", None))
+
+    assert doc_type != "unknown"
+    assert info["page_ranges"] == 4  # 3 + 3 + 3 + 1 pages
+    lines = [line for line in text.splitlines() if line.startswith("Page")]
+    assert lines == [f"Page {n} of the discharge summary" for n in range(1, 11)]
+    assert len(info["pages"]) == 10
+    assert all(seconds >= 0 and not ocr for seconds, ocr in info["pages"])
+
+    metrics.record_ingestion(info)
+    assert metrics.ingest_page_seconds.count("text") == before + 10
+
+def test_small_pdf_is_one_task(local_pdf):
+    key = local_pdf(2)
+    text, _, _, info = asyncio.run(jobs.ingest_in_pool(key, "letter.pdf", None))
+    assert info["page_ranges"] == 0
+    assert len(info["pages"]) == 2
+    assert "Page 2 of the discharge summary" in text
+
+def test_failed_range_fails_the_document(local_pdf, monkeypatch):
+    key = local_pdf(10)
+
+    def broken(path, start, stop):
+        if start == 3:
+            raise RuntimeError("corrupt page")
+        return []
+
+    monkeypatch.setattr(jobs, "extract_pdf_range", broken)
+    with pytest.raises(RuntimeError, match="corrupt page"):
+        asyncio.run(jobs.ingest_in_pool(key, "summary.pdf", None))
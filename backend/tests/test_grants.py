@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+import pytest
+from app.models import AccessGrant
+from app.services import grants
+from app.services.grants import GrantDecisionCache, decisions, expire_grants, has_access, revoke_grant
+
+@pytest.fixture
+def cache():
+    decisions.clear()
+    yield decisions
+    decisions.clear()
+
+def _grant(db, patient, **fields) -> AccessGrant:
+    grant = AccessGrant(patient_id=patient.id, grantee_name="Dr Jane Doe", **fields)
+    db.add(grant)
+    db.commit()
+    return grant
+
+def test_decisions_are_cached(db, patient, cache):
+    _grant(db, patient)
+    assert has_access(db, patient.id, "Dr Jane Doe")
+    assert has_access(db, patient.id, " Dr Jane Doe ")
+    assert not has_access(db, patient.id, "Someone Else")
+    assert cache.stats()["hits"] == 1
+
+def test_revoke_invalidates_after_commit(db, patient, cache):
+    grant = _grant(db, patient)
+    assert has_access(db, patient.id, "Dr Jane Doe")
+    revoke_grant(db, patient.id, grant.id)
+    assert not has_access(db, patient.id, "Dr Jane Doe")
+
+def test_flushed_change_is_invalidated_only_on_commit(db, patient, cache):
+    grant = _grant(db, patient)
+    assert has_access(db, patient.id, "Dr Jane Doe")
+    grant.active = False
+    db.flush()
+    # Other sessions still see the grant, so the cached decision stands
+    assert cache.get((patient.id, "Dr Jane Doe", None, None)) is True
+    db.commit()
+    assert cache.get((patient.id, "Dr Jane Doe", None, None)) is None
+
+def test_rolled_back_change_is_not_carried_into_the_next_commit(db, patient, cache):
+    grant = _grant(db, patient)
+    assert has_access(db, patient.id, "Dr Jane Doe")
+    grant.active = False
+    db.flush()
+    db.rollback()
+    db.commit()
+    assert cache.get((patient.id, "Dr Jane Doe", None, None)) is True
+
+def test_new_grant_replaces_a_cached_denial(db, patient, cache):
+    assert not has_access(db, patient.id, "Dr Jane Doe")
+    _grant(db, patient)
+    assert has_access(db, patient.id, "Dr Jane Doe")
+
+def test_decision_started_before_a_change_is_not_cached():
+    cache = GrantDecisionCache(max_entries=10, ttl=60)
+    stamp = cache.stamp()
+    cache.invalidate({1})  # grants changed while the decision was being made
+    cache.put((1, "Dr Jane Doe", None, None), True, stamp, 60)
+    assert cache.get((1, "Dr Jane Doe", None, None)) is None
+    cache.put((2, "Dr Jane Doe", None, None), True, stamp, 60)  # other patients are unaffected
+    assert cache.get((2, "Dr Jane Doe", None, None)) is True
+
+def test_change_tracking_is_bounded_and_errs_toward_stale():
+    cache = GrantDecisionCache(max_entries=2, ttl=60)
+    old = cache.stamp()
+    cache.put((1, "a", None, None), True, old, 60)
+    cache.invalidate({2})
+    cache.invalidate({3})
+    cache.invalidate({4})
+    assert cache.stats()["tracked_patients"] == 2
+    # Patient 1 never changed, but decisions older than the dropped entries are no longer trusted
+    assert cache.get((1, "a", None, None)) is None
+    cache.put((1, "a", None, None), True, cache.stamp(), 60)
+    assert cache.get((1, "a", None, None)) is True
+
+def test_grant_expiry_bounds_the_cached_decision(db, patient, cache, monkeypatch):
+    _grant(db, patient, expires_at=datetime.utcnow() + timedelta(seconds=30))
+    clock = [1000.0]
+    monkeypatch.setattr(grants.time, "monotonic", lambda: clock[0])
+    assert has_access(db, patient.id, "Dr Jane Doe")
+    clock[0] += 31
+    assert cache.get((patient.id, "Dr Jane Doe", None, None)) is None
+
+def test_sweeper_invalidates_expired_grants(db, patient, cache):
+    grant = _grant(db, patient, expires_at=datetime.utcnow() + timedelta(hours=1))
+    assert has_access(db, patient.id, "Dr Jane Doe")
+    grant.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()  # an ORM update, so this already invalidates; re-cache a stale decision below
+    cache.put((patient.id, "Dr Jane Doe", None, None), True, cache.stamp(), 60)
+
+    assert expire_grants(batch_size=10) == 1
+    assert cache.get((patient.id, "Dr Jane Doe", None, None)) is None
+    assert not has_access(db, patient.id, "Dr Jane Doe")
@@ -0,0 +1,37 @@
+import pytest
+from app.utils.http import RangeNotSatisfiable, etag_matches, parse_range_header
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-9", (0, 9)),
+    ("bytes=10-", (10, 99)),
+    ("bytes=90-200", (90, 99)),  # clamped to the last byte
+    ("bytes=-10", (90, 99)),
+    ("bytes=-500", (0, 99)),     # suffix longer than the file
+    ("Bytes = 5-5", (5, 5)),
+])
+def test_single_ranges(header, expected):
+    assert parse_range_header(header, 100) == expected
+
+@pytest.mark.parametrize("header", [None, "", "items=0-9", "bytes=0-9,20-29", "bytes=abc", "bytes=5", "bytes=x-9"])
+def test_whole_entity_is_served(header):
+    assert parse_range_header(header, 100) is None
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=100-", 100),
+    ("bytes=100-200", 100),
+    ("bytes=9-5", 100),
+    ("bytes=-0", 100),
+    ("bytes=-10", 0),
+    ("bytes=0-0", 0),
+])
+def test_unsatisfiable_ranges(header, size):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range_header(header, size)
+
+def test_etag_matching():
+    etag = '"abc"'
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('"xyz", W/"abc"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"xyz"', etag)
+    assert not etag_matches(None, etag)
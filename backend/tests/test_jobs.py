@@ -0,0 +1,230 @@
+import asyncio
+import io
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import func
+from app.config import settings
+from app.models import Blob, IngestionJob, PatientMonthCount, Record, UploadTokens, User
+from app.services import jobs
+
+DATA = b"%PDF-1.4 referral letter"
+FIELDS = {"provider_name": "Dr. Jane Doe", "visit_date": "2025-09-17", "lab_results": {"HbA1c": "6.5 %"}}
+
+@pytest.fixture
+def pipeline(monkeypatch, storage):
+    """Replace the ingestion pipeline with a stub extractor; set `fail` to make it raise."""
+    state = {"fail": False, "calls": []}
+
+    async def ingest(storage_key, filename, content_hash):
+        state["calls"].append(storage_key)
+        await asyncio.sleep(0)
+        assert storage.objects[storage_key] == DATA
+        if state["fail"]:
+            raise ValueError("Could not extract text")
+        return "Referral for cough", dict(FIELDS), "referral", {"document_type": "pdf", "stages": {"parse": 0.01}}
+
+    monkeypatch.setattr(jobs, "ingest_in_pool", ingest)
+    return state
+
+@pytest.fixture
+def upload_token(db, patient):
+    token = UploadTokens(token="tok-1", patient_id=patient.id, clinic_name="Sunrise Clinic", service_type="GP", used=False)
+    db.add(token)
+    db.commit()
+    return token
+
+def _submit(patient_id: int, data: bytes = DATA, filename: str = "referral.pdf", upload_token_id=None):
+    return jobs.submit_upload(patient_id, filename, io.BytesIO(data), upload_token_id)
+
+def _reload(db, model, key):
+    db.expire_all()
+    return db.get(model, key)
+
+def test_job_runs_to_a_record(db, patient, pipeline):
+    job = _submit(patient.id)
+    assert job.status == "queued"
+    assert _reload(db, Blob, job.content_hash).ref_count == 1
+
+    asyncio.run(jobs.run_job(job.id))
+
+    job = _reload(db, IngestionJob, job.id)
+    assert job.status == "done"
+    assert job.error is None and job.finished_at is not None
+    record = db.get(Record, job.record_id)
+    assert record.storage_key == job.storage_key
+    assert record.content_text == "Referral for cough"
+    assert [lab.test for lab in record.lab_results] == ["hba1c"]
+
+def test_done_job_is_not_run_again(db, patient, pipeline):
+    job = _submit(patient.id)
+    asyncio.run(jobs.run_job(job.id))
+    asyncio.run(jobs.run_job(job.id))
+    assert len(pipeline["calls"]) == 1
+
+def test_identical_upload_completes_from_earlier_record(db, patient, pipeline, storage):
+    first = _submit(patient.id)
+    asyncio.run(jobs.run_job(first.id))
+
+    second = _submit(patient.id, filename="again.pdf")
+    assert second.status == "queued"  # the same answer as for a new file
+    asyncio.run(jobs.run_job(second.id))
+
+    second = _reload(db, IngestionJob, second.id)
+    assert second.status == "done"
+    assert len(pipeline["calls"]) == 1
+    assert len(storage.objects) == 1
+    assert _reload(db, Blob, first.content_hash).ref_count == 2
+    assert _reload(db, Record, second.record_id).content_text == "Referral for cough"
+
+def test_other_patients_extraction_is_not_reused(db, patient, pipeline, storage):
+    first = _submit(patient.id)
+    asyncio.run(jobs.run_job(first.id))
+    other = User(email="other@medst.test", hashed_password="x", full_name="Mary Chen")
+    db.add(other)
+    db.commit()
+
+    second = _submit(other.id)
+    assert second.status == "queued"
+    asyncio.run(jobs.run_job(second.id))
+
+    # Extracted afresh for the second patient; only the stored file is shared
+    assert len(pipeline["calls"]) == 2
+    assert len(storage.objects) == 1
+    assert _reload(db, Blob, first.content_hash).ref_count == 2
+    record = db.get(Record, _reload(db, IngestionJob, second.id).record_id)
+    assert record.patient_id == other.id
+    assert [lab.patient_id for lab in record.lab_results] == [other.id]
+
+def test_failed_job_releases_its_blob(db, patient, pipeline, storage):
+    pipeline["fail"] = True
+    job = _submit(patient.id)
+    asyncio.run(jobs.run_job(job.id))
+
+    job = _reload(db, IngestionJob, job.id)
+    assert job.status == "failed"
+    assert job.error == "Could not extract text"
+    assert job.record_id is None
+    assert db.get(Blob, job.content_hash) is None
+    assert storage.objects == {}
+
+def test_failed_job_keeps_blob_shared_with_a_record(db, patient, pipeline, storage):
+    done = _submit(patient.id)
+    asyncio.run(jobs.run_job(done.id))
+    # A job for the same bytes that started before the first one finished
+    with jobs.SessionLocal() as session:
+        blob = session.get(Blob, done.content_hash)
+        blob.ref_count += 1
+        queued = jobs.create_job(session, patient.id, "again.pdf", done.storage_key, done.content_hash)
+        queued.status, queued.claimed_by = "running", jobs.WORKER_ID
+        session.commit()
+        queued_id = queued.id
+
+    jobs._fail_job(queued_id, "worker died")
+
+    assert _reload(db, IngestionJob, queued_id).status == "failed"
+    assert _reload(db, Blob, done.content_hash).ref_count == 1
+    assert done.storage_key in storage.objects
+
+def test_failed_job_reopens_upload_token(db, patient, pipeline, upload_token):
+    pipeline["fail"] = True
+    job = _submit(patient.id, upload_token_id=upload_token.id)
+    assert _reload(db, UploadTokens, upload_token.id).used is True
+
+    asyncio.run(jobs.run_job(job.id))
+    assert _reload(db, UploadTokens, upload_token.id).used is False
+
+    # The clinic can retry with the same link
+    pipeline["fail"] = False
+    retry = _submit(patient.id, upload_token_id=upload_token.id)
+    asyncio.run(jobs.run_job(retry.id))
+    record = db.get(Record, _reload(db, IngestionJob, retry.id).record_id)
+    assert record.provider_clinic == "Sunrise Clinic"
+    assert _reload(db, UploadTokens, upload_token.id).used is True
+
+def test_used_upload_token_is_rejected(db, patient, pipeline, storage, upload_token):
+    _submit(patient.id, upload_token_id=upload_token.id)
+    with pytest.raises(ValueError, match="upload link"):
+        _submit(patient.id, data=b"%PDF-1.4 other", upload_token_id=upload_token.id)
+    assert len(storage.objects) == 1
+
+def test_unsupported_file_is_rejected_before_storing(db, patient, pipeline, storage):
+    with pytest.raises(ValueError, match="Unsupported"):
+        _submit(patient.id, filename="notes.txt")
+    assert storage.objects == {}
+    assert db.query(IngestionJob).count() == 0
+
+def test_job_is_claimed_once(db, patient, pipeline):
+    job = _submit(patient.id)
+    assert jobs._start_job(job.id) is not None
+    assert jobs._start_job(job.id) is None  # the first claim holds a live lease
+
+    claimed = _reload(db, IngestionJob, job.id)
+    assert claimed.status == "running"
+    assert claimed.claimed_by == jobs.WORKER_ID
+    assert claimed.lease_expires_at > datetime.utcnow()
+
+def test_concurrent_runs_create_one_record(db, patient, pipeline):
+    job = _submit(patient.id)
+
+    async def race():
+        await asyncio.gather(jobs.run_job(job.id), jobs.run_job(job.id), jobs.run_job(job.id))
+
+    asyncio.run(race())
+    assert len(pipeline["calls"]) == 1
+    assert db.query(Record).count() == 1
+    assert db.query(func.sum(PatientMonthCount.count)).scalar() == 1
+    assert _reload(db, Blob, job.content_hash).ref_count == 1
+
+def _strand(job_id: str, status: str, lease_expires_at=None, claimed_by="other-host:1", age: float = 0):
+    with jobs.SessionLocal() as session:
+        job = session.get(IngestionJob, job_id)
+        job.status, job.claimed_by, job.lease_expires_at = status, claimed_by, lease_expires_at
+        job.created_at = datetime.utcnow() - timedelta(seconds=age)
+        session.commit()
+
+def test_recovery_skips_live_claims_and_fresh_jobs(db, patient, pipeline):
+    running = _submit(patient.id)
+    _strand(running.id, "running", datetime.utcnow() + timedelta(seconds=60))
+    _submit(patient.id, data=b"%PDF-1.4 fresh")  # its own process is about to run it
+
+    assert jobs._stranded_job_ids() == []
+    assert jobs._start_job(running.id) is None
+
+def test_recovery_takes_over_lapsed_leases(db, patient, pipeline):
+    job = _submit(patient.id)
+    _strand(job.id, "running", datetime.utcnow() - timedelta(seconds=1))
+    assert jobs._stranded_job_ids() == [job.id]
+
+    asyncio.run(jobs.run_job(job.id))
+    job = _reload(db, IngestionJob, job.id)
+    assert job.status == "done"
+    assert job.claimed_by == jobs.WORKER_ID
+
+def test_result_is_dropped_after_losing_the_claim(db, patient, pipeline):
+    job = _submit(patient.id)
+    assert jobs._start_job(job.id) is not None
+    # The lease lapsed and another process took the job over
+    _strand(job.id, "running", datetime.utcnow() + timedelta(seconds=60))
+
+    jobs._complete_job(job.id, "text", dict(FIELDS), "referral")
+    jobs._fail_job(job.id, "late failure")
+    assert db.query(Record).count() == 0
+    assert _reload(db, IngestionJob, job.id).status == "running"
+    assert _reload(db, Blob, job.content_hash).ref_count == 1
+
+def test_resume_purges_orphaned_blobs_and_requeues(db, patient, pipeline, storage):
+    job = _submit(patient.id)
+    _strand(job.id, "queued", claimed_by=None, age=settings.ingest_lease_seconds + 1)
+    orphan = _submit(patient.id, data=b"%PDF-1.4 orphan")
+    with jobs.SessionLocal() as session:
+        session.get(Blob, orphan.content_hash).ref_count = 0
+        session.get(IngestionJob, orphan.id).status = "failed"
+        session.commit()
+
+    async def resume():
+        assert await jobs.resume_pending_jobs() == 1
+        await asyncio.gather(*jobs._tasks)
+
+    asyncio.run(resume())
+    assert _reload(db, IngestionJob, job.id).status == "done"
+    assert orphan.storage_key not in storage.objects
@@ -0,0 +1,50 @@
+import logging
+from app.services.labs import lab_results_for
+from app.utils.labs import normalize_lab
+from app.utils.parsing import extract_fields
+
+REPORT = """Sunrise Medical Clinic
+Patient: John Smith | DOB: 01 Jan 1990
+Date of visit: 17 September 2025
+Assessment: Type 2 diabetes
+HbA1c 6.1 %
+Hb 13.5 g/dL
+Fasting glucose: 99 mg/dL
+Cholesterol: 5.4 mmol/L; LDL 3.1 mmol/L
+Febrile on arrival, temperature 38.2 °C
+Plan: recheck in 3 months
+Signature: J Doe"""
+
+def _rows(text: str):
+    fields = extract_fields(text)
+    rows = lab_results_for(1, fields, fields.get("visit_date"))
+    return {row.test: (row.value, row.unit) for row in rows}
+
+def test_report_text_to_lab_rows():
+    assert _rows(REPORT) == {
+        "hba1c": (6.1, "%"),
+        "haemoglobin": (135.0, "g/L"),
+        "glucose": (5.4951, "mmol/L"),
+        "cholesterol": (5.4, "mmol/L"),
+        "ldl": (3.1, "mmol/L"),
+        "temperature": (38.2, "°C"),
+    }
+
+def test_rows_are_dated_by_the_visit():
+    fields = extract_fields(REPORT)
+    dates = {row.taken_on.isoformat() for row in lab_results_for(1, fields, fields.get("visit_date"))}
+    assert dates == {"2025-09-17"}
+
+def test_prose_before_a_number_is_not_a_lab_name():
+    # Without a separator only known test names are taken
+    assert extract_fields("Improved by 20 % since the last visit\n")["lab_results"] == {}
+    assert extract_fields("Serum ferritin: 45 %\n")["lab_results"] == {"Serum ferritin": "45 %"}
+
+def test_names_do_not_reach_into_the_previous_reading():
+    labs = extract_fields("Glucose: 5.5 mmol/L HbA1c 6.5 % Hb A1c: 6.6 %\n")["lab_results"]
+    assert labs == {"Glucose": "5.5 mmol/L", "HbA1c": "6.5 %", "Hb A1c": "6.6 %"}
+
+def test_unknown_unit_is_logged(caplog):
+    with caplog.at_level(logging.WARNING, logger="medst"):
+        assert normalize_lab("Creatinine", "80 umol/L") is None
+    assert "umol/L" in caplog.text
@@ -0,0 +1,183 @@
+import asyncio
+import smtplib
+from datetime import datetime, timedelta
+import pytest
+from app.config import settings
+from app.models import OutboundEmail
+from app.services import mailer as mailer_module
+from app.services.mailer import MAX_RETRY_DELAY_SECONDS, Mailer, claim_due, enqueue_email, record_results, retry_delay
+
+class FakeSMTP:
+    """Records sent messages; `replies` maps a recipient to the exception its delivery raises."""
+    replies = {}
+    sent = []
+    connections = 0
+
+    def __init__(self, host, port, timeout=None):
+        FakeSMTP.connections += 1
+        self.open = True
+
+    def ehlo(self):
+        return 250, b"ok"
+
+    def starttls(self, context=None):
+        return 220, b"ready"
+
+    def login(self, username, password):
+        return 235, b"ok"
+
+    def noop(self):
+        if not self.open:
+            raise smtplib.SMTPServerDisconnected("gone")
+        return 250, b"ok"
+
+    def send_message(self, msg):
+        error = self.replies.get(msg["To"])
+        if isinstance(error, smtplib.SMTPServerDisconnected):
+            self.open = False
+        if error is not None:
+            raise error
+        FakeSMTP.sent.append(msg)
+
+    def quit(self):
+        self.open = False
+
+    def close(self):
+        self.open = False
+
+@pytest.fixture
+def smtp(monkeypatch):
+    monkeypatch.setattr(mailer_module.smtplib, "SMTP", FakeSMTP)
+    FakeSMTP.replies, FakeSMTP.sent, FakeSMTP.connections = {}, [], 0
+    return FakeSMTP
+
+@pytest.fixture
+def mailer(engine, smtp):
+    instance = Mailer()
+    yield instance
+    instance.stop()
+
+def _queue(db, *addresses):
+    emails = [enqueue_email(db, address, f"Records for {address}", "Please upload") for address in addresses]
+    db.commit()
+    return [email.id for email in emails]
+
+def _email(db, email_id) -> OutboundEmail:
+    db.expire_all()
+    return db.get(OutboundEmail, email_id)
+
+def test_retry_delay_doubles_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(mailer_module.random, "uniform", lambda low, high: 1.0)
+    base = settings.email_retry_base_seconds
+    assert [retry_delay(n) for n in (1, 2, 3)] == [base, base * 2, base * 4]
+    assert retry_delay(50) == MAX_RETRY_DELAY_SECONDS
+
+def test_retry_delay_is_jittered():
+    delays = {retry_delay(2) for _ in range(50)}
+    assert len(delays) > 1
+    base = settings.email_retry_base_seconds * 2
+    assert all(base * 0.8 <= d <= base * 1.2 for d in delays)
+
+def test_delivery_outcomes(db, mailer, smtp):
+    smtp.replies = {
+        "busy@clinic.test": smtplib.SMTPDataError(451, b"try again later"),
+        "gone@clinic.test": smtplib.SMTPRecipientsRefused({"gone@clinic.test": (550, b"no such user")}),
+        "spam@clinic.test": smtplib.SMTPDataError(554, b"rejected"),
+    }
+    ok, busy, gone, spam = _queue(db, "ok@clinic.test", "busy@clinic.test", "gone@clinic.test", "spam@clinic.test")
+
+    before = datetime.utcnow()
+    assert asyncio.run(mailer.deliver_due()) == 4
+
+    assert _email(db, ok).status == "sent"
+    assert [m["To"] for m in smtp.sent] == ["ok@clinic.test"]
+    retrying = _email(db, busy)
+    assert retrying.status == "queued"
+    assert retrying.attempts == 1
+    assert retrying.last_error.startswith("451")
+    assert retrying.next_attempt_at >= before + timedelta(seconds=settings.email_retry_base_seconds * 0.8)
+    assert _email(db, gone).status == "failed"
+    assert _email(db, spam).status == "failed"
+    assert (mailer.sent, mailer.retried, mailer.failed) == (1, 1, 2)
+    # Per-message refusals leave the connection usable
+    assert smtp.connections <= settings.smtp_pool_size
+
+def test_retry_waits_for_backoff_and_keeps_message_id(db, mailer, smtp):
+    smtp.replies = {"busy@clinic.test": smtplib.SMTPDataError(451, b"try again later")}
+    email_id, = _queue(db, "busy@clinic.test")
+    assert asyncio.run(mailer.deliver_due()) == 1
+    assert asyncio.run(mailer.deliver_due()) == 0  # not due yet
+
+    email = _email(db, email_id)
+    email.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    smtp.replies = {}
+    assert asyncio.run(mailer.deliver_due()) == 1
+
+    email = _email(db, email_id)
+    assert email.status == "sent"
+    assert email.attempts == 2
+    assert email.last_error is None
+    assert smtp.sent[0]["Message-ID"] == f"<outbound-{email_id}@medst.test>"
+
+def test_dropped_connection_is_retried_on_a_new_one(db, mailer, smtp):
+    smtp.replies = {"first@clinic.test": smtplib.SMTPServerDisconnected("Connection unexpectedly closed")}
+    first, = _queue(db, "first@clinic.test")
+    asyncio.run(mailer.deliver_due())
+    assert _email(db, first).status == "queued"
+
+    second, = _queue(db, "second@clinic.test")
+    asyncio.run(mailer.deliver_due())
+    assert _email(db, second).status == "sent"
+    assert smtp.connections == 2
+    assert mailer.pool.stats()["reused"] == 0
+
+def test_gives_up_after_max_attempts(db, engine):
+    email_id, = _queue(db, "busy@clinic.test")
+    email = _email(db, email_id)
+    email.attempts = settings.email_max_attempts - 1
+    db.commit()
+    item, = claim_due(1)
+    assert record_results([(item, "451 'try again later'", False)]) == (0, 0, 1)
+    assert _email(db, email_id).status == "failed"
+
+def test_claim_lasts_until_the_pool_can_send_the_batch(db, engine, monkeypatch):
+    monkeypatch.setattr(settings, "smtp_pool_size", 2)
+    _queue(db, *(f"user{n}@clinic.test" for n in range(5)))
+    before = datetime.utcnow()
+    assert len(claim_due(10)) == 5
+
+    # Three rounds of two connections, plus one for connecting
+    lease = timedelta(seconds=4 * settings.smtp_timeout_seconds)
+    for email in db.query(OutboundEmail):
+        db.refresh(email)
+        assert before + lease <= email.next_attempt_at <= datetime.utcnow() + lease
+
+def test_outcome_of_a_lapsed_claim_is_dropped(db, engine):
+    email_id, = _queue(db, "slow@clinic.test")
+    stale, = claim_due(1)
+    # The claim lapsed and another pass took the email over
+    email = _email(db, email_id)
+    email.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    current, = claim_due(1)
+
+    assert record_results([(stale, "451 'try again later'", False)]) == (0, 0, 0)
+    assert _email(db, email_id).status == "sending"
+    assert record_results([(current, None, False)]) == (1, 0, 0)
+    email = _email(db, email_id)
+    assert email.status == "sent"
+    assert email.attempts == 2
+
+def test_expired_claim_is_picked_up_again(db, mailer, smtp):
+    email_id, = _queue(db, "ok@clinic.test")
+    # Claimed by a process that died before recording the outcome
+    email = _email(db, email_id)
+    email.status, email.attempts = "sending", 1
+    email.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+
+    assert asyncio.run(mailer.deliver_due()) == 1
+    email = _email(db, email_id)
+    assert email.status == "sent"
+    assert email.attempts == 2
@@ -0,0 +1,52 @@
+import pytest
+from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from app.utils import metrics
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+    router = APIRouter(prefix="/records")
+
+    @router.get("/{record_id}")
+    def get_record(record_id: int):
+        if record_id == 0:
+            raise HTTPException(status_code=404, detail="Record not found")
+        return {"id": record_id}
+
+    @app.get("/boom")
+    def boom():
+        raise RuntimeError("broken")
+
+    app.include_router(router)
+    return app
+
+@pytest.fixture
+def client():
+    with TestClient(_app(), raise_server_exceptions=False) as client:
+        yield client
+
+def _count(route: str, status: str) -> int:
+    return metrics.http_request_seconds.count("GET", route, status)
+
+def test_requests_are_labelled_by_route_template(client):
+    before = _count("/records/{record_id}", "200")
+    for record_id in (1, 2, 3):
+        assert client.get(f"/records/{record_id}").status_code == 200
+    assert _count("/records/{record_id}", "200") == before + 3
+    assert _count("/records/1", "200") == 0
+    assert 'route="/records/{record_id}"' in metrics.render()
+
+def test_error_statuses_keep_the_route(client):
+    not_found, failed = _count("/records/{record_id}", "404"), _count("/boom", "500")
+    assert client.get("/records/0").status_code == 404
+    assert client.get("/boom").status_code == 500
+    assert _count("/records/{record_id}", "404") == not_found + 1
+    assert _count("/boom", "500") == failed + 1
+
+def test_unknown_paths_share_one_label(client):
+    before = _count("unmatched", "404")
+    for path in ("/nope", "/wp-admin.php", "/records/1/extra"):
+        assert client.get(path).status_code == 404
+    assert _count("unmatched", "404") == before + 3
+    assert _count("/nope", "404") == 0
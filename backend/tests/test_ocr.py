@@ -0,0 +1,62 @@
+import types
+import pytest
+from app import main
+from app.config import settings
+from app.services import ocr
+from app.services.ocr import OcrError, OcrResult, OcrTimeout
+
+class FakeTessBaseAPI:
+    def __init__(self, lang):
+        if lang != "eng":
+            raise RuntimeError("Failed to init API, possibly an invalid tessdata path")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+@pytest.fixture
+def engine_module(monkeypatch):
+    """Swap the tesserocr module; yields a setter taking a module or None."""
+    ocr.ocr_version.cache_clear()
+    yield lambda module: monkeypatch.setattr(ocr, "tesserocr", module)
+    ocr.ocr_version.cache_clear()
+
+def _fake_tesserocr():
+    return types.SimpleNamespace(PyTessBaseAPI=FakeTessBaseAPI, tesseract_version=lambda: "tesseract 5.3.4\n leptonica-1.84")
+
+def test_startup_check_loads_the_engine(engine_module):
+    engine_module(_fake_tesserocr())
+    assert ocr.check_engine() == "tesserocr-5.3.4-eng"
+
+def test_startup_fails_without_tesserocr(engine_module):
+    engine_module(None)
+    with pytest.raises(OcrError, match="not installed"):
+        main.check_ocr_engine()
+
+def test_startup_fails_without_language_data(engine_module, monkeypatch):
+    engine_module(_fake_tesserocr())
+    monkeypatch.setattr(settings, "tess_lang", "deu")
+    with pytest.raises(OcrError, match="'deu'"):
+        main.check_ocr_engine()
+
+def test_startup_continues_when_ocr_is_optional(engine_module, monkeypatch, caplog):
+    engine_module(None)
+    monkeypatch.setattr(settings, "ocr_required", False)
+    main.check_ocr_engine()
+    assert "OCR_REQUIRED=false" in caplog.text
+
+def test_batch_shares_one_deadline(monkeypatch):
+    clock, timeouts = [0.0], []
+
+    def ocr_one(image, timeout):
+        timeouts.append(timeout)
+        clock[0] += 4
+        return OcrResult("text", 4)
+
+    monkeypatch.setattr(ocr, "_ocr_one", ocr_one)
+    monkeypatch.setattr(ocr, "time", types.SimpleNamespace(monotonic=lambda: clock[0]))
+    with pytest.raises(OcrTimeout, match="exceeded 10"):
+        ocr.ocr_images([b"page"] * 4, timeout=5, batch_timeout=10)
+    assert timeouts == [5, 5, 2]  # the last page only gets what is left of the batch
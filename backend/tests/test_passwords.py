@@ -0,0 +1,41 @@
+import asyncio
+import os
+import pytest
+from app.config import settings
+from app.services import passwords
+from app.utils import metrics
+
+def _die_once(marker: str) -> str:
+    """Kill the worker process the first time, as the OOM killer would."""
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return "hashed"
+
+@pytest.fixture
+def pool():
+    passwords.shutdown_pool()
+    yield
+    passwords.shutdown_pool()
+
+def test_dead_worker_is_replaced_and_the_call_retried(pool, tmp_path):
+    assert asyncio.run(passwords._submit(_die_once, str(tmp_path / "died"))) == "hashed"
+    assert (tmp_path / "died").exists()
+    assert passwords._pool is not None and not passwords._pool._broken
+    assert passwords.stats()["pending"] == 0
+
+def test_hashing_is_reported_in_metrics(pool):
+    before = metrics.password_hash_seconds.count("hash")
+    hashed = asyncio.run(passwords.hash_password_async("correct horse"))
+    ok, _ = asyncio.run(passwords.verify_and_update_async("correct horse", hashed))
+    assert ok
+    assert metrics.password_hash_seconds.count("hash") == before + 2
+    assert metrics.password_hash_seconds.count("wait") == before + 2
+    assert "medst_password_hash_pending 0" in metrics.render()
+
+def test_callers_beyond_the_limit_are_turned_away(pool, monkeypatch):
+    monkeypatch.setattr(settings, "password_hash_max_pending", 0)
+    before = metrics.password_hash_rejected.value()
+    with pytest.raises(passwords.HasherBusy):
+        asyncio.run(passwords.hash_password_async("correct horse"))
+    assert metrics.password_hash_rejected.value() == before + 1
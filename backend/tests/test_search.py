@@ -0,0 +1,33 @@
+from app.models import Record
+from app.services.search import MARK_START, MARK_STOP, index_records, search_records
+
+def _record(db, patient, text: str, **fields) -> Record:
+    record = Record(patient_id=patient.id, storage_key=f"blobs/{len(text)}", content_text=text, **fields)
+    db.add(record)
+    db.flush()
+    index_records(db, [record])
+    db.commit()
+    return record
+
+def test_snippet_html_is_escaped_around_highlights(db, patient):
+    _record(db, patient, 'Note <script>alert("x")</script> fasting glucose 5.5 & <b>stable</b>')
+    hit, = search_records(db, patient.id, "glucose")
+    assert hit["snippet"] == (
+        "Note &lt;script&gt;alert(&quot;x&quot;)&lt;/script&gt; fasting <mark>glucose</mark> "
+        "5.5 &amp; &lt;b&gt;stable&lt;/b&gt;"
+    )
+
+def test_matched_word_with_markup_is_escaped_inside_the_mark(db, patient):
+    _record(db, patient, "result: <img src=x onerror=alert(1)>glucose</img>")
+    hit, = search_records(db, patient.id, "glucose")
+    assert "<img" not in hit["snippet"]
+    assert hit["snippet"].count("<mark>") == hit["snippet"].count("</mark>") == 1
+
+def test_delimiters_in_the_text_do_not_open_highlights(db, patient):
+    _record(db, patient, f"{MARK_START}<i>injected{MARK_STOP} glucose high")
+    hit, = search_records(db, patient.id, "glucose")
+    assert hit["snippet"] == "&lt;i&gt;injected <mark>glucose</mark> high"
+
+def test_search_only_sees_the_patients_records(db, patient):
+    _record(db, patient, "glucose normal")
+    assert search_records(db, patient.id + 1, "glucose") == []
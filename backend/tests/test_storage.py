@@ -0,0 +1,43 @@
+import io
+import os
+import pytest
+from app.services import storage
+from app.services.storage import LocalStorageBackend, MemoryStorageBackend
+
+CONTENT = bytes(range(256)) * 40
+
+@pytest.fixture(params=["memory", "local"])
+def backend(request, tmp_path):
+    backend = MemoryStorageBackend() if request.param == "memory" else LocalStorageBackend(str(tmp_path / "store"))
+    storage.set_storage(backend)
+    yield backend
+    storage.set_storage(None)
+
+def test_round_trip(backend):
+    key = storage.generate_storage_key("ab" * 32, "report.pdf")
+    storage.save_stream(io.BytesIO(CONTENT), key)
+
+    assert storage.get_file_content(key) == CONTENT
+    assert storage.get_file_size(key) == len(CONTENT)
+    assert b"".join(storage.iter_file_range(key, 0, len(CONTENT) - 1, chunk_size=1000)) == CONTENT
+    assert b"".join(storage.iter_file_range(key, 100, 2099, chunk_size=256)) == CONTENT[100:2100]
+
+    storage.delete_file(key)
+    with pytest.raises(FileNotFoundError):
+        storage.get_file_content(key)
+    storage.delete_file(key)  # deleting a missing object is not an error
+
+def test_local_copy(backend):
+    storage.save_file(CONTENT, "blobs/copy.bin")
+    with storage.local_copy("blobs/copy.bin") as path:
+        with open(path, "rb") as f:
+            assert f.read() == CONTENT
+    if isinstance(backend, MemoryStorageBackend):
+        assert not os.path.exists(path)  # the temporary download is cleaned up
+
+def test_missing_object(backend):
+    with pytest.raises(FileNotFoundError):
+        storage.get_file_size("blobs/missing.bin")
+    with pytest.raises(FileNotFoundError):
+        with storage.local_copy("blobs/missing.bin"):
+            pass
@@ -0,0 +1,42 @@
+"""
+Build the tables derived from records (aggregates, lab results and, outside
+PostgreSQL, the search index) for records stored before those tables existed.
+
+Run once from the backend directory after `alembic upgrade head` takes an existing
+database past revision 0002 (uses DATABASE_URL, or --url):
+
+    python -m tools.backfill_derived
+    python -m tools.backfill_derived --url sqlite:///./medst.db
+
+Each table is only filled while it is still empty, so running it again is harmless.
+"""
+import argparse
+import sys
+from typing import List, Optional
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="database URL (default: DATABASE_URL from settings)")
+    args = parser.parse_args(argv)
+
+    from app.database import SessionLocal
+    from app.services.aggregates import backfill_aggregates
+    from app.services.labs import backfill_lab_results
+    from app.services.search import backfill_search_terms
+
+    db = Session(bind=create_engine(args.url)) if args.url else SessionLocal()
+    with db:
+        for name, backfill in (
+            ("aggregates", backfill_aggregates),
+            ("lab results", backfill_lab_results),
+            ("search index", backfill_search_terms),
+        ):
+            count = backfill(db)
+            db.commit()
+            print(f"{name}: {count} backfilled")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
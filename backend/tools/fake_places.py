@@ -0,0 +1,99 @@
+"""
+Local stand-in for the Google Geocoding and Places (Text/Nearby Search) APIs.
+
+Run from the backend directory and point the API at it:
+
+    uvicorn tools.fake_places:app --port 8099
+    PLACES_API_URL=http://localhost:8099 uvicorn app.main:app --port 8000
+
+Responses follow the shape of the real endpoints for the handful of suburbs and
+clinics below. FAKE_PLACES_LATENCY_MS delays every response (to see concurrent
+searches coalesce), FAKE_PLACES_STATUS forces an error status such as
+OVER_QUERY_LIMIT, and GET /_stats reports how many calls each endpoint served.
+"""
+import asyncio
+import math
+import os
+from collections import Counter
+from typing import Optional
+from fastapi import FastAPI
+
+SUBURBS = {
+    "melbourne": (-37.8136, 144.9631),
+    "3000": (-37.8136, 144.9631),
+    "carlton": (-37.8001, 144.9671),
+    "3053": (-37.8001, 144.9671),
+    "richmond": (-37.8230, 144.9980),
+    "3121": (-37.8230, 144.9980),
+    "sydney": (-33.8688, 151.2093),
+    "2000": (-33.8688, 151.2093),
+}
+
+PLACES = [
+    ("Collins Street Medical Centre", "Level 2/55 Collins St, Melbourne", -37.8145, 144.9712, ["doctor", "health"], 4.5),
+    ("Melbourne Dental Clinic", "250 Swanston St, Melbourne", -37.8110, 144.9650, ["dentist", "health"], 4.7),
+    ("Royal Melbourne Hospital", "300 Grattan St, Parkville", -37.7990, 144.9560, ["hospital", "health"], 4.1),
+    ("Carlton Family Doctors", "180 Lygon St, Carlton", -37.7990, 144.9668, ["doctor", "health"], 4.3),
+    ("Lygon Street Physio", "301 Lygon St, Carlton", -37.7965, 144.9670, ["physiotherapist", "health"], 4.8),
+    ("Richmond Pharmacy", "254 Swan St, Richmond", -37.8250, 144.9960, ["pharmacy", "health", "store"], 4.0),
+    ("Swan Street Dental", "120 Swan St, Richmond", -37.8255, 144.9920, ["dentist", "health"], 4.6),
+    ("Richmond Espresso", "10 Swan St, Richmond", -37.8252, 144.9900, ["cafe", "food"], 4.4),
+    ("Sydney CBD Medical", "1 Martin Pl, Sydney", -33.8675, 151.2100, ["doctor", "health"], 4.2),
+    ("George Street Dentists", "400 George St, Sydney", -33.8700, 151.2070, ["dentist", "health"], 4.5),
+]
+
+app = FastAPI(title="Fake Places API")
+calls: Counter = Counter()
+
+def _place(i: int, place: tuple, nearby: bool) -> dict:
+    name, address, lat, lng, types, rating = place
+    out = {
+        "name": name,
+        "geometry": {"location": {"lat": lat, "lng": lng}},
+        "types": types,
+        "rating": rating,
+        "user_ratings_total": 20 + i * 7,
+        "place_id": f"fake-place-{i}",
+    }
+    out["vicinity" if nearby else "formatted_address"] = address
+    return out
+
+def _matches(place: tuple, text: str) -> bool:
+    words = [w for w in text.lower().replace(",", " ").split() if w not in ("in", "australia")]
+    haystack = " ".join([place[0], place[1], *place[4]]).lower()
+    return any(w in haystack or w.rstrip("s") in haystack for w in words)
+
+async def _respond(endpoint: str, results: list) -> dict:
+    calls[endpoint] += 1
+    delay = float(os.getenv("FAKE_PLACES_LATENCY_MS", "0"))
+    if delay:
+        await asyncio.sleep(delay / 1000)
+    status = os.getenv("FAKE_PLACES_STATUS")
+    if status:
+        return {"status": status, "results": [], "error_message": "Forced by FAKE_PLACES_STATUS"}
+    return {"status": "OK" if results else "ZERO_RESULTS", "results": results}
+
+@app.get("/geocode/json")
+async def geocode(address: str, key: Optional[str] = None):
+    suburb = address.split(",")[0].strip().lower()
+    coords = SUBURBS.get(suburb)
+    results = [{"formatted_address": address, "geometry": {"location": {"lat": coords[0], "lng": coords[1]}}}] if coords else []
+    return await _respond("geocode", results)
+
+@app.get("/place/nearbysearch/json")
+async def nearby_search(location: str, keyword: str = "", rankby: str = "distance", type: Optional[str] = None, key: Optional[str] = None):
+    lat, lng = (float(v) for v in location.split(","))
+    ranked = sorted(
+        (i for i, p in enumerate(PLACES) if math.hypot(p[2] - lat, p[3] - lng) < 0.5 and (not keyword or _matches(p, keyword))),
+        key=lambda i: math.hypot(PLACES[i][2] - lat, PLACES[i][3] - lng),
+    )
+    return await _respond("nearbysearch", [_place(i, PLACES[i], nearby=True) for i in ranked])
+
+@app.get("/place/textsearch/json")
+async def text_search(query: str, key: Optional[str] = None):
+    results = [_place(i, p, nearby=False) for i, p in enumerate(PLACES) if _matches(p, query)]
+    return await _respond("textsearch", results)
+
+@app.get("/_stats")
+def stats():
+    return dict(calls)
@@ -0,0 +1,51 @@
+"""
+Import clinics into the local directory that /clinics/search answers from.
+
+Run from the backend directory (uses DATABASE_URL, or --url):
+
+    python -m tools.import_clinics clinics.csv
+    python -m tools.import_clinics clinics.json --url sqlite:///./medst.db
+
+CSV files need a header row; JSON files hold a list of objects (or {"clinics": [...]}).
+Recognised fields: name, lat, lng (required), address, suburb, postcode, types
+(comma, semicolon or pipe separated, e.g. "dentist;health"), phone, rating,
+user_ratings_total, place_id. Rows are matched to existing clinics by place_id,
+else by name and address, and updated in place.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from typing import List, Optional
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+def read_rows(path: str) -> List[dict]:
+    if path.lower().endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return data["clinics"] if isinstance(data, dict) else data
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return [{k.strip().lower(): (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k} for row in csv.DictReader(f)]
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="CSV or JSON files")
+    parser.add_argument("--url", help="database URL (default: DATABASE_URL from settings)")
+    args = parser.parse_args(argv)
+
+    from app.database import SessionLocal
+    from app.services.clinic_directory import import_clinics
+
+    db = Session(bind=create_engine(args.url)) if args.url else SessionLocal()
+    with db:
+        for path in args.paths:
+            counts = import_clinics(db, read_rows(path))
+            db.commit()
+            print(f"{os.path.basename(path)}: {counts['created']} created, {counts['updated']} updated, "
+                  f"{counts['skipped']} skipped (no name or position)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
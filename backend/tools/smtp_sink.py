@@ -0,0 +1,136 @@
+"""
+Local SMTP server that accepts every message and saves it, for developing and
+testing outbound email without a real mail account.
+
+Run from the backend directory and point the API at it:
+
+    python -m tools.smtp_sink --port 1025 --out /tmp/medst-mail
+    SMTP_HOST=localhost SMTP_PORT=1025 SMTP_STARTTLS=false uvicorn app.main:app
+
+Each message is written to the output directory as <n>.eml and summarised on
+stdout. AUTH is accepted with any credentials. --reject-rcpt makes recipients
+containing the given text fail with 550, and --fail-first N answers the first N
+messages with 451, to exercise permanent failures and retries.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from email import message_from_bytes
+from typing import List, Optional
+
+class SinkSession:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, sink: "Sink"):
+        self.reader, self.writer, self.sink = reader, writer, sink
+        self.mail_from: Optional[str] = None
+        self.rcpts: List[str] = []
+
+    async def reply(self, line: str) -> None:
+        self.writer.write(line.encode() + b"\r\n")
+        await self.writer.drain()
+
+    async def run(self) -> None:
+        self.sink.connections += 1
+        await self.reply("220 medst-smtp-sink ready")
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            command, _, arg = line.decode("utf-8", "replace").strip().partition(" ")
+            command = command.upper()
+            if command == "EHLO":
+                await self.reply("250-medst-smtp-sink\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME")
+            elif command == "HELO":
+                await self.reply("250 medst-smtp-sink")
+            elif command == "AUTH":
+                if arg.upper().startswith("LOGIN"):
+                    await self.reply("334 VXNlcm5hbWU6")
+                    await self.reader.readline()
+                    await self.reply("334 UGFzc3dvcmQ6")
+                    await self.reader.readline()
+                elif arg.upper() == "PLAIN":
+                    await self.reply("334 ")
+                    await self.reader.readline()
+                await self.reply("235 2.7.0 Authentication successful")
+            elif command == "MAIL":
+                self.mail_from, self.rcpts = arg.partition(":")[2].strip(), []
+                await self.reply("250 OK")
+            elif command == "RCPT":
+                rcpt = arg.partition(":")[2].strip()
+                if self.sink.reject_rcpt and self.sink.reject_rcpt in rcpt:
+                    await self.reply("550 5.1.1 Mailbox unavailable")
+                else:
+                    self.rcpts.append(rcpt)
+                    await self.reply("250 OK")
+            elif command == "DATA":
+                await self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = await self.read_data()
+                if self.sink.fail_first > 0:
+                    self.sink.fail_first -= 1
+                    await self.reply("451 4.3.0 Try again later")
+                else:
+                    self.sink.save(self.mail_from, self.rcpts, data)
+                    await self.reply("250 OK queued")
+                self.mail_from, self.rcpts = None, []
+            elif command in ("RSET", "NOOP"):
+                if command == "RSET":
+                    self.mail_from, self.rcpts = None, []
+                await self.reply("250 OK")
+            elif command == "QUIT":
+                await self.reply("221 Bye")
+                break
+            else:
+                await self.reply("502 Command not implemented")
+        self.writer.close()
+
+    async def read_data(self) -> bytes:
+        lines = []
+        while True:
+            line = await self.reader.readline()
+            if not line or line in (b".\r\n", b".\n"):
+                break
+            lines.append(line[1:] if line.startswith(b"..") else line)  # undo dot-stuffing
+        return b"".join(lines)
+
+class Sink:
+    def __init__(self, out: str, reject_rcpt: Optional[str], fail_first: int):
+        self.out = out
+        self.reject_rcpt = reject_rcpt
+        self.fail_first = fail_first
+        self.connections = 0
+        self.received = 0
+        os.makedirs(out, exist_ok=True)
+
+    def save(self, mail_from: Optional[str], rcpts: List[str], data: bytes) -> None:
+        self.received += 1
+        path = os.path.join(self.out, f"{self.received}.eml")
+        with open(path, "wb") as f:
+            f.write(data)
+        subject = message_from_bytes(data).get("Subject", "")
+        print(f"#{self.received} (connection {self.connections}) {mail_from} -> {', '.join(rcpts)}: {subject}", flush=True)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        await SinkSession(reader, writer, self).run()
+
+async def serve(host: str, port: int, sink: Sink) -> None:
+    server = await asyncio.start_server(sink.handle, host, port)
+    print(f"SMTP sink listening on {host}:{port}, saving to {sink.out}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    parser.add_argument("--out", default="./sent-mail")
+    parser.add_argument("--reject-rcpt", help="reject recipients containing this text with 550")
+    parser.add_argument("--fail-first", type=int, default=0, help="answer the first N messages with 451")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, Sink(args.out, args.reject_rcpt, args.fail_first)))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -73,7 +73,7 @@ export default function SearchBar() {
 
       if (!res.ok) throw new Error("Failed to send email");
 
-      alert(`Email sent to ${email} with upload link.`);
+      alert(`Upload link queued for delivery to ${email}.`);
       setShowModal(false);
       setEmail("");
       setServiceType("doctor");
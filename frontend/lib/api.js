@@ -10,9 +10,12 @@ const getAuthHeaders = () => {
 
 // Health Records API
 export const healthRecordsAPI = {
-  // Fetch all health records for the current user
-  async getRecords() {
-    const response = await fetch(`${API_BASE_URL}/records/`, {
+  // Fetch one page of health records, newest first
+  async getRecordsPage({ cursor, limit = 50, ...filters } = {}) {
+    const params = new URLSearchParams({ limit: String(limit), ...filters });
+    if (cursor) params.set("cursor", cursor);
+
+    const response = await fetch(`${API_BASE_URL}/records/?${params}`, {
       method: "GET",
       headers: {
         ...getAuthHeaders(),
@@ -24,7 +27,22 @@ export const healthRecordsAPI = {
       throw new Error(`Failed to fetch records: ${response.statusText}`);
     }
 
-    return response.json();
+    return {
+      items: await response.json(),
+      nextCursor: response.headers.get("X-Next-Cursor"),
+    };
+  },
+
+  // Fetch all health records for the current user, following the page cursors
+  async getRecords(filters = {}) {
+    const records = [];
+    let cursor = null;
+    do {
+      const page = await this.getRecordsPage({ ...filters, cursor, limit: 200 });
+      records.push(...page.items);
+      cursor = page.nextCursor;
+    } while (cursor);
+    return records;
   },
 
   // Upload a new health record file
@@ -45,7 +63,32 @@ export const healthRecordsAPI = {
       );
     }
 
-    return response.json();
+    // Upload returns an ingestion job; wait for it to produce the record
+    const job = await response.json();
+    return this.waitForJob(job.id);
+  },
+
+  // Poll an ingestion job until it finishes, then return the created record
+  async waitForJob(jobId, intervalMs = 1000) {
+    for (;;) {
+      const response = await fetch(`${API_BASE_URL}/records/jobs/${jobId}`, {
+        method: "GET",
+        headers: getAuthHeaders(),
+      });
+
+      if (!response.ok) {
+        throw new Error(`Failed to fetch upload status: ${response.statusText}`);
+      }
+
+      const job = await response.json();
+      if (job.status === "done") {
+        return this.getRecord(job.record_id);
+      }
+      if (job.status === "failed") {
+        throw new Error(job.error || "Failed to process uploaded record");
+      }
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
   },
 
   // Get a specific health record by ID
@@ -156,3 +199,41 @@ export const healthRecordsAPI = {
     return res.json();
   },
 };
+
+// Analytics API
+export const analyticsAPI = {
+  // Lab tests recorded for the current user, with their units and date ranges
+  async getLabTests() {
+    const response = await fetch(`${API_BASE_URL}/analytics/labs`, {
+      method: "GET",
+      headers: getAuthHeaders(),
+    });
+
+    if (!response.ok) {
+      throw new Error(`Failed to fetch lab tests: ${response.statusText}`);
+    }
+
+    return response.json();
+  },
+
+  // Bucketed series with rolling statistics, ready to pass to a Recharts chart
+  async getLabTrend(test, { bucket = "month", window = 3, start, end } = {}) {
+    const params = new URLSearchParams({ bucket, window: String(window) });
+    if (start) params.set("start", start);
+    if (end) params.set("end", end);
+
+    const response = await fetch(
+      `${API_BASE_URL}/analytics/labs/${encodeURIComponent(test)}/trend?${params}`,
+      {
+        method: "GET",
+        headers: getAuthHeaders(),
+      }
+    );
+
+    if (!response.ok) {
+      throw new Error(`Failed to fetch lab trend: ${response.statusText}`);
+    }
+
+    return response.json();
+  },
+};